@@ -55,6 +55,21 @@ Features:
 *  ENERGY/2019-03-25/2019-03-27/InstallationHouse20/battery/POSITIVE/GROUPBY/30
 *  Correct Result is a number!
 * ----------------------------------------------------------------------------------------------------------- *
+* ### Energy with data-quality (both ENERGY APIs above, plus /QUALITY and an optional gap policy):
+*  ENERGY/2018-12-24/2018-12-25/InstallationHouse20/photovoltaic/QUALITY
+*  ENERGY/2019-03-25/2019-03-27/InstallationHouse20/battery/POSITIVE/GROUPBY/30/QUALITY/{POLICY}
+*  {POLICY} = {ZERO/HOLD/LINEAR/EXCLUDE} (missing buckets integrated as 0, as the last value,
+*  interpolated, or not integrated), default ENERGY_GAP_POLICY
+*  Result is a json: {"energy": 1234.5, "unit": "Wh", "policy": "ZERO", "coverage": 0.94,
+*  "gaps": [["2019-03-25T10:05:00Z", "2019-03-25T10:35:00Z"], ...]}
+* ----------------------------------------------------------------------------------------------------------- *
+* ### Energy Matrix (energy of many fields/filters per bucket, from a single query):
+*  ENERGY/MATRIX/{fromDate}/{toDate}/{FroniusMeasurement}/{BUCKET}/{Field:FILTER,...}
+*  ENERGY/MATRIX/2019-03-01/2019-03-31/InstallationHouseBolzano/DAY/photovoltaic:ALL,grid:NEGATIVE,grid:POSITIVE
+*  {BUCKET} = {HOUR/DAY/MONTH} (UTC), without pairs: photovoltaic:ALL,grid:NEGATIVE,grid:POSITIVE,
+*  battery:POSITIVE,battery:NEGATIVE,load:ALL
+*  Result is a json: {"unit": "Wh", "bucket": "DAY", "columns": ["time", "photovoltaic:ALL", ...], "values": [[...], ...]}
+* ----------------------------------------------------------------------------------------------------------- *
 * ### Filtered Data (plus operations such as: GROUPBY):
 *  INFLUXDB/{fromDate}/{toDate}/{measurement}/{Field}/{FILTER}/{OPERATION}/{VALUE}
 *  INFLUXDB/2018-12-24/2018-12-25/S4G-GW-EDYNA-0015/P/POSITIVE/GROUPBY/30
@@ -245,18 +260,60 @@ Features:
 * ### Retrieve current EV SoC:
 * EV/SOC    (Deprecated)
 * ----------------------------------------------------------------------------------------------------------- *
+* ### HTTP Server worker pool gauges (only with enableWorkerPool):
+* SERVER/pool
+* Output is a json including: workers, busy, queueSize, queueDepth, queueMaxDepth,
+* served, rejected, idle (parked persistent connections), idleClosed, waitLastMs, waitMaxMs, waitAvgMs
+* ----------------------------------------------------------------------------------------------------------- *
+* ### Execute many GET APIs concurrently, within a single round trip:
+* BATCH (REST POST)
+*   + json list of paths as payload: ["/Battery/cycles", "/EV/data", ...]
+* Output is a json keyed by path: {"/Battery/cycles": {"status": 200, "timeMs": 0.2, "content": 12}, ...}
+* ----------------------------------------------------------------------------------------------------------- *
+* ### Single-flight coalescing counters (identical concurrent GET requests share one execution):
+* SERVER/coalescing
+* Output is a json including: inFlight, executions, coalesced (upstream calls saved), timeouts, streamed
+* ----------------------------------------------------------------------------------------------------------- *
+* ### InfluxDB query cache counters (results of identical queries reused in memory):
+* SERVER/cache
+* Output is a json including: hits, misses, expired, evictions, rejected, entries, bytes, maxBytes,
+* diskHits, diskMisses, diskWrites, diskTrimmed, diskErrors, diskBytes,
+* energyIndexHits, energyIndexMisses, energyIndexDays, energyIndexErrors, energyIndexTables
+* ----------------------------------------------------------------------------------------------------------- *
+* ### InfluxDB endpoints (circuit breakers) and client counters:
+* SERVER/influx
+* Output is a json including: endpoints {state, failures, opened, rejected, p95Ms} and counters
+* (breakersOpen, deadlineExceeded, hedges, hedgeWins, fallbackLocal, fallbackStale).
+* Responses built from the local InfluxDB or from stale cached results carry the X-Degraded header
+* ----------------------------------------------------------------------------------------------------------- *
+* ### Local mirror of the global DWH (InstallationHouse and S4G-GW series copied in the background):
+* SERVER/mirror
+* Output is a json including: series {since, watermark, settled} and counters (lagSeconds, routedLocal,
+* routedGlobal, localErrors, syncs, syncErrors, pointsCopied).
+* With enableInfluxMirror, INFLUXDB and ENERGY APIs are answered by the mirror whenever their window
+* is settled in the mirror (copied again INFLUX_MIRROR_SETTLE after, millisecond timestamps)
+* ----------------------------------------------------------------------------------------------------------- *
+* ### Prometheus metrics (scrape target):
+* METRICS
+* Output is text: residential_requests_total{route,method,status}, residential_request_duration_seconds{route},
+* residential_requests_in_flight{route}, residential_upstream_requests_total{target,status},
+* residential_upstream_duration_seconds{target} (targets: influx_global, influx_local, profess, evconnector),
+* plus the gauges of SERVER/pool, SERVER/coalescing, SERVER/cache, SERVER/influx, SERVER/mirror and of the log writer (queued, written, dropped, pending)
+* ----------------------------------------------------------------------------------------------------------- *
 @Author Ligios Michele
 @update: 2019-12-12
 @Version final
 '''
 # ------------------------------------------------------------------------------------ #
 # Generic Libraries:
-import sys, os, re, shutil, json
+import sys, os, re, shutil, json, io, socket, gzip, zlib, hashlib, collections, atexit, mmap
+import email.utils
 
 import urllib.request, urllib.parse, urllib.error
 from urllib.request import urlopen
 
 import http.server
+import http.client
 from http.server import HTTPServer as BaseHTTPServer
 # Single-thread REST Server:
 # from http.server import SimpleHTTPRequestHandler, HTTPServer
@@ -265,6 +322,8 @@ import requests
 import socketserver
 from socketserver import ThreadingMixIn
 from requests.auth import HTTPBasicAuth
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 # ------------------------------------------------------------------------------------ #
 import datetime
 import time
@@ -281,6 +340,18 @@ from scipy import integrate
 # ------------------------------------------------------------------------------------ #
 import paho.mqtt.client as mqtt
 import threading
+import asyncio
+import concurrent.futures
+import selectors, select
+import multiprocessing
+import signal
+import functools
+from operator import itemgetter
+# Optional: lets "async def" APIs await outbound calls without occupying a thread
+try:
+	import aiohttp
+except ImportError:
+	aiohttp = None
 
 if (sys.version_info > (3, 0)):
 	import queue
@@ -295,28 +366,139 @@ from calendar import monthrange
 here    = os.path.dirname(os.path.realpath(__file__))
 records = {}
 # ------------------------------------------------------------------------------------ #
-# Full Numpy array (Avoid compression of data)
-np.set_printoptions(threshold=np.inf)
-
+# 		Logging:
 # ------------------------------------------------------------------------------------ #
-# 		Global temporary flags to enable print logging:
+# Messages below LOG_LEVEL are discarded before being formatted. The others are queued
+# (still not formatted) and written by a background thread (see AsyncLog):
+# 1. LOG_INFO:  Control Flow about main logic
+# 2. LOG_DEBUG: Control Flow about HTTP Server and debugging leftovers
 # ------------------------------------------------------------------------------------ #
-# 1. Enable Control Flow prints about main logic
+LOG_DEBUG            = 10
+LOG_INFO             = 20
+LOG_WARNING          = 30
+LOG_ERROR            = 40
+LOG_LEVEL            = LOG_INFO
+LOG_BUFFER_SIZE      = 8192  # Messages waiting for the writer (once full, the oldest are dropped)
 # ------------------------------------------------------------------------------------ #
-enablePrints         = True
-enableFullStructuresPrints = False     # AVOID #  # Enable Structures content prints!
+# Full structures (InfluxDB responses, X/Y axes integrated) are dumped only for the
+# requests carrying this header, e.g.: curl -H "X-Residential-Debug: 1" ...
 # ------------------------------------------------------------------------------------ #
-# 2. Enable Content results prints about Run-time evaluation
+LOG_DEBUG_HEADER     = "X-Residential-Debug"
 # ------------------------------------------------------------------------------------ #
-enableResultsContent = False
+# Enable Time-Monitoring features to verify delays introduced by the HTTP server
 # ------------------------------------------------------------------------------------ #
-# 3. Enable Control Flow prints about HTTP Server
+enableTimingEval     = False
 # ------------------------------------------------------------------------------------ #
-enableHTTPPrints     = False
+# 		HTTP Server concurrency:
 # ------------------------------------------------------------------------------------ #
-# 4. Enable Time-Monitoring features to verify delays introduced by the HTTP server
+# True:  Fixed-size pool of workers fed by a bounded queue of accepted connections
+#        (once the queue is full, requests are rejected immediately with 503 + Retry-After)
+# False: Legacy ThreadingMixIn server (one new thread for each incoming connection)
 # ------------------------------------------------------------------------------------ #
-enableTimingEval     = False
+enableWorkerPool     = True
+POOL_WORKERS         = 16    # Max number of requests served concurrently
+POOL_QUEUE_SIZE      = 64    # Max number of accepted requests waiting for a worker
+POOL_RETRY_AFTER     = 5     # Seconds suggested to the rejected clients
+POOL_IDLE_GRACE      = 0.005 # Seconds a worker waits for the next request before parking the connection (only when idle workers are left)
+# ------------------------------------------------------------------------------------ #
+# True:  asyncio front end (AsyncHTTPServer), it takes precedence over the above modes.
+#        Synchronous APIs are executed by POOL_WORKERS threads, "async def" APIs on the loop
+# ------------------------------------------------------------------------------------ #
+enableAsyncServer    = False
+# ------------------------------------------------------------------------------------ #
+# True:  Pre-fork mode, PREFORK_PROCESSES processes share the same port (SO_REUSEPORT),
+#        each one running the server selected above. Only the parent process owns the
+#        MQTT subscriber and EvaluateCyclesThread (the others read cycles/state from it)
+# ------------------------------------------------------------------------------------ #
+enablePreFork        = False
+PREFORK_PROCESSES    = os.cpu_count() or 1
+# ------------------------------------------------------------------------------------ #
+# HTTP/1.1 persistent connections and compression of the responses:
+# ------------------------------------------------------------------------------------ #
+KEEPALIVE_TIMEOUT    = 5     # Seconds an idle persistent connection is kept open
+enableCompression    = True  # gzip/deflate negotiated through the Accept-Encoding header
+COMPRESSION_MIN_SIZE = 1024  # Smaller bodies are not worth compressing (bytes)
+COMPRESSION_LEVEL    = 6
+STREAM_CHUNK_SIZE    = 65536 # Streamed responses (JSONStream) are written in chunks of this size
+# ------------------------------------------------------------------------------------ #
+# HTTP caching of historical time-windows:
+# A window ending before the "settled" watermark (now - SETTLED_DELAY) will never change
+# ------------------------------------------------------------------------------------ #
+SETTLED_DELAY        = timedelta(days=1) # Late data (e.g. aggregators syncing over the VPN)
+SETTLED_MAX_AGE      = 31536000          # Cache-Control max-age of settled windows (seconds)
+LIVE_MAX_AGE         = 0                 # Windows including recent data (0 = always revalidate)
+CACHE_VERSION        = "1"               # Change it to invalidate the ETags given to the clients
+# ------------------------------------------------------------------------------------ #
+# Single-flight: identical GET requests arriving while the first one is still in flight
+# wait for it and share its result (instead of repeating the InfluxDB/PROFESS round trip)
+# ------------------------------------------------------------------------------------ #
+enableCoalescing     = True
+COALESCE_TIMEOUT     = 30    # Max seconds to wait for a flight (routes can set 'coalesce_timeout')
+# ------------------------------------------------------------------------------------ #
+# BATCH: many API paths executed concurrently within a single HTTP round trip
+# ------------------------------------------------------------------------------------ #
+BATCH_WORKERS        = 8     # Items of a batch executed at the same time
+BATCH_MAX_ITEMS      = 50
+# ------------------------------------------------------------------------------------ #
+# METRICS: request/upstream counters and latency histograms (Prometheus text format)
+# ------------------------------------------------------------------------------------ #
+enableMetrics        = True
+# ------------------------------------------------------------------------------------ #
+# InfluxDB client: a pool of persistent connections towards each endpoint
+# (influxServer over the VPN, influxLocalServer) shared by all the APIs
+# ------------------------------------------------------------------------------------ #
+INFLUX_POOL_SIZE       = POOL_WORKERS  # Connections kept open towards each endpoint
+INFLUX_CONNECT_TIMEOUT = 3.05          # Seconds
+INFLUX_READ_TIMEOUT    = 60            # Seconds (between two bytes of the response)
+INFLUX_RETRIES         = 2             # On connection errors and 502/503/504 (queries are idempotent)
+INFLUX_BACKOFF         = 0.3           # Seconds before the 2nd attempt, doubled at every retry
+INFLUX_EPOCH           = 'ms'          # Timestamps of the decoded queries: 'ms', 's' or None (RFC3339 strings)
+INFLUX_FANOUT_WORKERS  = 8             # Queries of the same API (e.g. evaluate_*) executed at the same time
+# ------------------------------------------------------------------------------------ #
+# InfluxDB resilience: a deadline shared by all the queries of a request, a circuit
+# breaker per endpoint (failing fast while the VPN link is down), optional hedging and
+# fallback on the local InfluxDB or on stale cached results (marked as degraded)
+# ------------------------------------------------------------------------------------ #
+INFLUX_DEADLINE         = 25    # Seconds for all the queries of a request (routes can set 'deadline')
+INFLUX_BREAKER_FAILURES = 5     # Consecutive failures (errors, timeouts, 5xx) opening the circuit
+INFLUX_BREAKER_COOLDOWN = 30    # Seconds before a probe query is let through an open circuit
+enableHedging           = False # Second request when the first one is slower than the p95 latency
+INFLUX_HEDGE_MIN_DELAY  = 0.05  # Seconds (floor of the p95 latency)
+INFLUX_HEDGE_SAMPLES    = 200   # Latencies (per endpoint) behind the p95, at least 20 are needed
+enableInfluxFallback    = True
+INFLUX_FALLBACK_TIMEOUT = 2     # Seconds granted to the local InfluxDB, even past the deadline
+# ------------------------------------------------------------------------------------ #
+# InfluxDB query cache: decoded results of identical queries (GUI polling, APIs sharing
+# a series) kept in memory, LRU within a byte budget. How long a result is kept depends
+# on the end of the queried window (settled, yesterday, today)
+# ------------------------------------------------------------------------------------ #
+enableInfluxCache          = True
+INFLUX_CACHE_BYTES         = 64 * 1024 * 1024 # Budget: JSON bodies of the results, arrays of the day chunks
+INFLUX_CACHE_TTL_SETTLED   = 7 * 86400        # Windows ended before yesterday (seconds)
+INFLUX_CACHE_TTL_YESTERDAY = 3600             # Windows ending yesterday: late data can still arrive
+INFLUX_CACHE_TTL_LIVE      = 120              # Windows touching today (or without an upper bound)
+enableDayChunks            = True             # Whole-day windows cached (and fetched) day by day
+enableDiskCache            = True             # Settled days also stored on disk: they survive the restarts
+INFLUX_DISK_CACHE_DIR      = "influx-cache"   # Relative to the folder of this file
+INFLUX_DISK_CACHE_BYTES    = 1024 * 1024 * 1024
+# ------------------------------------------------------------------------------------ #
+# Local mirror of the global DWH: a background worker copies the series of this
+# aggregator into the local InfluxDB (databases named with INFLUX_MIRROR_SUFFIX), and
+# queries of the global DWH whose window is settled in the mirror are served by the local copy
+# The copy keeps millisecond timestamps: finer timestamps are truncated (points of the same
+# series within the same millisecond are merged into one)
+# ------------------------------------------------------------------------------------ #
+enableInfluxMirror     = False
+INFLUX_MIRROR_SERIES   = {"S4G-DWH-TEST": "^InstallationHouse", "S4G-DWH-USM": "^S4G-GW"} # Database: measurements (regex)
+INFLUX_MIRROR_SUFFIX   = "-MIRROR"
+INFLUX_MIRROR_SINCE    = "2018-01-01"          # First mirrored day (UTC)
+INFLUX_MIRROR_STATE    = "influx-mirror.json"  # Watermarks, relative to the folder of this file
+INFLUX_MIRROR_INTERVAL = 60                    # Seconds between two synchronizations
+INFLUX_MIRROR_LAG      = 600                   # Seconds: the watermark never goes past now - lag
+INFLUX_MIRROR_OVERLAP  = 3600                  # Seconds copied again below the watermark (late points)
+INFLUX_MIRROR_SETTLE   = 172800                # Seconds: older points are copied once more, then served by the mirror
+INFLUX_MIRROR_CHUNK    = 7                     # Days copied by a single query
+INFLUX_MIRROR_BATCH    = 5000                  # Points of a single write
 # ------------------------------------------------------------------------------------ #
 # SENSOR_NAME MAPPING (only numerical values are allowed inside influx_format)
 # TYPE = VALUE
@@ -415,94 +597,2150 @@ THRESHOLD_HIGH      = [120,120]
 THRESHOLD_MAX       = [180,180]
 THRESHOLD_INF_HIGH  = [1440,360]
 # ---------------------------------------------------------------------------------------------------------------- #
+# Rule integrating the power series of the ENERGY APIs (see integrate_energy): trapezoid, simpson, step
+ENERGY_INTEGRATION   = "simpson"
+# Missing buckets (null means) of the ENERGY APIs (see fill_gaps): zero, hold, linear, exclude
+# The .../QUALITY routes can choose another policy and also report coverage and gaps
+# (the daily energy index and the pushed-down INTEGRAL() answer the other routes as before)
+ENERGY_GAP_POLICY    = "zero"
+# ENERGY APIs integrated by InfluxDB (INTEGRAL() of the raw points, a single value crosses the VPN):
+# the grouped samples are fetched and integrated here only when the pushed-down query fails
+enableEnergyPushdown = False
+# ENERGY APIs answered by the daily energy index (see EnergyIndex): settled days are integrated once
+# (ENERGY_INDEX_STEP minutes means, step rule) and summed by prefix sums, only the recent days are live
+enableEnergyIndex    = False
+ENERGY_INDEX_DIR     = "energy-index"   # Relative to the folder of this file
+ENERGY_INDEX_SINCE   = "2018-01-01"     # First indexed day (UTC)
+ENERGY_INDEX_STEP    = 5                # Minutes
+ENERGY_INDEX_CHUNK   = 31               # Days integrated by a single query (background backfill)
+ENERGY_INDEX_SYNC    = 31               # Missing days a request can fill, otherwise it waits for the backfill
+# ENERGY/MATRIX: minutes of the means integrated (step rule) in every bucket
+ENERGY_MATRIX_STEP   = 5
+# ---------------------------------------------------------------------------------------------------------------- #
 influxLocalServer = "http://localhost:8086/query?db="
 influxServer      = "http://10.8.0.50:8086/query?db="
 basequery         = "&q=select mean(*) from "
 # energyquery       = "&q=select mean(P) from "
 energyquery       = "&q=select mean(Processed_P) from "
+energyfield       = "Processed_P"
 froniusquery1     = "&q=select mean(\""
 froniusquery2     = "\") from "
 # ------------------------------------------------------------------------------------ #
 # Map representing the available operations to support improved query towards the DB
 knownOperations = {"GROUPBY":"GROUP BY"}
+# ------------------------------------------------------------------------------------ #
+# Map between the API field names and the Fronius fields stored in InfluxDB
+froniusFields   = {"photovoltaic":"P-PV","grid":"P-Grid","load":"P-Load","battery":"P-Akku","SoC":"SOC"}
+# ------------------------------------------------------------------------------------ #
+# Parameters of an API request, extracted only once by the route table
+# (see RESTRequestHandler.routes) and exposed to the handlers as handler.params
+# Dates are always converted into the UTC time-window requested:
+#   {fromDate}/{toDate} -> [fromDate 00:00:00, toDate 23:59:59]
+#   MONTH/{Date}        -> [first day 00:00:00, last day 23:59:59]
+#   YEAR/{Date}         -> [01-01 00:00:00, 12-31 23:59:59]
+# If a date does not exist (e.g. 2019-02-30) dateError holds the wrong value
+# ------------------------------------------------------------------------------------ #
+class RequestParams(object):
+	__slots__ = ('path','destination','measurement','field','filter','operation','interval',
+		     'evId','bucket','pairs','quality','policy','year','fromDateRaw','toDateRaw','fromDate','toDate','dateError')
+
+	def __init__(self, path, groups):
+		self.path        = path
+		self.destination = groups.get('destination')
+		self.measurement = groups.get('measurement')
+		self.field       = groups.get('field')
+		self.filter      = groups.get('filter')
+		self.operation   = groups.get('operation')
+		self.interval    = groups.get('interval')
+		self.evId        = groups.get('evId')
+		self.bucket      = groups.get('bucket')
+		self.pairs       = groups.get('pairs')
+		self.quality     = groups.get('quality')
+		self.policy      = groups.get('policy')
+		self.year        = None
+		self.fromDateRaw = None
+		self.toDateRaw   = None
+		self.fromDate    = None
+		self.toDate      = None
+		self.dateError   = None
+
+		if(groups.get('fromDate') is not None):
+			self.fromDateRaw = groups['fromDate'].replace("-",".")
+			self.toDateRaw   = groups['toDate'].replace("-",".")
+			try:
+				year, month, day = self.fromDateRaw.split('.')
+				self.fromDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
+			except ValueError:
+				self.dateError = self.fromDateRaw
+				return
+			try:
+				year, month, day = self.toDateRaw.split('.')
+				self.toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
+			except ValueError:
+				self.dateError = self.toDateRaw
+
+		elif(groups.get('month') is not None):
+			self.fromDateRaw = groups['month'].replace("-",".")
+			year, month      = self.fromDateRaw.split('.')
+			self.year        = year
+			weekday, days    = monthrange(int(year), int(month))
+			self.fromDate    = datetime(int(year), int(month), 1, 0, 0, 0, tzinfo=tz.utc)
+			self.toDate      = datetime(int(year), int(month), int(days), 23, 59, 59, tzinfo=tz.utc)
+
+		elif(groups.get('year') is not None):
+			self.fromDateRaw = groups['year']
+			self.year        = groups['year']
+			self.fromDate    = datetime(int(self.year), 1, 1, 0, 0, 0, tzinfo=tz.utc)
+			self.toDate      = datetime(int(self.year), 12, 31, 23, 59, 59, tzinfo=tz.utc)
+
+	# InfluxDB representation of the time-window boundaries ('2019-03-25 00:00:00')
+	@property
+	def fromDateStr(self):
+		return str(self.fromDate).split('+')[0]
+
+	@property
+	def toDateStr(self):
+		return str(self.toDate).split('+')[0]
+
+# ------------------------------------------------------------------------------------ #
+# 				LOGGING
+# ------------------------------------------------------------------------------------ #
+# The request threads only append (level, message, args) to a bounded ring buffer:
+# formatting and writing happen in the writer thread, so a slow stdout (or journald)
+# never blocks a request. When the buffer is full the oldest messages are dropped
+# (and counted). In pre-fork mode every process restarts its own writer after the fork.
+# ------------------------------------------------------------------------------------ #
+class AsyncLog(object):
+	def __init__(self, size=LOG_BUFFER_SIZE, stream=None):
+		self.buffer   = collections.deque(maxlen=size)
+		self.stream   = stream
+		self.event    = threading.Event()
+		self.lock     = threading.Lock()
+		self.thread   = None
+		self.queued   = 0
+		self.written  = 0
+		self.dropped  = 0
+		self.reported = 0
+
+	def emit(self, level, msg, args):
+		# Counters are updated without locks: they are only indicative
+		if(len(self.buffer) == self.buffer.maxlen):
+			self.dropped += 1
+		self.buffer.append((level, msg, args))
+		self.queued += 1
+		if self.thread is None:
+			self.start()
+		if(self.event.is_set() == False):
+			self.event.set()
+
+	def start(self):
+		with self.lock:
+			if self.thread is None:
+				self.thread = threading.Thread(target=self.writer_loop, name="LogWriter")
+				self.thread.daemon = True
+				self.thread.start()
+
+	def writer_loop(self):
+		while True:
+			self.event.wait()
+			self.event.clear()
+			self.flush()
+
+	def flush(self):
+		lines = []
+		while True:
+			try:
+				level, msg, args = self.buffer.popleft()
+			except IndexError:
+				break
+			try:
+				lines.append(msg % args if args else str(msg))
+			except Exception as e:
+				lines.append(str(msg) + " " + str(args) + " [Formatting Error: " + str(e) + "]")
+		if(self.dropped != self.reported):
+			lines.append("[Residential][LOG] Log buffer full: " + str(self.dropped - self.reported) + " messages dropped")
+			self.reported = self.dropped
+		if(len(lines) == 0):
+			return
+		stream = self.stream or sys.stdout
+		try:
+			stream.write("\n".join(lines) + "\n")
+			stream.flush()
+		except Exception:
+			pass
+		self.written += len(lines)
+
+	# The writer thread does not survive a fork (and the parent messages must not be repeated)
+	def after_fork(self):
+		self.buffer.clear()
+		self.event  = threading.Event()
+		self.lock   = threading.Lock()
+		self.thread = None
+
+	def get_counters(self):
+		return {
+			"queued":  self.queued,
+			"written": self.written,
+			"dropped": self.dropped,
+			"pending": len(self.buffer),
+		}
+
+asyncLog = AsyncLog()
+# Messages still queued at exit are written anyway
+atexit.register(asyncLog.flush)
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=asyncLog.after_fork)
+
+def log_enabled(level):
+	return level >= LOG_LEVEL
+
+def log_debug(msg, *args):
+	if(LOG_DEBUG >= LOG_LEVEL):
+		asyncLog.emit(LOG_DEBUG, msg, args)
+
+def log_info(msg, *args):
+	if(LOG_INFO >= LOG_LEVEL):
+		asyncLog.emit(LOG_INFO, msg, args)
+
+def log_warning(msg, *args):
+	if(LOG_WARNING >= LOG_LEVEL):
+		asyncLog.emit(LOG_WARNING, msg, args)
+
+def log_error(msg, *args):
+	if(LOG_ERROR >= LOG_LEVEL):
+		asyncLog.emit(LOG_ERROR, msg, args)
+
+# True when the client asked to dump the structures of this request (LOG_DEBUG_HEADER)
+def request_debug(handler):
+	headers = getattr(handler, "headers", None)
+	return headers is not None and headers.get(LOG_DEBUG_HEADER, "0") not in ("", "0")
+
+# Numpy arrays printed in full (without changing the global print options)
+class FullArray(object):
+	__slots__ = ('array',)
+
+	def __init__(self, array):
+		self.array = array
+
+	def __str__(self):
+		return np.array2string(self.array, threshold=sys.maxsize)
+
+# Dump of full structures, regardless of LOG_LEVEL (already filtered by request_debug)
+def log_dump(msg, *values):
+	asyncLog.emit(LOG_DEBUG, msg, tuple(FullArray(value) if isinstance(value, np.ndarray) else value for value in values))
+
+# ------------------------------------------------------------------------------------ #
+# 				METRICS (Prometheus text format)
+# ------------------------------------------------------------------------------------ #
+# Always-on counters exposed by the METRICS API:
+#   requests served, by route (name of the API function), method and status
+#   latency histogram and in-flight gauge, by route
+#   outbound calls (count and latency histogram), by target and status
+# Every update is a few dictionary operations under a single lock.
+# In pre-fork mode each process keeps (and exposes) its own counters.
+# ------------------------------------------------------------------------------------ #
+METRICS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+class Histogram(object):
+	__slots__ = ('counts', 'sum', 'count')
+
+	def __init__(self):
+		self.counts = [0] * (len(METRICS_BUCKETS) + 1)     # Last one is +Inf
+		self.sum    = 0.0
+		self.count  = 0
+
+	def observe(self, value):
+		i = 0
+		for bound in METRICS_BUCKETS:
+			if(value <= bound):
+				break
+			i += 1
+		self.counts[i] += 1
+		self.sum       += value
+		self.count     += 1
+
+class Metrics(object):
+	def __init__(self):
+		self.lock             = threading.Lock()
+		self.requests         = {}     # (route, method, status) -> count
+		self.latency          = {}     # route -> Histogram
+		self.inFlight         = {}     # route -> requests being served
+		self.upstream         = {}     # (target, status) -> count
+		self.upstreamLatency  = {}     # target -> Histogram
+
+	def request_started(self, route):
+		if(enableMetrics == False):
+			return
+		with self.lock:
+			self.inFlight[route] = self.inFlight.get(route, 0) + 1
+
+	def request_finished(self, route, method, status, elapsed):
+		if(enableMetrics == False):
+			return
+		key = (route, method, str(status))
+		with self.lock:
+			# Not counted when the request started before enableMetrics was switched on
+			if(self.inFlight.get(route, 0) > 0):
+				self.inFlight[route] -= 1
+			self.requests[key] = self.requests.get(key, 0) + 1
+			histogram = self.latency.get(route)
+			if histogram is None:
+				histogram = self.latency[route] = Histogram()
+			histogram.observe(elapsed)
+
+	def upstream_finished(self, target, status, elapsed):
+		if(enableMetrics == False):
+			return
+		key = (target, str(status))
+		with self.lock:
+			self.upstream[key] = self.upstream.get(key, 0) + 1
+			histogram = self.upstreamLatency.get(target)
+			if histogram is None:
+				histogram = self.upstreamLatency[target] = Histogram()
+			histogram.observe(elapsed)
+
+	def render(self, gauges=None, counters=None, logCounters=None, cacheCounters=None, clientCounters=None, mirrorCounters=None):
+		with self.lock:
+			requests        = sorted(self.requests.items())
+			latency         = sorted((route, (list(h.counts), h.sum, h.count)) for route, h in self.latency.items())
+			inFlight        = sorted(self.inFlight.items())
+			upstream        = sorted(self.upstream.items())
+			upstreamLatency = sorted((target, (list(h.counts), h.sum, h.count)) for target, h in self.upstreamLatency.items())
+
+		lines = []
+		lines.append("# HELP residential_requests_total Requests served, by route, method and status.")
+		lines.append("# TYPE residential_requests_total counter")
+		for (route, method, status), count in requests:
+			lines.append('residential_requests_total{route="%s",method="%s",status="%s"} %d' % (route, method, status, count))
+		metrics_histogram(lines, "residential_request_duration_seconds", "Time spent serving the requests, by route.", "route", latency)
+		lines.append("# HELP residential_requests_in_flight Requests being served, by route.")
+		lines.append("# TYPE residential_requests_in_flight gauge")
+		for route, count in inFlight:
+			lines.append('residential_requests_in_flight{route="%s"} %d' % (route, count))
+		lines.append("# HELP residential_upstream_requests_total Outbound calls, by target and status.")
+		lines.append("# TYPE residential_upstream_requests_total counter")
+		for (target, status), count in upstream:
+			lines.append('residential_upstream_requests_total{target="%s",status="%s"} %d' % (target, status, count))
+		metrics_histogram(lines, "residential_upstream_duration_seconds", "Duration of the outbound calls, by target.", "target", upstreamLatency)
+		# Gauges of the HTTP server (SERVER/pool), of the single-flight (SERVER/coalescing), of the log,
+		# of the InfluxDB query cache (SERVER/cache), of the InfluxDB client (SERVER/influx) and of the mirror (SERVER/mirror)
+		for prefix, values in (("residential_server_", gauges), ("residential_coalescing_", counters), ("residential_log_", logCounters),
+				       ("residential_influx_cache_", cacheCounters), ("residential_influx_client_", clientCounters),
+				       ("residential_influx_mirror_", mirrorCounters)):
+			for name, value in sorted((values or {}).items()):
+				if value is None:
+					continue
+				name = prefix + re.sub(r'([a-z])([A-Z])', r'\1_\2', name).lower()
+				lines.append("# TYPE " + name + " gauge")
+				lines.append(name + " " + str(value))
+		return ("\n".join(lines) + "\n").encode('UTF-8')
+
+def metrics_histogram(lines, name, description, label, histograms):
+	lines.append("# HELP " + name + " " + description)
+	lines.append("# TYPE " + name + " histogram")
+	for value, (counts, total, count) in histograms:
+		cumulative = 0
+		for bound, bucketCount in zip(METRICS_BUCKETS + ("+Inf",), counts):
+			cumulative += bucketCount
+			lines.append('%s_bucket{%s="%s",le="%s"} %d' % (name, label, value, bound, cumulative))
+		lines.append('%s_sum{%s="%s"} %f' % (name, label, value, total))
+		lines.append('%s_count{%s="%s"} %d' % (name, label, value, count))
+
+metrics = Metrics()
+
+# Label of a route: name of the API function serving it (HEAD is answered by the GET one)
+def route_name(route, method):
+	if route is None:
+		return "unmatched"
+	api = route.get(method) or route.get('GET')
+	if api is not None:
+		return api.__name__
+	return route.get('file', "unmatched")
+
+# Label of an outbound call, from its URL
+def upstream_target(url):
+	url = str(url)
+	if url.startswith(influxLocalServer.split('/query')[0]):
+		return "influx_local"
+	if url.startswith(influxServer.split('/query')[0]):
+		return "influx_global"
+	if url.startswith(PROFESS_ADDRESS):
+		return "profess"
+	if url.startswith(evconnector_url):
+		return "evconnector"
+	return "other"
+
+# Losing future of a hedged request: its connection goes back to the pool
+def close_response(future):
+	if future.exception() is None:
+		future.result().close()
+
+# Outbound HTTP request (same arguments of requests.request), timed by target
+# (session: a requests.Session to reuse its connections)
+def upstream_request(method, url, session=None, **kwargs):
+	start = time.time()
+	status = "error"
+	try:
+		response = (session or requests).request(method, url, **kwargs)
+		status = response.status_code
+		return response
+	finally:
+		metrics.upstream_finished(upstream_target(url), status, time.time() - start)
+
+# ------------------------------------------------------------------------------------ #
+# 				REQUEST CONTEXT
+# ------------------------------------------------------------------------------------ #
+# call_api() gives every API execution a deadline (route 'deadline', INFLUX_DEADLINE)
+# and a set of degraded marks, kept by the thread serving it and handed over to the
+# threads querying on its behalf (run_with_context). Responses built while a fallback
+# was used are marked as degraded (X-Degraded header, never cached).
+# ------------------------------------------------------------------------------------ #
+requestContext = threading.local()
+
+class DegradedContent(object):
+	__slots__ = ('content', 'reasons')
+
+	def __init__(self, content, reasons):
+		self.content = content
+		self.reasons = reasons
+
+def request_context():
+	return (getattr(requestContext, 'deadline', None), getattr(requestContext, 'degraded', None))
+
+def run_with_context(context, function, *args):
+	previous = request_context()
+	requestContext.deadline, requestContext.degraded = context
+	try:
+		return function(*args)
+	finally:
+		requestContext.deadline, requestContext.degraded = previous
+
+def mark_degraded(reason):
+	degraded = getattr(requestContext, 'degraded', None)
+	if degraded is not None:
+		degraded.add(reason)
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+	pass
+
+class CircuitOpenError(requests.exceptions.ConnectionError):
+	pass
+
+# closed -> (INFLUX_BREAKER_FAILURES consecutive failures) -> open -> (cooldown) -> half-open:
+# a single probe is let through, closing the circuit again or reopening it
+class CircuitBreaker(object):
+	def __init__(self, failures=INFLUX_BREAKER_FAILURES, cooldown=INFLUX_BREAKER_COOLDOWN):
+		self.threshold = failures
+		self.cooldown  = cooldown
+		self.lock      = threading.Lock()
+		self.failures  = 0
+		self.openedAt  = None
+		self.probing   = False
+		self.opened    = 0
+		self.rejected  = 0
+
+	def allow(self):
+		with self.lock:
+			if self.openedAt is None:
+				return True
+			if(self.probing == False and time.time() - self.openedAt >= self.cooldown):
+				self.probing = True
+				return True
+			self.rejected += 1
+			return False
+
+	def succeeded(self):
+		with self.lock:
+			self.failures = 0
+			self.openedAt = None
+			self.probing  = False
+
+	def failed(self):
+		with self.lock:
+			self.failures += 1
+			if(self.probing == True or (self.openedAt is None and self.failures >= self.threshold)):
+				if self.openedAt is None:
+					self.opened += 1
+				self.openedAt = time.time()
+			self.probing = False
+
+	def state(self):
+		with self.lock:
+			if self.openedAt is None:
+				return "closed"
+			if(self.probing == True or time.time() - self.openedAt >= self.cooldown):
+				return "half-open"
+			return "open"
+
+# ------------------------------------------------------------------------------------ #
+# 				INFLUXDB CLIENT
+# ------------------------------------------------------------------------------------ #
+# Every query of the APIs goes through influxClient.query(service_path):
+# the first part of the URL (e.g. http://10.8.0.50:8086) selects a requests.Session,
+# whose pool keeps up to INFLUX_POOL_SIZE keep-alive connections towards that endpoint.
+# Failed connections and 502/503/504 are retried with exponential backoff, while a
+# query can never block a server thread for more than the configured timeouts, nor
+# go past the deadline of the request. Every endpoint has its own circuit breaker.
+# ------------------------------------------------------------------------------------ #
+class InfluxClient(object):
+	def __init__(self, pool_size=INFLUX_POOL_SIZE, retries=INFLUX_RETRIES, backoff=INFLUX_BACKOFF):
+		self.pool_size = pool_size
+		self.retries   = retries
+		self.backoff   = backoff
+		self.lock      = threading.Lock()
+		self.sessions  = {}
+		self.breakers  = {}
+		self.latencies = {}
+		self.executor  = None
+		self.hedgeExecutor = None
+		self.hedges        = 0
+		self.hedgeWins     = 0
+		self.deadlines     = 0
+		self.fallbackLocal = 0
+		self.fallbackStale = 0
+
+	def session(self, endpoint):
+		session = self.sessions.get(endpoint)
+		if session is not None:
+			return session
+		with self.lock:
+			session = self.sessions.get(endpoint)
+			if session is None:
+				retry = Retry(total=self.retries, connect=self.retries, read=0, status=self.retries,
+					      backoff_factor=self.backoff, status_forcelist=(502, 503, 504),
+					      allowed_methods=frozenset(['GET', 'POST']), raise_on_status=False)
+				adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size, max_retries=retry)
+				session = requests.Session()
+				session.headers['Accept-Encoding'] = 'gzip'
+				session.mount('http://', adapter)
+				session.mount('https://', adapter)
+				self.sessions[endpoint] = session
+		return session
+
+	def breaker(self, endpoint):
+		breaker = self.breakers.get(endpoint)
+		if breaker is None:
+			with self.lock:
+				breaker = self.breakers.setdefault(endpoint, CircuitBreaker())
+		return breaker
+
+	# service_path: InfluxDB HTTP API URL, e.g. influxServer + database + "&q=select ..."
+	# stream: the body is read by the caller (close the response to release the connection)
+	# epoch: timestamps as epoch numbers with the given precision instead of RFC3339 strings
+	# mirror: queries of the global DWH within the local mirror are sent to the local InfluxDB
+	def query(self, service_path, stream=False, epoch=None, mirror=True):
+		if(enableInfluxMirror == True and mirror == True):
+			mirrored = influxMirror.route(service_path)
+			if mirrored is not None:
+				try:
+					response = self.query(mirrored, stream, epoch, mirror=False)
+					if(response.status_code < 500):
+						return response
+					response.close()
+					influxMirror.failed("status " + str(response.status_code))
+				except requests.exceptions.RequestException as e:
+					influxMirror.failed(e)
+		endpoint = service_path.split('/query', 1)[0]
+		params   = {'epoch': epoch} if epoch is not None else None
+		timeout  = (INFLUX_CONNECT_TIMEOUT, INFLUX_READ_TIMEOUT)
+		deadline = request_context()[0]
+		if deadline is not None:
+			remaining = deadline - time.time()
+			if(remaining <= 0):
+				self.deadlines += 1
+				raise DeadlineExceeded("Deadline of the request exceeded before querying " + endpoint)
+			timeout = (min(INFLUX_CONNECT_TIMEOUT, remaining), min(INFLUX_READ_TIMEOUT, remaining))
+
+		breaker = self.breaker(endpoint)
+		if(breaker.allow() == False):
+			raise CircuitOpenError("Circuit open towards " + endpoint)
+		try:
+			if(enableHedging == True and stream == False):
+				response = self.hedged_request(endpoint, service_path, params, timeout)
+			else:
+				response = self.request(endpoint, service_path, params, timeout, stream)
+		except Exception:
+			breaker.failed()
+			raise
+		if(response.status_code >= 500):
+			breaker.failed()
+		else:
+			breaker.succeeded()
+		return response
+
+	def request(self, endpoint, service_path, params, timeout, stream=False):
+		start = time.time()
+		response = upstream_request('GET', service_path, session=self.session(endpoint),
+					    auth=HTTPBasicAuth(username, password), params=params,
+					    timeout=timeout, stream=stream)
+		if(stream == False and response.status_code < 500):
+			latencies = self.latencies.get(endpoint)
+			if latencies is None:
+				latencies = self.latencies.setdefault(endpoint, collections.deque(maxlen=INFLUX_HEDGE_SAMPLES))
+			latencies.append(time.time() - start)
+		return response
+
+	# Same query sent again when the first one is slower than the p95 latency of the endpoint:
+	# the first response wins, the other one is closed when it arrives
+	def hedged_request(self, endpoint, service_path, params, timeout):
+		latencies = list(self.latencies.get(endpoint, ()))
+		if(len(latencies) < 20):
+			return self.request(endpoint, service_path, params, timeout)
+		delay = max(INFLUX_HEDGE_MIN_DELAY, float(np.percentile(latencies, 95)))
+		with self.lock:
+			if self.hedgeExecutor is None:
+				self.hedgeExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=2 * INFLUX_FANOUT_WORKERS)
+			executor = self.hedgeExecutor
+		first = executor.submit(self.request, endpoint, service_path, params, timeout)
+		try:
+			return first.result(timeout=delay)
+		except concurrent.futures.TimeoutError:
+			pass
+		self.hedges += 1
+		second  = executor.submit(self.request, endpoint, service_path, params, timeout)
+		pending = [first, second]
+		while(len(pending) > 0):
+			done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				if future.exception() is None:
+					if future is second:
+						self.hedgeWins += 1
+					for other in (first, second):
+						if other is not future:
+							other.add_done_callback(close_response)
+					return future.result()
+		return first.result()
+
+	# Open circuit (or failed query): the same query on the local InfluxDB, then the last
+	# cached result, even if expired. None: no fallback available
+	def fallback(self, service_path, epoch):
+		if(enableInfluxFallback == False):
+			return None
+		endpoint, separator, rest = service_path.partition('/query')
+		localEndpoint = influxLocalServer.split('/query', 1)[0]
+		if(endpoint != localEndpoint):
+			deadline, degraded = request_context()
+			if deadline is not None:
+				deadline = max(deadline, time.time() + INFLUX_FALLBACK_TIMEOUT)
+			try:
+				response = run_with_context((deadline, degraded), self.query, localEndpoint + separator + rest, False, epoch)
+				result   = InfluxResult.from_response(response, epoch=epoch)
+				if(result.failed() == False and result.empty() == False):
+					self.fallbackLocal += 1
+					mark_degraded("influx-local")
+					return result
+			except requests.exceptions.RequestException as e:
+				log_warning("[Residential][INFLUX] Local fallback failed: %s", e)
+		if(enableInfluxCache == True):
+			result = influxCache.get_stale(influx_cache_key(service_path, epoch))
+			if result is not None:
+				self.fallbackStale += 1
+				mark_degraded("stale-cache")
+				return result
+		return None
+
+	# Pooled sockets (and threads) cannot be shared with the parent process (pre-fork mode)
+	def after_fork(self):
+		self.lock      = threading.Lock()
+		self.sessions  = {}
+		self.breakers  = {}
+		self.latencies = {}
+		self.executor  = None
+		self.hedgeExecutor = None
+
+	def close(self):
+		with self.lock:
+			for session in self.sessions.values():
+				session.close()
+			self.sessions = {}
+			for executor in (self.executor, self.hedgeExecutor):
+				if executor is not None:
+					executor.shutdown(wait=False)
+			self.executor      = None
+			self.hedgeExecutor = None
+
+	def get_endpoints(self):
+		endpoints = {}
+		for endpoint, breaker in list(self.breakers.items()):
+			latencies = list(self.latencies.get(endpoint, ()))
+			endpoints[endpoint] = {
+				"state":    breaker.state(),
+				"failures": breaker.failures,
+				"opened":   breaker.opened,
+				"rejected": breaker.rejected,
+				"p95Ms":    round(float(np.percentile(latencies, 95)) * 1000.0, 3) if len(latencies) > 0 else None,
+			}
+		return endpoints
+
+	def get_counters(self):
+		breakers = list(self.breakers.values())
+		return {
+			"breakersOpen":     sum(1 for breaker in breakers if breaker.state() != "closed"),
+			"breakerOpened":    sum(breaker.opened for breaker in breakers),
+			"breakerRejected":  sum(breaker.rejected for breaker in breakers),
+			"deadlineExceeded": self.deadlines,
+			"hedges":           self.hedges,
+			"hedgeWins":        self.hedgeWins,
+			"fallbackLocal":    self.fallbackLocal,
+			"fallbackStale":    self.fallbackStale,
+		}
+
+	# Decoded (columnar) result of the query, shared through influxCache: the caller must
+	# not modify it. With the global InfluxDB unreachable (open circuit, timeout, deadline)
+	# it is the result of the fallback (local InfluxDB or stale cache), the error is raised
+	# again if there is none
+	def query_result(self, service_path, epoch=INFLUX_EPOCH):
+		try:
+			return self.cached_result(service_path, epoch)
+		except requests.exceptions.RequestException as e:
+			result = self.fallback(service_path, epoch)
+			if result is None:
+				raise
+			log_warning("[Residential][INFLUX] Degraded result (%s): %s", e, service_path)
+			return result
+
+	# Response of the query and its decoded result. A server error still failing after the
+	# retries (5xx) is raised as a timeout is: query_result takes the fallback for both
+	def decoded_result(self, service_path, epoch=INFLUX_EPOCH):
+		response = self.query(service_path, epoch=epoch)
+		if(response.status_code >= 500):
+			raise requests.exceptions.HTTPError("InfluxDB answered " + str(response.status_code) + ": " + service_path, response=response)
+		return response, InfluxResult.from_response(response, epoch=epoch)
+
+	def cached_result(self, service_path, epoch=INFLUX_EPOCH):
+		if(enableInfluxCache == False):
+			return self.decoded_result(service_path, epoch)[1]
+		key = influx_cache_key(service_path, epoch)
+		result = influxCache.get(key)
+		if result is not None:
+			return result
+		if(enableDayChunks == True):
+			window = influx_day_window(service_path, epoch)
+			if window is not None:
+				result = self.query_days(window, epoch)
+				if result is not None:
+					# The assembled window is cached as well (with its formatted timestamps)
+					if(result.failed() == False):
+						influxCache.put(key, result, result.size(), influx_cache_ttl(key[2]))
+					return result
+		response, result = self.decoded_result(service_path, epoch)
+		if(result.failed() == False):
+			influxCache.put(key, result, len(response.content), influx_cache_ttl(key[2]))
+		return result
+
+	# Result of a day window, assembled from the cached days (None: the query cannot be split,
+	# e.g. it returns several series)
+	def query_days(self, window, epoch=INFLUX_EPOCH):
+		days = {}
+		runs = []
+		settledDay = datetime.utcnow().toordinal() - 1
+		for day in range(window.firstDay, window.lastDay):
+			chunk = influxCache.get(window.key + (day,))
+			if(chunk is None and enableDiskCache == True and day < settledDay):
+				chunk = influxDiskCache.get(window.key, day)
+				if chunk is not None:
+					influxCache.put(window.key + (day,), chunk, influx_chunk_size(chunk), INFLUX_CACHE_TTL_SETTLED)
+			if chunk is not None:
+				days[day] = chunk
+			elif(len(runs) > 0 and runs[-1][1] == day):
+				runs[-1][1] = day + 1
+			else:
+				runs.append([day, day + 1])
+
+		if(len(runs) > 0):
+			settled    = []
+			statements = [window.statement(firstDay, lastDay) for firstDay, lastDay in runs]
+			# A plain ';' of the query string separates the parameters for InfluxDB (Go < 1.17)
+			# or makes it reject the query (Go >= 1.17): it must be encoded
+			result = self.decoded_result(window.prefix + "%3B".join(statements), epoch)[1]
+			if(result.failed() == True):
+				return result
+			if(len(result.statements) != len(runs) or any(len(series) > 1 for meta, series in result.statements)):
+				return None
+			for (firstDay, lastDay), (meta, series) in zip(runs, result.statements):
+				bounds = np.zeros(lastDay - firstDay + 1, dtype=np.int64)
+				if(len(series) > 0):
+					bounds = np.searchsorted(series[0].time, (np.arange(firstDay, lastDay + 1) - EPOCH_DAY) * DAY_MS)
+				for offset, day in enumerate(range(firstDay, lastDay)):
+					start, end = bounds[offset], bounds[offset + 1]
+					if(end > start):
+						chunk = influx_day_chunk(series[0], start, end)
+					else:
+						chunk = influx_empty_chunk()
+					days[day] = chunk
+					influxCache.put(window.key + (day,), chunk, influx_chunk_size(chunk), influx_window_ttl(datetime.fromordinal(day + 1)))
+					if(enableDiskCache == True and day < settledDay):
+						settled.append((day, chunk))
+			if(len(settled) > 0):
+				influxDiskCache.put_days(window.key, settled)
+
+		chunks = [days[day] for day in range(window.firstDay, window.lastDay)]
+		found  = [chunk for chunk in chunks if chunk[2] is not None]
+		if(len(found) == 0):
+			return InfluxResult.from_series(None)
+		name, tags, columns, time, values = found[0]
+		if any(chunk[2] != columns for chunk in found):
+			return None
+		if(len(chunks) == 1):
+			# Single day: the cached arrays themselves (e.g. memory maps of the disk cache)
+			return InfluxResult.from_series(InfluxSeries.from_columns(name, columns, time, values, tags, epoch))
+		dtype = np.result_type(*[chunk[4] for chunk in found])
+		times = []
+		valueRows = []
+		for day, chunk in zip(range(window.firstDay, window.lastDay), chunks):
+			if chunk[2] is None:
+				time, values = influx_null_chunk(day, window.stepMs, len(columns), dtype)
+			else:
+				time, values = chunk[3], chunk[4]
+			times.append(time)
+			valueRows.append(values)
+		series = InfluxSeries.from_columns(name, columns, np.concatenate(times), np.concatenate(valueRows, axis=1), tags, epoch)
+		return InfluxResult.from_series(series)
+
+	# Decoded results of several queries, in the same order, executed at the same time:
+	# an API combining N series waits for the slowest query instead of the sum of them.
+	# The first failed query raises its exception (as query_result does).
+	def query_results(self, service_paths, epoch=INFLUX_EPOCH):
+		if(len(service_paths) <= 1):
+			return [self.query_result(service_path, epoch) for service_path in service_paths]
+		with self.lock:
+			# Dedicated threads: the callers can already be workers of the server pools
+			if self.executor is None:
+				self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=INFLUX_FANOUT_WORKERS)
+			executor = self.executor
+		# The queries share the deadline (and the degraded marks) of the request
+		context = request_context()
+		futures = [executor.submit(run_with_context, context, self.query_result, service_path, epoch) for service_path in service_paths]
+		return [future.result() for future in futures]
+
+influxClient = InfluxClient()
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=influxClient.after_fork)
+
+# ------------------------------------------------------------------------------------ #
+# 				INFLUXDB RESULT (columnar)
+# ------------------------------------------------------------------------------------ #
+# influxClient.query_result(service_path) decodes the JSON body exactly once.
+# Every series exposes each value column as a float64 array, where null values are NaN
+# (flagged by the matching null mask), and its timestamps as int64 epoch milliseconds
+# (series.time). Columns are built on first access.
+# Queries are sent with epoch=INFLUX_EPOCH and gzip: timestamps travel as plain numbers
+# and become int64 arrays without any date parsing. APIs returning the timestamps as
+# strings ask for epoch=None instead: InfluxDB already formats them, and RFC3339 bodies
+# are not bigger once compressed.
+# ------------------------------------------------------------------------------------ #
+def influx_times(rows, epoch=None):
+	if(len(rows) > 0 and isinstance(rows[0][0], str)):
+		# RFC3339 in UTC, e.g. 2019-03-25T00:00:00Z
+		return np.array([row[0][:-1] if row[0].endswith('Z') else row[0] for row in rows], dtype='datetime64[ms]').astype(np.int64)
+	times = np.fromiter(map(itemgetter(0), rows), dtype=np.int64, count=len(rows))
+	if(epoch == 's'):
+		times *= 1000
+	return times
+
+# RFC3339 strings (as returned by InfluxDB) of int64 epoch milliseconds
+def rfc3339_strings(times):
+	times = np.asarray(times, dtype=np.int64)
+	if(not np.any(times % 1000)):
+		return np.datetime_as_string(times.astype('datetime64[ms]'), unit='s', timezone='UTC').tolist()
+	return [t[:-1].rstrip('0').rstrip('.') + 'Z' for t in np.datetime_as_string(times.astype('datetime64[ms]'), unit='ms', timezone='UTC').tolist()]
+
+# Timestamps (int64 epoch milliseconds) in the format of a query with the given epoch
+def influx_time_values(times, epoch=None):
+	if(epoch == 'ms'):
+		return times.tolist()
+	elif(epoch == 's'):
+		return (times // 1000).tolist()
+	return rfc3339_strings(times)
+
+def influx_column(rows, index):
+	try:
+		column = np.fromiter(map(itemgetter(index), rows), dtype=np.float64, count=len(rows))
+	except (TypeError, ValueError):
+		# Non numeric field (strings, booleans): kept as it is
+		column = np.array(list(map(itemgetter(index), rows)), dtype=object)
+	return column, influx_nulls(column)
+
+def influx_nulls(column):
+	if(column.dtype == object):
+		return np.equal(column, None)
+	return np.isnan(column)
+
+# Rows (JSON values) of decoded columns, e.g. for a series rebuilt from the day chunks
+def influx_rows(times, valueColumns, nullColumns):
+	columns = []
+	for column, nulls in zip(valueColumns, nullColumns):
+		values = column.tolist()
+		if(column.dtype != object):
+			# InfluxDB writes integral numbers without decimals (1000, not 1000.0)
+			for index in np.flatnonzero(np.isfinite(column) & (np.floor(column) == column)).tolist():
+				values[index] = int(values[index])
+			for index in np.flatnonzero(nulls).tolist():
+				values[index] = None
+		columns.append(values)
+	return list(map(list, zip(times, *columns)))
+
+# Runs of null values as (first null index, first valid index after the run)
+# The run ending the series is closed on the last index
+def null_runs(nulls):
+	edges = np.diff(np.concatenate(([False], nulls, [False])).astype(np.int8))
+	starts = np.flatnonzero(edges == 1)
+	ends   = np.minimum(np.flatnonzero(edges == -1), len(nulls) - 1)
+	return list(zip(starts.tolist(), ends.tolist()))
+
+# Power filters of the APIs (POSITIVE, NEGATIVE, ALL): null values are set to 0
+# (+ 0. turns the -0. left by np.clip into 0.)
+def filter_power(power, currfilter):
+	power = np.where(np.isnan(power), 0., power)
+	if(currfilter == "POSITIVE"):
+		return np.clip(power, 0., None) + 0.
+	elif(currfilter == "NEGATIVE"):
+		return np.clip(power, None, 0.) + 0.
+	return power
+
+# ------------------------------------------------------------------------------------ #
+# Missing buckets (nulls) of a power series, found once by run-length over the null mask.
+# Policies:
+#   zero:    every gap is integrated as 0 W, as the APIs always did
+#   hold:    every gap holds the last value before it (0 W before the first one)
+#   linear:  gaps interpolated between the buckets around them (the edges hold the
+#            closest value)
+#   exclude: only the valid buckets are integrated, gaps are not counted as 0 W
+#            (same as zero for the step rule)
+# ------------------------------------------------------------------------------------ #
+gapPolicies = ("zero", "hold", "linear", "exclude")
+
+def fill_gaps(time, power, nulls, policy):
+	if(policy == "hold"):
+		return power[np.maximum.accumulate(np.where(nulls, 0, np.arange(len(power))))]
+	if(policy == "linear" and nulls.any() and not nulls.all()):
+		power = np.array(power, dtype=np.float64)
+		power[nulls] = np.interp(time[nulls], time[~nulls], power[~nulls])
+	return power
+
+# End (epoch milliseconds) of the last bucket: end, or the width of the previous bucket
+def series_end(time, end=None):
+	if end is not None:
+		return max(float(end), float(time[-1]))
+	return float(time[-1] + (time[-1] - time[-2] if len(time) > 1 else 0))
+
+# Fraction of the series (first bucket to end) covered by valid buckets,
+# and its gaps as (start, end) epoch milliseconds
+def energy_gaps(time, nulls, end=None):
+	if(len(time) == 0):
+		return 0., []
+	bounds  = np.append(time[1:].astype(np.float64), series_end(time, end))
+	span    = bounds[-1] - time[0]
+	covered = float(np.sum((bounds - time)[~nulls]))
+	gaps    = [(int(time[start]), int(time[stop]) if nulls[stop] == False else int(bounds[-1])) for start, stop in null_runs(nulls)]
+	if(span <= 0):
+		return (0. if nulls.all() else 1.), gaps
+	return covered / span, gaps
+
+# ------------------------------------------------------------------------------------ #
+# Energy (Wh) of a power series (W), integrated over the timestamps of its buckets
+# (time: epoch milliseconds, as decoded by InfluxSeries) rather than over a uniform
+# axis rebuilt from the requested window. Rules:
+#   trapezoid: linear interpolation between consecutive buckets
+#   simpson:   quadratic interpolation (scipy), as the APIs always did
+#   step:      every bucket holds its value until the next one, the last one until
+#              end (epoch milliseconds) or for the width of the previous bucket:
+#              exact for the means of GROUP BY time()
+# Missing buckets follow policy (see fill_gaps), nulls being the mask of the series
+# ------------------------------------------------------------------------------------ #
+energyRules   = ("trapezoid", "simpson", "step")
+energySimpson = getattr(integrate, "simpson", None) or integrate.simps
+
+def integrate_energy(time, power, currfilter="ALL", rule=None, end=None, policy=None, nulls=None):
+	if rule is None:
+		rule = ENERGY_INTEGRATION
+	if policy is None:
+		policy = ENERGY_GAP_POLICY
+	if(rule not in energyRules):
+		raise ValueError("Unknown integration rule: " + str(rule))
+	if(policy not in gapPolicies):
+		raise ValueError("Unknown gap policy: " + str(policy))
+	if nulls is None:
+		nulls = np.isnan(power)
+	power = filter_power(fill_gaps(time, power, nulls, policy), currfilter)
+	if(len(power) == 0):
+		return 0.
+	seconds = (time - time[0]) / 1000.0
+	widths  = np.diff(seconds)
+	if(rule == "step"):
+		if end is not None:
+			last = max((end - time[-1]) / 1000.0, 0.)
+		else:
+			last = widths[-1] if len(widths) > 0 else 0.
+		return float(np.dot(power[:-1], widths) + power[-1] * last) / 3600
+	if(len(power) < 2):
+		return 0.
+	if(rule == "trapezoid"):
+		if(policy == "exclude"):
+			widths = np.where(nulls[1:] | nulls[:-1], 0., widths)
+		return float(np.dot(power[1:] + power[:-1], widths)) / 7200
+	if(policy == "exclude" and nulls.any()):
+		# Every run of valid buckets integrated on its own (the runs of the same length at once)
+		runs    = np.array(null_runs(~nulls), dtype=np.int64).reshape(-1, 2)
+		starts  = runs[:, 0]
+		lengths = runs[:, 1] + (nulls[runs[:, 1]] == False) - starts
+		energy  = 0.
+		for length in np.unique(lengths[lengths > 1]).tolist():
+			index   = starts[lengths == length][:, None] + np.arange(length)
+			energy += float(np.sum(energySimpson(power[index], x=seconds[index], axis=1)))
+		return energy / 3600
+	return float(energySimpson(power, x=seconds)) / 3600
+
+# Gaps as [start, end] RFC3339 strings
+def gap_strings(gaps):
+	times = rfc3339_strings([bound for gap in gaps for bound in gap])
+	return [times[index:index + 2] for index in range(0, len(times), 2)]
+
+# Result of the .../QUALITY routes: the energy together with the coverage and the gaps
+# of the series it has been integrated from
+def energy_quality(energy, policy, coverage, gaps):
+	return {"energy": energy, "unit": "Wh", "policy": policy.upper(), "coverage": round(coverage, 6), "gaps": gaps}
+
+class InfluxSeries(object):
+	__slots__ = ('name', 'tags', 'columns', 'rowList', 'epoch', 'epochTime', 'valueColumns', 'nullColumns', 'timeStrings')
+
+	def __init__(self, name, columns, rows, tags=None, epoch=None):
+		self.name         = name
+		self.tags         = tags
+		self.columns      = columns
+		self.rowList      = rows
+		self.epoch        = epoch
+		self.epochTime    = None
+		self.valueColumns = None
+		self.nullColumns  = None
+		self.timeStrings  = None
+
+	# Series already decoded: int64 epoch milliseconds and one array per value column
+	@classmethod
+	def from_columns(cls, name, columns, time, values, tags=None, epoch=None):
+		series = cls(name, columns, None, tags, epoch)
+		series.epochTime    = time
+		series.valueColumns = list(values)
+		series.nullColumns  = [influx_nulls(column) for column in series.valueColumns]
+		for array in [time] + series.valueColumns + series.nullColumns:
+			array.flags.writeable = False
+		return series
+
+	def __len__(self):
+		if(self.rowList is None):
+			return len(self.epochTime)
+		return len(self.rowList)
+
+	# Rows as decoded from the JSON body (built on first access for a series from columns)
+	@property
+	def table(self):
+		if(self.rowList is None):
+			self.rowList = influx_rows(influx_time_values(self.epochTime, self.epoch), self.valueColumns, self.nullColumns)
+		return self.rowList
+
+	# Timestamps (int64 epoch milliseconds), parsed on first access
+	@property
+	def time(self):
+		if(self.epochTime is None):
+			epochTime = influx_times(self.table, self.epoch)
+			epochTime.flags.writeable = False
+			self.epochTime = epochTime
+		return self.epochTime
+
+	# Value columns (and their null masks), decoded on first access
+	def decode(self):
+		if(self.valueColumns is None):
+			valueColumns = []
+			nullColumns  = []
+			for index in range(1, len(self.columns)):
+				column, nulls = influx_column(self.table, index)
+				# Results can be shared (influxCache): the APIs never modify them in place
+				column.flags.writeable = False
+				nulls.flags.writeable  = False
+				valueColumns.append(column)
+				nullColumns.append(nulls)
+			self.nullColumns  = nullColumns
+			self.valueColumns = valueColumns
+
+	@property
+	def values(self):
+		self.decode()
+		return self.valueColumns
+
+	@property
+	def nulls(self):
+		self.decode()
+		return self.nullColumns
+
+	def index(self, name=None):
+		if(name is None):
+			return 0
+		return self.columns.index(name) - 1
+
+	# Value column (the first one by default, e.g. "mean")
+	def column(self, name=None):
+		return self.values[self.index(name)]
+
+	def null(self, name=None):
+		return self.nulls[self.index(name)]
+
+	# RFC3339 strings (as returned by InfluxDB) of the selected samples
+	def time_strings(self, index=None):
+		if(self.rowList is not None and len(self.rowList) > 0 and isinstance(self.rowList[0][0], str)):
+			if(index is None):
+				return list(map(itemgetter(0), self.table))
+			return [self.table[i][0] for i in np.asarray(index).tolist()]
+		# Formatted once for all the samples when most of them are asked (e.g. cached series)
+		if(self.timeStrings is None and (index is None or len(index) * 2 >= len(self))):
+			self.timeStrings = rfc3339_strings(self.time)
+		if self.timeStrings is None:
+			return rfc3339_strings(self.time[index])
+		if(index is None):
+			return list(self.timeStrings)
+		return [self.timeStrings[i] for i in np.asarray(index).tolist()]
+
+	# Rows in the InfluxDB format (RFC3339 timestamps)
+	def rows(self):
+		if(self.rowList is None and self.epoch is None):
+			self.rowList = influx_rows(self.time_strings(), self.valueColumns, self.nullColumns)
+		elif(self.rowList is None):
+			return influx_rows(self.time_strings(), self.valueColumns, self.nullColumns)
+		if(len(self.rowList) > 0 and not isinstance(self.rowList[0][0], str)):
+			return [[timeString] + row[1:] for row, timeString in zip(self.rowList, self.time_strings())]
+		return self.rowList
+
+	def to_json(self):
+		series = {"name": self.name}
+		if(self.tags is not None):
+			series["tags"] = self.tags
+		series["columns"] = self.columns
+		series["values"]  = self.rows()
+		return series
+
+class InfluxResult(object):
+	__slots__ = ('ok', 'error', 'statements')
+
+	def __init__(self, document, ok=True, epoch=None):
+		self.ok         = ok
+		self.error      = document.get('error')
+		self.statements = []
+		for statement in document.get('results', []):
+			meta   = dict((key, value) for key, value in statement.items() if key != 'series')
+			series = [InfluxSeries(s.get('name'), s.get('columns', []), s.get('values', []), s.get('tags'), epoch) for s in statement.get('series', [])]
+			self.statements.append((meta, series))
+
+	@classmethod
+	def from_response(cls, response, epoch=None):
+		return cls(response.json(), ok=response.ok, epoch=epoch)
+
+	# Result of a single statement returning the series (None: no series)
+	@classmethod
+	def from_series(cls, series):
+		result = cls({"results": []})
+		result.statements.append(({"statement_id": 0}, [series] if series is not None else []))
+		return result
+
+	def series(self, statement=0, index=0):
+		try:
+			return self.statements[statement][1][index]
+		except IndexError:
+			return None
+
+	# Failed query, or statement without any series
+	def empty(self, statement=0):
+		return (self.ok == False or self.series(statement) is None)
+
+	# Approximate memory taken by the decoded columns (and their formatted timestamps)
+	def size(self):
+		size = 64
+		for meta, series in self.statements:
+			for s in series:
+				if s.epochTime is not None:
+					size += s.epochTime.nbytes + sum(column.nbytes for column in s.valueColumns or []) + 64 * len(s)
+		return size
+
+	# Failed query, or statement with an error (e.g. a partial result)
+	def failed(self):
+		return (self.ok == False or self.error is not None or any('error' in meta for meta, series in self.statements))
+
+	# Same document returned by InfluxDB
+	def to_json(self):
+		if(self.error is not None and len(self.statements) == 0):
+			return {"error": self.error}
+		results = []
+		for meta, series in self.statements:
+			statement = dict(meta)
+			if(len(series) > 0):
+				statement["series"] = [s.to_json() for s in series]
+			results.append(statement)
+		return {"results": results}
+
+	def __str__(self):
+		return str(self.to_json())
+
+# ------------------------------------------------------------------------------------ #
+# 				INFLUXDB QUERY CACHE
+# ------------------------------------------------------------------------------------ #
+# influxClient.query_result() keeps the decoded results in influxCache, keyed by
+# (endpoint, database, query, epoch), and shares them among all the requests asking for
+# the same query (e.g. over_production and evaluate_production both select
+# "P-Grid" < 0 on the same window). Entries expire after a TTL depending on the end of
+# the window: results of settled days are kept until the LRU evicts them, yesterday
+# and today are queried again after INFLUX_CACHE_TTL_YESTERDAY/INFLUX_CACHE_TTL_LIVE.
+# Failed queries are never cached. Expired entries stay until the LRU evicts them: they
+# are the last resort when the InfluxDB servers cannot be reached (get_stale).
+# ------------------------------------------------------------------------------------ #
+class QueryCache(object):
+	def __init__(self, max_bytes=INFLUX_CACHE_BYTES):
+		self.maxBytes  = max_bytes
+		self.lock      = threading.Lock()
+		self.entries   = collections.OrderedDict() # key: (value, size, expires), least recently used first
+		self.bytes     = 0
+		self.hits      = 0
+		self.misses    = 0
+		self.expired   = 0
+		self.evictions = 0
+		self.rejected  = 0
+		self.stale     = 0
+
+	def get(self, key):
+		now = time.monotonic()
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				self.misses += 1
+				return None
+			if(entry[2] <= now):
+				self.expired += 1
+				self.misses  += 1
+				return None
+			self.entries.move_to_end(key)
+			self.hits += 1
+			return entry[0]
+
+	# Entry even if expired (None: never cached or evicted)
+	def get_stale(self, key):
+		with self.lock:
+			entry = self.entries.get(key)
+			if entry is None:
+				return None
+			self.entries.move_to_end(key)
+			self.stale += 1
+			return entry[0]
+
+	def put(self, key, value, size, ttl):
+		# A single result taking more than a quarter of the budget would flush the cache
+		if(size > self.maxBytes // 4 or ttl <= 0):
+			with self.lock:
+				self.rejected += 1
+			return
+		with self.lock:
+			entry = self.entries.pop(key, None)
+			if entry is not None:
+				self.bytes -= entry[1]
+			self.entries[key] = (value, size, time.monotonic() + ttl)
+			self.bytes += size
+			while(self.bytes > self.maxBytes):
+				oldKey, (oldValue, oldSize, oldExpires) = self.entries.popitem(last=False)
+				self.bytes     -= oldSize
+				self.evictions += 1
+
+	def clear(self):
+		with self.lock:
+			self.entries.clear()
+			self.bytes = 0
+
+	# Every process of the pre-fork mode has its own cache
+	def after_fork(self):
+		self.lock = threading.Lock()
+		self.clear()
+
+	def get_counters(self):
+		with self.lock:
+			return {
+				"hits":      self.hits,
+				"misses":    self.misses,
+				"expired":   self.expired,
+				"evictions": self.evictions,
+				"rejected":  self.rejected,
+				"stale":     self.stale,
+				"entries":   len(self.entries),
+				"bytes":     self.bytes,
+				"maxBytes":  self.maxBytes,
+			}
+
+influxCache = QueryCache()
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=influxCache.after_fork)
+
+# Canonical key of a query: the same InfluxQL written with different spacing is the same entry
+def influx_cache_key(service_path, epoch=None):
+	endpoint, _, queryString = service_path.partition('/query?')
+	fields, _, query = queryString.partition('q=')
+	database = ""
+	for field in fields.split('&'):
+		if field.startswith('db='):
+			database = field[3:]
+	return (endpoint, database, " ".join(query.split()), epoch)
+
+influxWindowEnd = re.compile(r"\btime\s*<=?\s*'([^']+)'", re.IGNORECASE)
+
+# Seconds a result can be reused, from the upper bound of its time window (UTC)
+def influx_cache_ttl(query):
+	match = influxWindowEnd.search(query)
+	if match is None:
+		return INFLUX_CACHE_TTL_LIVE
+	try:
+		end = datetime.fromisoformat(match.group(1).replace('Z', ''))
+	except ValueError:
+		return INFLUX_CACHE_TTL_LIVE
+	if end.tzinfo is not None:
+		end = end.astimezone(tz.utc).replace(tzinfo=None)
+	return influx_window_ttl(end)
+
+def influx_window_ttl(end):
+	today = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+	if(end <= today - timedelta(days=1)):
+		return INFLUX_CACHE_TTL_SETTLED
+	elif(end <= today):
+		return INFLUX_CACHE_TTL_YESTERDAY
+	return INFLUX_CACHE_TTL_LIVE
+
+# ------------------------------------------------------------------------------------ #
+# Day chunks: a query on whole days (e.g. 2019-03-01 00:00:00 - 2019-03-31 23:59:59)
+# grouped by an interval dividing the day is cached as one entry per day, so windows
+# overlapping a cached one (2019-03-15/2019-04-10) only fetch the missing days, with a
+# single request (one statement per run of consecutive missing days). Every day is
+# queried as [00:00:00, next day 00:00:00) and kept as columns (int64 timestamps and a
+# float64 array per value column). Days without any point are rebuilt with null
+# buckets, as InfluxDB fills the empty buckets of a window (fill(null)).
+# ------------------------------------------------------------------------------------ #
+DAY_MS    = 86400000
+EPOCH_DAY = datetime(1970, 1, 1).toordinal()
+
+influxDayQuery = re.compile(r"^(?P<head>select .+? where )time > '(?P<fromDate>[^']+)' and time < '(?P<toDate>[^']+)'(?P<tail>.*? group by time\((?P<every>\d+)(?P<unit>[mhd])\)\s*)$", re.IGNORECASE | re.DOTALL)
+influxDayUnsupported = re.compile(r"\btime\s*[<>=]|\bfill\(|\blimit\b|\boffset\b|\border\b|\btz\(|\binto\b|;", re.IGNORECASE)
+influxDayMinutes = {'m': 1, 'h': 60, 'd': 1440}
+
+class InfluxDayWindow(object):
+	__slots__ = ('prefix', 'head', 'tail', 'firstDay', 'lastDay', 'stepMs', 'key')
+
+	# Statement selecting the days [firstDay, lastDay) (ordinals)
+	def statement(self, firstDay, lastDay):
+		return (self.head + "time >= '" + str(datetime.fromordinal(firstDay)) + "' and time < '"
+			+ str(datetime.fromordinal(lastDay)) + "'" + self.tail)
+
+# Day window of the query, or None when it cannot be split in days
+def influx_day_window(service_path, epoch=None):
+	if(epoch not in (None, 'ms', 's')):
+		return None
+	prefix, _, query = service_path.partition('q=')
+	match = influxDayQuery.match(query.strip())
+	if match is None or influxDayUnsupported.search(match.group('head') + match.group('tail')) is not None:
+		return None
+	minutes = int(match.group('every')) * influxDayMinutes[match.group('unit').lower()]
+	if(minutes == 0 or 1440 % minutes != 0):
+		return None
+	try:
+		fromDate = datetime.fromisoformat(match.group('fromDate'))
+		toDate   = datetime.fromisoformat(match.group('toDate'))
+	except ValueError:
+		return None
+	if(fromDate.time() != fromDate.min.time() or fromDate.tzinfo is not None or toDate.tzinfo is not None):
+		return None
+	# Windows end at midnight, or at 23:59:59 as written by the APIs
+	if(toDate.time() == fromDate.min.time()):
+		lastDay = toDate.toordinal()
+	elif(toDate.hour == 23 and toDate.minute == 59 and toDate.second == 59):
+		lastDay = toDate.toordinal() + 1
+	else:
+		return None
+	window = InfluxDayWindow()
+	window.prefix   = prefix + 'q='
+	window.head     = match.group('head')
+	window.tail     = match.group('tail')
+	window.firstDay = fromDate.toordinal()
+	window.lastDay  = lastDay
+	window.stepMs   = minutes * 60000
+	# Days hold int64 timestamps: they are shared by the queries of any epoch
+	window.key      = influx_cache_key(window.prefix + window.head + "$DAY" + window.tail)[:3]
+	if(window.lastDay <= window.firstDay):
+		return None
+	return window
+
+# Chunk of a day: (name, tags, columns, time, values), values being a 2D array with a row
+# per value column. Days without any point have no columns.
+def influx_empty_chunk():
+	return (None, None, None, np.zeros(0, dtype=np.int64), None)
+
+def influx_chunk_size(chunk):
+	return 64 + chunk[3].nbytes + (chunk[4].nbytes if chunk[4] is not None else 0)
+
+# Day of a fetched series, copied out of it (the cached days must not keep the whole window)
+def influx_day_chunk(series, start, end):
+	time   = np.array(series.time[start:end])
+	values = np.array([column[start:end] for column in series.values])
+	time.flags.writeable   = False
+	values.flags.writeable = False
+	return (series.name, series.tags, series.columns, time, values)
+
+# Null buckets of a day without any point
+def influx_null_chunk(day, stepMs, width, dtype=np.float64):
+	time = (day - EPOCH_DAY) * DAY_MS + np.arange(0, DAY_MS, stepMs, dtype=np.int64)
+	return time, np.full((width - 1, len(time)), np.nan if dtype == np.float64 else None, dtype=dtype)
+
+# Name of the files of a key in the disk caches (same key, same name across restarts)
+def cache_filename(key):
+	return hashlib.sha1(repr(key).encode('UTF-8')).hexdigest()[:24]
+
+# Atomic write (readers, other processes included, never see a partial file): write
+# is given the binary file object of a temporary file, which then replaces filename
+def atomic_write(filename, write):
+	temporary = filename + "." + str(os.getpid()) + "." + str(threading.get_ident()) + ".tmp"
+	with open(temporary, 'wb') as tmpFile:
+		write(tmpFile)
+	os.replace(temporary, filename)
+
+# ------------------------------------------------------------------------------------ #
+# 				INFLUXDB DISK CACHE
+# ------------------------------------------------------------------------------------ #
+# Settled days of the day chunks are also written under INFLUX_DISK_CACHE_DIR, so that
+# they survive the restarts of the aggregator: a directory per query (measurement,
+# field, filter and interval) with its meta.json, a raw float64 segment per day (first
+# row: the timestamps as int64 bits, then a row per value column; empty for a day
+# without points). Days are read back as read-only memory maps (no copy, no parsing).
+# Nothing is read at startup: a day is opened when it is asked, and the size of the
+# store is measured on the first write. Past INFLUX_DISK_CACHE_BYTES the least
+# recently used days are removed.
+# ------------------------------------------------------------------------------------ #
+class DiskCache(object):
+	def __init__(self, path, max_bytes=INFLUX_DISK_CACHE_BYTES):
+		self.path     = path
+		self.maxBytes = max_bytes
+		self.lock     = threading.Lock()
+		self.meta     = {}    # directory: (name, tags, columns)
+		self.bytes    = None  # Size of the store, measured on the first write
+		self.writer   = None  # Thread writing the days (the requests never wait for the disk)
+		self.hits     = 0
+		self.misses   = 0
+		self.writes   = 0
+		self.trimmed  = 0
+		self.errors   = 0
+
+	def directory(self, key):
+		return os.path.join(self.path, cache_filename(key))
+
+	def read_meta(self, directory):
+		meta = self.meta.get(directory)
+		if meta is None:
+			with open(os.path.join(directory, "meta.json")) as metaFile:
+				document = json.load(metaFile)
+			meta = (document["name"], document["tags"], document["columns"])
+			self.meta[directory] = meta
+		return meta
+
+	# Chunk of the day, or None
+	def get(self, key, day):
+		directory = self.directory(key)
+		filename  = os.path.join(directory, str(day) + ".f64")
+		try:
+			with open(filename, 'rb') as dayFile:
+				if(os.fstat(dayFile.fileno()).st_size == 0):
+					chunk = influx_empty_chunk()
+				else:
+					name, tags, columns = self.read_meta(directory)
+					segment = mmap.mmap(dayFile.fileno(), 0, access=mmap.ACCESS_READ)
+					matrix  = np.frombuffer(segment, dtype=np.float64).reshape(len(columns), -1)
+					chunk   = (name, tags, columns, matrix[0].view(np.int64), matrix[1:])
+			# Access time of the LRU trimming
+			os.utime(filename)
+		except FileNotFoundError:
+			self.misses += 1
+			return None
+		except (OSError, ValueError, KeyError) as e:
+			self.errors += 1
+			log_warning("[Residential][CACHE] Unreadable day %s: %s", filename, e)
+			return None
+		self.hits += 1
+		return chunk
+
+	# Writes the (day, chunk) pairs in the background
+	def put_days(self, key, days):
+		with self.lock:
+			if self.writer is None:
+				self.writer = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+			writer = self.writer
+		writer.submit(self.write_days, key, days)
+
+	def write_days(self, key, days):
+		for day, chunk in days:
+			self.put(key, day, chunk)
+
+	def put(self, key, day, chunk):
+		name, tags, columns, time, values = chunk
+		if(values is not None and values.dtype != np.float64):
+			return
+		directory = self.directory(key)
+		filename  = os.path.join(directory, str(day) + ".f64")
+		try:
+			os.makedirs(directory, exist_ok=True)
+			if columns is not None:
+				try:
+					if(self.read_meta(directory)[2] != columns):
+						return
+				except FileNotFoundError:
+					atomic_write(os.path.join(directory, "meta.json"),
+							lambda metaFile: metaFile.write(json.dumps({"name": name, "tags": tags, "columns": columns}).encode('UTF-8')))
+				matrix = np.empty((len(columns), len(time)), dtype=np.float64)
+				matrix[0].view(np.int64)[:] = time
+				matrix[1:] = values
+			else:
+				matrix = np.zeros(0, dtype=np.float64)
+			atomic_write(filename, matrix.tofile)
+			size = os.path.getsize(filename)
+		except (OSError, ValueError) as e:
+			self.errors += 1
+			log_warning("[Residential][CACHE] Cannot write day %s: %s", filename, e)
+			return
+		self.writes += 1
+		with self.lock:
+			if self.bytes is None:
+				self.bytes = self.measure()
+			else:
+				self.bytes += size
+			if(self.bytes > self.maxBytes):
+				self.trim()
+
+	def days(self):
+		files = []
+		for directory in os.scandir(self.path):
+			if directory.is_dir():
+				for entry in os.scandir(directory.path):
+					if entry.name.endswith(".f64"):
+						try:
+							stat = entry.stat()
+						except FileNotFoundError:
+							continue
+						files.append((stat.st_mtime, stat.st_size, entry.path))
+		return files
+
+	def measure(self):
+		return sum(size for mtime, size, path in self.days())
+
+	# Removes the least recently used days, down to 90% of the budget
+	def trim(self):
+		files = sorted(self.days())
+		self.bytes = sum(size for mtime, size, path in files)
+		for mtime, size, path in files:
+			if(self.bytes <= self.maxBytes * 0.9):
+				break
+			try:
+				os.remove(path)
+			except FileNotFoundError:
+				pass
+			self.bytes   -= size
+			self.trimmed += 1
+
+	# Every process of the pre-fork mode measures the store again
+	def after_fork(self):
+		self.lock   = threading.Lock()
+		self.bytes  = None
+		self.writer = None
+
+	def get_counters(self):
+		return {
+			"diskHits":    self.hits,
+			"diskMisses":  self.misses,
+			"diskWrites":  self.writes,
+			"diskTrimmed": self.trimmed,
+			"diskErrors":  self.errors,
+			"diskBytes":   self.bytes if self.bytes is not None else 0,
+		}
+
+influxDiskCache = DiskCache(os.path.join(here, INFLUX_DISK_CACHE_DIR))
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=influxDiskCache.after_fork)
+
+# Counters of the memory and of the disk caches, and of the daily energy index (SERVER/cache, METRICS)
+def influx_cache_counters():
+	counters = influxCache.get_counters()
+	counters.update(influxDiskCache.get_counters())
+	counters.update(energyIndex.get_counters())
+	return counters
+
+# ------------------------------------------------------------------------------------ #
+# 				INFLUXDB LOCAL MIRROR
+# ------------------------------------------------------------------------------------ #
+# The measurements of INFLUX_MIRROR_SERIES are copied, from INFLUX_MIRROR_SINCE on, from
+# the global DWH into the local InfluxDB (same measurements, tags and fields, database
+# name + INFLUX_MIRROR_SUFFIX). Every series has two bounds:
+#   watermark: the points of [since, watermark) have been copied. Each synchronization
+#              copies the points past the watermark (and INFLUX_MIRROR_OVERLAP before it)
+#              up to now - INFLUX_MIRROR_LAG, INFLUX_MIRROR_CHUNK days at a time
+#   settled:   the points of [since, settled) have been copied (once more) when they were
+#              already INFLUX_MIRROR_SETTLE old, so the points stored late by the gateways
+#              (up to INFLUX_MIRROR_SETTLE late) are in the mirror too
+# The worker runs in the process owning the state (see rest_server), the bounds are
+# shared with the other processes through INFLUX_MIRROR_STATE.
+# influxClient.query() sends the queries of the global DWH to the mirror (route) when
+# every statement selects a single mirrored measurement (sub-queries included), within
+# [since, settled). Timestamps are copied with a millisecond precision.
+# ------------------------------------------------------------------------------------ #
+influxMirrorFrom  = re.compile(r"\bfrom\s+(?:\"([^\"]+)\"|([\w-]+))(?!\s*\.)", re.IGNORECASE)
+influxMirrorStart = re.compile(r"\btime\s*>=?\s*'([^']+)'", re.IGNORECASE)
+
+# Epoch milliseconds of a time bound of a query (UTC), None if not a date
+def influx_bound_ms(value):
+	try:
+		bound = datetime.fromisoformat(value.replace('Z', ''))
+	except ValueError:
+		return None
+	if bound.tzinfo is not None:
+		bound = bound.astimezone(tz.utc).replace(tzinfo=None)
+	return (bound - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+
+# Line protocol escaping (measurements: commas and spaces, keys and tag values: equal signs too)
+def line_escape(value, special=", ="):
+	value = str(value)
+	for character in special:
+		value = value.replace(character, "\\" + character)
+	return value
+
+def line_field(value, fieldType):
+	if(fieldType == "integer"):
+		return str(int(value)) + "i"
+	if(fieldType == "boolean"):
+		return "true" if value else "false"
+	if(fieldType == "string"):
+		return '"' + str(value).replace("\\", "\\\\").replace('"', '\\"') + '"'
+	return repr(float(value))
+
+# (since, watermark, settled) of a series of the state: a state written before the
+# settled bound existed has nothing settled yet
+def mirror_bounds(bounds):
+	if(len(bounds) < 3):
+		return (bounds[0], bounds[1], bounds[0])
+	return tuple(bounds)
+
+class InfluxMirror(object):
+	def __init__(self, path):
+		self.path      = path
+		self.lock      = threading.Lock()
+		self.series    = {}    # (database, measurement): (since, watermark, settled) epoch ms
+		self.checkedAt = 0.0   # Last check of the state file
+		self.mtime     = None
+		self.thread    = None
+		self.stopped   = threading.Event()
+		self.routedLocal  = 0
+		self.routedGlobal = 0
+		self.localErrors  = 0
+		self.syncs        = 0
+		self.syncErrors   = 0
+		self.copied       = 0
+		self.lastSync     = None
+
+	# ------------------------------------------------------------------ #
+	# Routing
+	# ------------------------------------------------------------------ #
+	# Watermarks written by the worker (of any process), checked once per second
+	def refresh(self):
+		now = time.time()
+		if(now - self.checkedAt < 1.0):
+			return
+		self.checkedAt = now
+		try:
+			mtime = os.stat(self.path).st_mtime
+			if(mtime == self.mtime):
+				return
+			with open(self.path) as stateFile:
+				state = json.load(stateFile)
+		except FileNotFoundError:
+			return
+		except (OSError, ValueError) as e:
+			log_warning("[Residential][MIRROR] Unreadable state %s: %s", self.path, e)
+			return
+		series = {}
+		for database, measurements in state.items():
+			for measurement, bounds in measurements.items():
+				series[(database, measurement)] = mirror_bounds(bounds)
+		self.series = series
+		self.mtime  = mtime
+
+	# Same query on the mirror, or None when the global DWH must be queried
+	def route(self, service_path):
+		endpoint, _, queryString = service_path.partition('/query?')
+		if(endpoint != influxServer.split('/query', 1)[0]):
+			return None
+		self.refresh()
+		if(len(self.series) == 0):
+			return None
+		fields, _, query = queryString.partition('q=')
+		fields   = fields.split('&')
+		database = None
+		for field in fields:
+			if field.startswith('db='):
+				database = field[3:]
+		mirrored = False
+		for statement in query.replace("%3B", ";").split(';'):
+			if(statement.strip() == ""):
+				continue
+			sources = influxMirrorFrom.findall(statement)
+			starts  = [influx_bound_ms(bound) for bound in influxMirrorStart.findall(statement)]
+			ends    = [influx_bound_ms(bound) for bound in influxWindowEnd.findall(statement)]
+			# Sub-queries (e.g. pushdown_energy) repeat the bounds of the window
+			if(len(sources) != 1 or len(starts) == 0 or len(ends) == 0 or None in starts or None in ends):
+				return None
+			window = self.series.get((database, sources[0][0] or sources[0][1]))
+			if window is None:
+				return None
+			mirrored = True
+			if(min(starts) < window[0] or max(ends) >= window[2]):
+				self.routedGlobal += 1
+				return None
+		if(mirrored == False):
+			return None
+		self.routedLocal += 1
+		fields = [field if not field.startswith('db=') else 'db=' + database + INFLUX_MIRROR_SUFFIX for field in fields]
+		return influxLocalServer.split('/query', 1)[0] + '/query?' + '&'.join(fields) + 'q=' + query
+
+	def failed(self, error):
+		self.localErrors += 1
+		log_warning("[Residential][MIRROR] Local query failed, using the global DWH: %s", error)
+
+	# ------------------------------------------------------------------ #
+	# Synchronization
+	# ------------------------------------------------------------------ #
+	def start(self):
+		if self.thread is not None:
+			return
+		self.stopped.clear()
+		self.thread = threading.Thread(target=self.run, name="InfluxMirror", daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		self.stopped.set()
+		if self.thread is not None:
+			self.thread.join(5.0)
+			self.thread = None
+
+	def run(self):
+		log_info("[Residential][MIRROR] Synchronization started (every %s seconds)", INFLUX_MIRROR_INTERVAL)
+		while(self.stopped.is_set() == False):
+			try:
+				self.sync()
+			except Exception as e:
+				self.syncErrors += 1
+				log_error("[Residential][MIRROR] Synchronization failed: %s", e)
+			self.stopped.wait(INFLUX_MIRROR_INTERVAL)
+
+	def read_state(self):
+		try:
+			with open(self.path) as stateFile:
+				return json.load(stateFile)
+		except FileNotFoundError:
+			return {}
+
+	def write_state(self, state):
+		atomic_write(self.path, lambda stateFile: stateFile.write(json.dumps(state, indent=1, sort_keys=True).encode('UTF-8')))
+		self.checkedAt = 0.0
+
+	# Rows of a statement (no cache, no routing): list of (columns, values) per series
+	def select(self, address, database, statement):
+		response = influxClient.query(address + database + "&q=" + statement, epoch='ms', mirror=False)
+		if(response.status_code != 200):
+			raise requests.exceptions.HTTPError("InfluxDB answered " + str(response.status_code) + " to: " + statement)
+		document = response.json()
+		rows = []
+		for result in document.get("results", []):
+			if "error" in result:
+				raise requests.exceptions.HTTPError("InfluxDB error: " + str(result["error"]))
+			for series in result.get("series", []):
+				rows.append((series.get("columns", []), series.get("values", [])))
+		return rows
+
+	# POST to the local InfluxDB (path: /write or /query), expecting the given status
+	def post(self, path, params, data, expected):
+		endpoint = influxLocalServer.split('/query', 1)[0]
+		response = upstream_request('POST', endpoint + path, session=influxClient.session(endpoint),
+					    auth=HTTPBasicAuth(username, password), params=params, data=data,
+					    timeout=(INFLUX_CONNECT_TIMEOUT, INFLUX_READ_TIMEOUT))
+		if(response.status_code != expected):
+			raise requests.exceptions.HTTPError("Local InfluxDB answered " + str(response.status_code) + ": " + response.text[:200])
+
+	def write(self, database, lines):
+		self.post("/write", {'db': database, 'precision': 'ms'}, "\n".join(lines).encode('UTF-8'), 204)
+
+	def sync(self):
+		state = self.read_state()
+		for database, pattern in INFLUX_MIRROR_SERIES.items():
+			if(self.stopped.is_set() == True):
+				return
+			self.post("/query", {'q': "CREATE DATABASE \"" + database + INFLUX_MIRROR_SUFFIX + "\""}, None, 200)
+			for columns, values in self.select(influxServer, database, "SHOW MEASUREMENTS WITH MEASUREMENT =~ /" + pattern + "/"):
+				for (measurement,) in values:
+					self.sync_series(state, database, measurement)
+		self.syncs   += 1
+		self.lastSync = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+
+	def sync_series(self, state, database, measurement):
+		since  = influx_bound_ms(INFLUX_MIRROR_SINCE)
+		now    = int(time.time()) * 1000
+		bounds = list(mirror_bounds(state.get(database, {}).get(measurement, [since, since, since])))
+		state.setdefault(database, {})[measurement] = bounds
+		since, watermark, settled = bounds
+		end    = now - INFLUX_MIRROR_LAG * 1000
+		# Copied again once INFLUX_MIRROR_SETTLE old: the late points are included
+		settle = min(watermark, now - INFLUX_MIRROR_SETTLE * 1000)
+		start  = max(since, watermark - INFLUX_MIRROR_OVERLAP * 1000)
+		if(settled >= settle and start >= end):
+			return
+		fieldTypes = {}
+		for columns, values in self.select(influxServer, database, "SHOW FIELD KEYS FROM \"" + measurement + "\""):
+			for fieldKey, fieldType in values:
+				fieldTypes.setdefault(fieldKey, fieldType)
+		if(settled < settle):
+			self.copy(state, database, measurement, fieldTypes, settled, settle, now)
+		if(start < end):
+			self.copy(state, database, measurement, fieldTypes, start, end, now)
+
+	# Copies [start, end) in chunks, moving the bounds of the series after every chunk:
+	# the watermark, and the settled bound when the copy is contiguous to it and its points
+	# were already INFLUX_MIRROR_SETTLE old (copied at now)
+	def copy(self, state, database, measurement, fieldTypes, start, end, now):
+		prefix = line_escape(measurement, ", ")
+		bounds = state[database][measurement]
+		while(start < end and self.stopped.is_set() == False):
+			stop  = min(end, start + INFLUX_MIRROR_CHUNK * DAY_MS)
+			lines = []
+			for columns, values in self.select(influxServer, database, "select * from \"" + measurement + "\" where time >= "
+							   + str(start) + "ms and time < " + str(stop) + "ms"):
+				for row in values:
+					tags   = []
+					fields = []
+					for column, value in zip(columns[1:], row[1:]):
+						if value is None:
+							continue
+						fieldType = fieldTypes.get(column)
+						if fieldType is None:
+							tags.append(line_escape(column) + "=" + line_escape(value))
+						else:
+							fields.append(line_escape(column) + "=" + line_field(value, fieldType))
+					if(len(fields) > 0):
+						lines.append(prefix + "".join("," + tag for tag in sorted(tags)) + " " + ",".join(fields) + " " + str(row[0]))
+			for index in range(0, len(lines), INFLUX_MIRROR_BATCH):
+				self.write(database + INFLUX_MIRROR_SUFFIX, lines[index:index + INFLUX_MIRROR_BATCH])
+			self.copied += len(lines)
+			bounds[1] = max(bounds[1], stop)
+			if(bounds[2] >= start):
+				bounds[2] = max(bounds[2], min(stop, now - INFLUX_MIRROR_SETTLE * 1000))
+			self.write_state(state)
+			start = stop
+
+	# The worker belongs to the process which started it
+	def after_fork(self):
+		self.lock    = threading.Lock()
+		self.thread  = None
+		self.stopped = threading.Event()
+
+	def get_series(self):
+		self.refresh()
+		series = {}
+		for (database, measurement), (since, watermark, settled) in sorted(self.series.items()):
+			series[database + "/" + measurement] = {
+				"since":     datetime.utcfromtimestamp(since / 1000.0).strftime('%Y-%m-%d %H:%M:%S'),
+				"watermark": datetime.utcfromtimestamp(watermark / 1000.0).strftime('%Y-%m-%d %H:%M:%S'),
+				"settled":   datetime.utcfromtimestamp(settled / 1000.0).strftime('%Y-%m-%d %H:%M:%S'),
+			}
+		return series
+
+	def get_counters(self):
+		self.refresh()
+		watermarks = [watermark for since, watermark, settled in self.series.values()]
+		return {
+			"series":       len(watermarks),
+			"lagSeconds":   round(time.time() - min(watermarks) / 1000.0, 3) if len(watermarks) > 0 else None,
+			"routedLocal":  self.routedLocal,
+			"routedGlobal": self.routedGlobal,
+			"localErrors":  self.localErrors,
+			"syncs":        self.syncs,
+			"syncErrors":   self.syncErrors,
+			"pointsCopied": self.copied,
+		}
+
+influxMirror = InfluxMirror(os.path.join(here, INFLUX_MIRROR_STATE))
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=influxMirror.after_fork)
+
+# ------------------------------------------------------------------------------------ #
+# 				DAILY ENERGY INDEX
+# ------------------------------------------------------------------------------------ #
+# Energy (Wh) of every day from ENERGY_INDEX_SINCE on, for each (InfluxDB endpoint,
+# database, measurement, field, filter) asked to the ENERGY APIs: a day is integrated
+# once from its ENERGY_INDEX_STEP minutes means (step rule: additive over the days),
+# as soon as it is settled (SETTLED_DELAY). With the prefix sums of the days, the
+# energy of any range of settled days is a single subtraction, the recent days are
+# integrated live (and cached by influxCache as any query).
+# A table is created on first access: the days missing in the requested range are
+# filled at once (up to ENERGY_INDEX_SYNC days, otherwise the API integrates the
+# samples as usual), all the others are backfilled in the background, most recent
+# first. Tables are kept under ENERGY_INDEX_DIR as raw float64 arrays (a value per day,
+# NaN: not integrated yet), re-read when another process updates them.
+# ------------------------------------------------------------------------------------ #
+class EnergyTable(object):
+	__slots__ = ('values', 'prefix', 'mtime')
+
+	def __init__(self, values, mtime=None):
+		self.values = values
+		self.prefix = None
+		self.mtime  = mtime
+
+	# Energy of the days [first, last) (offsets from ENERGY_INDEX_SINCE), None if a day is missing
+	def energy(self, first, last):
+		if(np.isnan(self.values[first:last]).any() == True):
+			return None
+		if self.prefix is None:
+			self.prefix = np.concatenate(([0.], np.cumsum(np.where(np.isnan(self.values), 0., self.values))))
+		return float(self.prefix[last] - self.prefix[first])
+
+class EnergyIndex(object):
+	def __init__(self, path):
+		self.path       = path
+		self.lock       = threading.Lock()
+		self.tables     = {}   # key: EnergyTable
+		self.backfiller = None
+		self.pending    = set()
+		self.hits       = 0
+		self.misses     = 0
+		self.days       = 0
+		self.errors     = 0
+
+	def filename(self, key):
+		return os.path.join(self.path, cache_filename(key) + ".f64")
+
+	@staticmethod
+	def since():
+		return datetime.fromisoformat(ENERGY_INDEX_SINCE).toordinal()
+
+	# First day (ordinal) which is not settled yet
+	@staticmethod
+	def settled():
+		return (datetime.now(tz.utc) - SETTLED_DELAY).date().toordinal()
+
+	# Table of the key, extended up to the settled days (re-read if written by another process)
+	def table(self, key):
+		length   = self.settled() - self.since()
+		filename = self.filename(key)
+		with self.lock:
+			table = self.tables.get(key)
+			try:
+				mtime = os.stat(filename).st_mtime
+			except FileNotFoundError:
+				mtime = None
+			if(table is None or (mtime is not None and mtime != table.mtime)):
+				values = np.full(0, np.nan)
+				if mtime is not None:
+					try:
+						values = np.fromfile(filename, dtype=np.float64)
+					except (OSError, ValueError) as e:
+						self.errors += 1
+						log_warning("[Residential][ENERGY][INDEX] Unreadable table %s: %s", filename, e)
+				table = EnergyTable(values, mtime)
+				self.tables[key] = table
+			if(len(table.values) < length):
+				table.values = np.concatenate((table.values, np.full(length - len(table.values), np.nan)))
+				table.prefix = None
+			return table
+
+	# Energy of every day of [firstDay, lastDay) (ordinals), up to endMs (epoch ms), None on errors
+	def integrate_days(self, spec, firstDay, lastDay, endMs=None):
+		address, database, measurement, field, currfilter = spec
+		stepMs = ENERGY_INDEX_STEP * 60000
+		service_path = (address + database + "&q=select mean(\"" + field + "\") from \"" + str(measurement) + "\" where time >= '"
+				+ str(datetime.fromordinal(firstDay)) + "' and time < '" + str(datetime.fromordinal(lastDay)) + "' group by time("
+				+ str(ENERGY_INDEX_STEP) + "m)")
+		try:
+			result = influxClient.query_result(service_path)
+		except Exception as e:
+			self.errors += 1
+			log_warning("[Residential][ENERGY][INDEX] Query failed: %s", e)
+			return None
+		if(result.failed() == True):
+			self.errors += 1
+			log_warning("[Residential][ENERGY][INDEX] Query failed: %s", result)
+			return None
+		series = result.series()
+		if(series is None or len(series) == 0):
+			return np.zeros(lastDay - firstDay)
+		time   = series.time
+		widths = np.full(len(time), stepMs, dtype=np.float64)
+		if endMs is not None:
+			widths = np.clip(np.minimum(time + stepMs, endMs) - time, 0, None).astype(np.float64)
+		days = time // DAY_MS + (EPOCH_DAY - firstDay)
+		inside = (days >= 0) & (days < lastDay - firstDay)
+		energy = filter_power(series.column(), currfilter) * widths
+		return np.bincount(days[inside], weights=energy[inside], minlength=lastDay - firstDay) / 3600000.0
+
+	# Integrates the days [firstDay, lastDay) into the table of the key and stores it
+	def fill(self, key, spec, firstDay, lastDay):
+		energies = self.integrate_days(spec, firstDay, lastDay)
+		if energies is None:
+			return False
+		table = self.table(key)
+		since = self.since()
+		with self.lock:
+			table.values = np.array(table.values)
+			table.values[firstDay - since:lastDay - since] = energies
+			table.prefix = None
+			self.days += lastDay - firstDay
+			values = table.values
+		try:
+			os.makedirs(self.path, exist_ok=True)
+			filename = self.filename(key)
+			atomic_write(filename, values.tofile)
+			table.mtime = os.stat(filename).st_mtime
+		except OSError as e:
+			self.errors += 1
+			log_warning("[Residential][ENERGY][INDEX] Cannot write table %s: %s", self.filename(key), e)
+		return True
+
+	# Fills every missing day of the key, most recent first
+	def backfill(self, key, spec):
+		try:
+			while True:
+				missing = np.flatnonzero(np.isnan(self.table(key).values))
+				if(len(missing) == 0):
+					return
+				last  = int(missing[-1]) + 1
+				first = max(int(missing[0]), last - ENERGY_INDEX_CHUNK)
+				if(self.fill(key, spec, self.since() + first, self.since() + last) == False):
+					return
+		finally:
+			with self.lock:
+				self.pending.discard(key)
+
+	def schedule_backfill(self, key, spec):
+		with self.lock:
+			if key in self.pending:
+				return
+			self.pending.add(key)
+			if self.backfiller is None:
+				self.backfiller = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+			backfiller = self.backfiller
+		backfiller.submit(self.backfill, key, spec)
+
+	# Energy (Wh) of [start, end) (datetimes, start at midnight), None when the API must integrate the samples
+	def energy(self, address, database, measurement, field, currfilter, start, end):
+		start = start.astimezone(tz.utc).replace(tzinfo=None)
+		end   = end.astimezone(tz.utc).replace(tzinfo=None)
+		if(start.time() != start.min.time() or end <= start):
+			return None
+		# Windows written as [fromDate 00:00:00, toDate 23:59:59]
+		if(end.hour == 23 and end.minute == 59 and end.second == 59):
+			end = end.replace(microsecond=0) + timedelta(seconds=1)
+		spec = (address, database, measurement, field, currfilter)
+		key  = (address.split('/query', 1)[0], database, measurement, field, currfilter)
+		since     = self.since()
+		settled   = self.settled()
+		firstDay  = start.toordinal()
+		endDay    = end.toordinal() + (1 if end.time() != end.min.time() else 0)
+		# A partial day can only be integrated live
+		if(firstDay < since or (end.time() != end.min.time() and endDay <= settled)):
+			return None
+		table = self.table(key)
+		if(np.isnan(table.values).any() == True):
+			self.schedule_backfill(key, spec)
+		energy   = 0.
+		indexEnd = min(endDay, settled)
+		if(firstDay < indexEnd):
+			missing = np.flatnonzero(np.isnan(table.values[firstDay - since:indexEnd - since]))
+			if(len(missing) > ENERGY_INDEX_SYNC):
+				self.misses += 1
+				return None
+			if(len(missing) > 0 and self.fill(key, spec, firstDay + int(missing[0]), firstDay + int(missing[-1]) + 1) == False):
+				return None
+			energy = self.table(key).energy(firstDay - since, indexEnd - since)
+			if energy is None:
+				return None
+		# Days not settled yet: integrated live, up to the end of the window
+		if(endDay > settled):
+			liveDay = max(firstDay, settled)
+			live = self.integrate_days(spec, liveDay, endDay, (end - datetime(1970, 1, 1)) // timedelta(milliseconds=1))
+			if live is None:
+				return None
+			energy += float(live.sum())
+		self.hits += 1
+		return energy
+
+	# The backfill thread belongs to the process which started it
+	def after_fork(self):
+		self.lock       = threading.Lock()
+		self.backfiller = None
+		self.pending    = set()
+
+	def get_counters(self):
+		return {
+			"energyIndexHits":   self.hits,
+			"energyIndexMisses": self.misses,
+			"energyIndexDays":   self.days,
+			"energyIndexErrors": self.errors,
+			"energyIndexTables": len(self.tables),
+		}
+
+energyIndex = EnergyIndex(os.path.join(here, ENERGY_INDEX_DIR))
+if hasattr(os, "register_at_fork"):
+	os.register_at_fork(after_in_child=energyIndex.after_fork)
+
 ### Generic Data (plus operations such as: GROUPBY) InfluxDB/{fromDate}/{toDate}/{measurement}/{Field}/{OPERATION}/{VALUE}
 #   INFLUXDB/2018-12-24/2018-12-25/InstallationHouseBolzano/load/GROUPBY/30
 def get_historical_specific_data(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get historical Specific data (starts)")
+	log_info("[Residential][LOG] Get historical Specific data (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	measurementID = params.measurement
 
-	measurementID = words.split("/")[4]
+	field = params.field
 
-	field = words.split("/")[5]
+	# Unknown names (P, Processed_P) are forwarded as they are
+	field = froniusFields.get(field, field)
 
-	if(str(field)   == "photovoltaic"):
-		field = "P-PV"
-	elif(str(field) == "grid"):
-		field = "P-Grid"
-	elif(str(field) == "load"):
-		field = "P-Load"
-	elif(str(field) == "battery"):
-		field = "P-Akku"
-	elif(str(field) == "SoC"):
-		field = "SOC"
-
-	if(enablePrints == True):
-		print("[Residential][LOG][SPECIFIC] Field selected: " + str(field))
+	log_info("[Residential][LOG][SPECIFIC] Field selected: %s", field)
 
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
-
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -518,8 +2756,7 @@ def get_historical_specific_data(handler):
 
 	service_path = address + database + froniusquery1 + field + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	# --------------------------------------------------------------------- #
 	# DEBUGGING PURPOSES
@@ -533,18 +2770,17 @@ def get_historical_specific_data(handler):
 	# endDate   += "0000"
 	# --------------------------------------------------------------------- #
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path, epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
-	return response.json()
+	return response.to_json()
 
 
 ### Direct Consumption (plus operations such as: GROUPBY) InfluxDB/{fromDate}/{toDate}/{measurement}/direct_consumption/{OPERATION}/{VALUE}
@@ -556,62 +2792,44 @@ def get_consumption_direct(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get Direct Consumption (starts)")
+	log_info("[Residential][LOG] Get Direct Consumption (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
-
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -625,22 +2843,20 @@ def get_consumption_direct(handler):
 
 	service_path = address + database + froniusquery1 + "P-Load" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Grid\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path, epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
-	return response.json()
+	return response.to_json()
 
 
 ### Direct Consumption (plus operations such as: GROUPBY) InfluxDB/{fromDate}/{toDate}/{measurement}/direct_consumption/{OPERATION}/{VALUE}
@@ -652,62 +2868,44 @@ def get_consumption_direct_v2(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get Direct Consumption (starts)")
+	log_info("[Residential][LOG] Get Direct Consumption (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
-
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -721,32 +2919,32 @@ def get_consumption_direct_v2(handler):
 
 	service_path = address + database + froniusquery1 + "P-Load" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Grid\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path, epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	# -------------------------------------------- #
 	# if response is not empty
-	if not response or len(response.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message")
+	if(response.empty() == True):
+		log_info("[Residential][LOG] Empty message")
 		return ("[Residential][LOG] Empty message")
 	# -------------------------------------------- #
-	listOfinterest = response.json()['results'][0]['series'][0]['values']	
+	series = response.series()
+	power  = series.column()
 	# multiply each value to -1 (mantain just the json list)	
-	result = [(x[0],x[1]*(-1)) for x in listOfinterest if x[1]]
+	# Filter out the None (and zero) values
+	keep   = np.flatnonzero(~series.null() & (power != 0))
+	result = list(zip(series.time_strings(keep), (-power[keep]).tolist()))
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 	return result
 
@@ -757,62 +2955,44 @@ def get_historical_data(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get historical data (starts)")
+	log_info("[Residential][LOG] Get historical data (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	measurementID = params.measurement
 
-	measurementID = words.split("/")[4]
-
-	operation = words.split("/")[5]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[6]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
-
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -828,22 +3008,56 @@ def get_historical_data(handler):
 
 	service_path = address + database + basequery + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query(service_path, stream=True)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
-	return response.json()
+	if(response.status_code != 200):
+		response.close()
+		return str("[Residential] Influx Service Error: " + str(response.status_code))
+
+	# mean(*) over wide windows can be huge: forward it while it is received
+	return JSONStream(response.iter_content(STREAM_CHUNK_SIZE), response.close)
+
+# ------------------------------------------------------------------------------------ #
+# Energy (Wh) integrated by InfluxDB over [fromDate, toDate]: INTEGRAL(field, 1h) of the
+# raw points, of their positive/negative part for the POSITIVE/NEGATIVE filters
+# ((P + |P|)/2 and (P - |P|)/2 selected by a sub-query, so that the segments crossing
+# zero are cut as the client-side filters do). None when the query fails or the
+# window is empty: the caller integrates the grouped samples instead
+def pushdown_energy(address, database, measurementID, field, currfilter, fromDate, toDate):
+	window = " where time > '" + str(fromDate) + "' and time < '" + str(toDate) + "'"
+	source = "\"" + str(measurementID) + "\""
+	if(currfilter == "POSITIVE"):
+		query = "select integral(\"power\", 1h) from (select (\"" + field + "\" + abs(\"" + field + "\")) / 2 as \"power\" from " + source + window + ")" + window
+	elif(currfilter == "NEGATIVE"):
+		query = "select integral(\"power\", 1h) from (select (\"" + field + "\" - abs(\"" + field + "\")) / 2 as \"power\" from " + source + window + ")" + window
+	else:
+		query = "select integral(\"" + field + "\", 1h) from " + source + window
+	# A plain '+' of the query string would be decoded as a space by InfluxDB
+	service_path = address + database + "&q=" + query.replace("+", "%2B")
+
+	log_info("[Residential][LOG] ENERGY PUSHDOWN API %s", service_path)
+
+	try:
+		response = influxClient.query_result(service_path)
+	except Exception as e:
+		log_warning("[Residential][LOG] ENERGY PUSHDOWN failed (integrating the samples): %s", e)
+		return None
+	series = response.series()
+	if(response.failed() == True or series is None or len(series) == 0 or series.null()[0] == True):
+		log_info("[Residential][LOG] ENERGY PUSHDOWN without result (integrating the samples): %s", response)
+		return None
+	return float(series.column()[0])
 
 # ------------------------------------------------------------------------------------ #
 #### Filtered Energy Estimations (exploiting signed values and operations such as: GROUPBY):
@@ -854,67 +3068,50 @@ def get_filtered_area(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get historical filtered data to evaluate Energy (starts)")
+	log_info("[Residential][LOG] Get historical filtered data to evaluate Energy (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "ENERGY"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate     = fromDate_tmp.replace("-",".")
+	fromDate     = params.fromDateRaw
+	toDate       = params.toDateRaw
 
-	toDate_tmp = words.split("/")[3]
-	toDate     = toDate_tmp.replace("-",".")
+	measurementID = params.measurement
 
-	measurementID = words.split("/")[4]
-
-	field      = words.split("/")[5]
-	currfilter = words.split("/")[6]
+	field      = params.field
+	currfilter = params.filter
 	
-	operation = words.split("/")[7]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG][ENERGY][FILTERED] Unknown Operation")
 
-	interval  = words.split("/")[8]
+	interval  = params.interval
+	policy    = (params.policy or ENERGY_GAP_POLICY).lower()
 
-	if(enablePrints == True):
-		print("[Residential][LOG][ENERGY][FILTERED] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG][ENERGY][FILTERED] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG][ENERGY][FILTERED] Wrong Date: " + str(fromDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG][ENERGY][FILTERED] Wrong Date: " + str(params.dateError))
 
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG][ENERGY][FILTERED] Wrong Date: " + str(toDate))
+	diff = params.toDate - params.fromDate
 
-
-	diff = toDate - fromDate
-
-	fromDate = str(fromDate).split('+')[0]
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -927,22 +3124,8 @@ def get_filtered_area(handler):
 	elif(("InstallationHouse") in measurementID):
 		fronius  = True
 		database = "S4G-DWH-TEST"
-		try:
-			field    = words.split("/")[5]
-		except Exception as e:
-			print("Exception: %s" %e)
-			return ("[Residential][LOG][ENERGY][FILTERED] Error: You must select the Fronius Field! Look at documentation!")
-
-		if(str(field)   == "photovoltaic"):
-			field = "P-PV"
-		elif(str(field) == "grid"):
-			field = "P-Grid"
-		elif(str(field) == "load"):
-			field = "P-Load"
-		elif(str(field) == "battery"):
-			field = "P-Akku"
-		elif(str(field) == "SoC"):
-			field = "SOC"
+		if(field in froniusFields):
+			field = froniusFields[field]
 		else:
 			return ("[Residential][LOG][ENERGY][FILTERED] Error: Uknwown Field selected: " + str(field))
 	else:
@@ -978,9 +3161,19 @@ def get_filtered_area(handler):
 	# 	groupBy = THRESHOLD_INF_HIGH[1]
 	# 
 
-	if(enablePrints == True):
-		print("[Residential][LOG][ENERGY][FILTERED] THRESHOLDS SETTINGS: ")
-		print("[Residential][LOG][ENERGY][FILTERED] Time-Window Requested: "+ str(diff))
+	log_info("[Residential][LOG][ENERGY][FILTERED] THRESHOLDS SETTINGS: ")
+	log_info("[Residential][LOG][ENERGY][FILTERED] Time-Window Requested: %s", diff)
+
+	# The quality of the result needs the buckets of the series
+	if(enableEnergyIndex == True and params.quality is None):
+		energy = energyIndex.energy(address, database, measurementID, field if fronius == True else energyfield, currfilter, params.fromDate, params.toDate)
+		if energy is not None:
+			return energy
+
+	if(enableEnergyPushdown == True and params.quality is None):
+		energy = pushdown_energy(address, database, measurementID, field if fronius == True else energyfield, currfilter, fromDate, toDate)
+		if energy is not None:
+			return energy
 
 
 	if(fronius == True):
@@ -991,214 +3184,224 @@ def get_filtered_area(handler):
 		# Focusing on this case, you will always extract the Power exposed by the USM (that's why exploit energyquery content)
 		service_path = address + database + energyquery + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG][ENERGY][FILTERED] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG][ENERGY][FILTERED] INFLUX API %s", service_path)
 		return str("[Residential][ENERGY][FILTERED] Influx Service Not reachable/available")
 
 
-	if(enableFullStructuresPrints == True):
-		print("[Residential][LOG][ENERGY][FILTERED] Field evaluation FULLCONTENT: " + str(response.json()))
-	try:
-		empty = False
-		try:
-			# Verify if content exists:
-			a = response.json()['results'][0]['series']
-		except Exception as e:
-			empty = True
-			result = None
+	log_debug("[Residential][LOG][ENERGY][FILTERED] Field evaluation FULLCONTENT: %s", response)
+	# Verify if content exists:
+	series = response.series()
+	if(series is None):
+		log_error("[Residential][LOG][ENERGY][FILTERED] Field Parsing Returned Error: %s", "Empty response")
+		return ("[Residential][LOG][ENERGY][FILTERED] Field Parsing Returned Error: %s" %"Empty response")
 
-		if(empty == False):
-			if(enableFullStructuresPrints == True):
-				print("[Residential][LOG][ENERGY][FILTERED] Field Result:" + str(response.json()['results'][0]['series'][0]['values']))
-			result = response.json()['results'][0]['series'][0]['values']
-		else:
-			raise Exception('Empty response')
-	except Exception as e:
-		if(enablePrints == True):
-			print("[Residential][LOG][ENERGY][FILTERED] Field Parsing Returned Error: %s" %e)
-		return ("[Residential][LOG][ENERGY][FILTERED] Field Parsing Returned Error: %s" %e)
-
-	if(enablePrints == True):
-		print("[Residential][LOG] --- ENERGY FILTERED EVALUATION ---")
-		print("[Residential][LOG] NUMBER OF SAMPLES: " + str(len(result)))
-		print("[Residential][LOG] TIMEDELTA: " + str(diff))
-		print("[Residential][LOG] SECONDS: " + str(diff.total_seconds()))
-		print("[Residential][LOG] INCREMENT(seconds): " + str(diff.total_seconds() / len(result)))
-
-	functionToIntegrate = []
-
-	# We need to define the X array
-	# Starting from the TimeWindow and the Amount of samples
-	# Identify increment value to define explicitly every X position related to the sample Y
-	xAxes  = []
-	xStart = 0
-	xEnd   = diff.total_seconds()
-	xInc   = diff.total_seconds() / len(result)
+	if(request_debug(handler) == True):
+		log_dump("[Residential][LOG][ENERGY][FILTERED] Field Result: %s", series.rows())
 
 	# if response is not empty
-	if not result or len(result) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG][ENERGY][FILTERED] Field returns Empty message")
+	if(len(series) <= 1):
+		log_info("[Residential][LOG][ENERGY][FILTERED] Field returns Empty message")
 		return ("[Residential][LOG][ENERGY][FILTERED] Field returns Empty message")
 
+	log_info("[Residential][LOG] --- ENERGY FILTERED EVALUATION ---")
+	log_info("[Residential][LOG] NUMBER OF SAMPLES: %s", len(series))
+	log_info("[Residential][LOG] TIMEDELTA: %s", diff)
+	log_info("[Residential][LOG] SECONDS: %s", diff.total_seconds())
+	log_info("[Residential][LOG] INTEGRATION RULE: %s", ENERGY_INTEGRATION)
+	log_info("[Residential][LOG] GAP POLICY: %s", policy)
+
 	# -------------------------------------- #
-	# Manage "None" values:
-	# Override with 0
+	# "None" values are integrated following
+	# the gap policy: the gaps are found only
+	# for the QUALITY routes
 	# -------------------------------------- #
-	if(enablePrints == True):
-		debugflag  = False
-		debugStart = 0
-		debugEnd   = 0
-		debugTmp   = 0
-
-
-	for key,value in result:
-		debugTmp = key
-		xAxes.append(xStart)
-
-		if(value == None):
-			tmp = 0
-			if(enablePrints == True and debugflag == False):
-				debugflag  = True
-				debugStart = key
-
-		elif(currfilter == "POSITIVE"):
-		# Only Positive values
-			if(value > 0):
-				tmp = value
-			else: 
-				tmp = 0
-		elif(currfilter == "NEGATIVE"):
-		# Only Negative values
-			if(value < 0):
-				tmp = value
-			else: 
-				tmp = 0
-		else:
-		# All
-			tmp = value
-
-		functionToIntegrate.append(tmp)
-
-		if(enablePrints == True and debugflag == True):
-			debugflag = False
-			debugEnd  = key
-			print("[Residential][LOG][ENERGY][FILTERED] Found sequence of missing data: ")
-			print("[Residential][LOG][ENERGY][FILTERED] From Time: " + str(debugStart))
-			print("[Residential][LOG][ENERGY][FILTERED] To Time: " + str(debugEnd))
-
-		xStart += xInc
-
-	# If we did not recover from the None Sequence (last value still None):
-	if(enablePrints == True and debugflag == True):
-		debugflag = False
-		debugEnd  = debugTmp
-		print("[Residential][LOG][ENERGY][FILTERED] Found sequence of missing data: ")
-		print("[Residential][LOG][ENERGY][FILTERED] From Time: " + str(debugStart))
-		print("[Residential][LOG][ENERGY][FILTERED] To Time: " + str(debugEnd))
+	endTime = params.toDate.timestamp() * 1000.0
+	if(params.quality is not None):
+		coverage, gaps = energy_gaps(series.time, series.null(), endTime)
+		gaps = gap_strings(gaps)
+		log_debug("[Residential][LOG][ENERGY][FILTERED] Coverage: %s, sequences of missing data: %s", coverage, len(gaps))
 
 	# Y axes = Power values
-	# X axes = TimeFrame values related to sampling (together with grouped means):
+	# X axes = Timestamps of the buckets (together with grouped means):
 	try:
-		energy = integrate.simps(functionToIntegrate,xAxes)
+		energy = integrate_energy(series.time, series.column(), currfilter, end=endTime, policy=policy, nulls=series.null())
 
 	except Exception as e:
-		if(enablePrints == True):
-			print("[Residential][LOG][ENERGY][FILTERED] Integrate Returned Error: %s" %e)
+		log_error("[Residential][LOG][ENERGY][FILTERED] Integrate Returned Error: %s", e)
 		return ("[Residential][LOG][ENERGY][FILTERED] Integrate Returned Error: %s" %e)
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG][ENERGY][FILTERED] API last: " + str(end - start))	
+		log_info("[Residential][LOG][ENERGY][FILTERED] API last: %s", end - start)
 
 
-	if(enablePrints == True):
-		print("[ENERGY][FILTERED] X axes(time): " + str(xAxes))
-		print("[ENERGY][FILTERED] Y axes(power): " + str(functionToIntegrate))
+	if(request_debug(handler) == True):
+		log_dump("[ENERGY][FILTERED] X axes(time): %s", series.time)
+		log_dump("[ENERGY][FILTERED] Y axes(power): %s", filter_power(series.column(), currfilter))
 
 
-	# ------------------------------ #	
-	# Energy is now: Watt*seconds
-	# We want Energy in: Watt*hours
-	# ------------------------------ #
-	return energy/3600
+	# Energy in: Watt*hours
+	if(params.quality is not None):
+		return energy_quality(energy, policy, coverage, gaps)
+	return energy
 
 
 # ------------------------------------------------------------------------------------ #
-### Filtered Month Data 
-#  INFLUXDB/MONTH/{Date}/{measurement}/{Field}/{FILTER}
-#  INFLUXDB/MONTH/2019-03/InstallationHouseBolzano/load/ALL
-def get_historical_month_data(handler):
+#### Energy Matrix: energy (Wh) of many fields/filters per bucket (HOUR, DAY, MONTH in UTC),
+#### from a single multi-field query integrated at once:
+#  ENERGY/MATRIX/{fromDate}/{toDate}/{FroniusMeasurement}/{BUCKET}/{Field:FILTER,...}
+#  ENERGY/MATRIX/2019-03-01/2019-03-31/InstallationHouseBolzano/DAY/photovoltaic:ALL,grid:NEGATIVE,grid:POSITIVE
+#  ENERGY/MATRIX/2019-03-01/2019-03-31/InstallationHouseBolzano/DAY   (energyMatrixPairs)
+#  Result: {"unit": "Wh", "bucket": "DAY", "columns": ["time", "photovoltaic:ALL", ...], "values": [["2019-03-01T00:00:00Z", ...], ...]}
+# ------------------------------------------------------------------------------------ #
+energyMatrixPairs   = "photovoltaic:ALL,grid:NEGATIVE,grid:POSITIVE,battery:POSITIVE,battery:NEGATIVE,load:ALL"
+energyMatrixBuckets = {"HOUR": 3600000, "DAY": DAY_MS}
+
+# Edges (epoch ms) of the buckets of [start, end): the last bucket ends at end
+def energy_buckets(start, end, bucket):
+	startMs = (start - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+	endMs   = (end - datetime(1970, 1, 1)) // timedelta(milliseconds=1)
+	if bucket in energyMatrixBuckets:
+		edges = np.arange(startMs, endMs, energyMatrixBuckets[bucket], dtype=np.int64)
+	else:
+		months = []
+		month  = start
+		while(month < end):
+			months.append((month - datetime(1970, 1, 1)) // timedelta(milliseconds=1))
+			month = (month.replace(day=1) + timedelta(days=32)).replace(day=1)
+		edges = np.array(months, dtype=np.int64)
+	return np.append(edges, np.int64(endMs))
+
+# Energy (Wh) of every row of power (fields x samples, means of stepMs buckets starting at time),
+# filtered by the filter of the row, within every bucket of edges (fields x buckets)
+def energy_matrix(time, power, filters, edges, stepMs):
+	widths = np.clip(np.minimum(time + stepMs, edges[-1]) - time, 0, None).astype(np.float64)
+	energy = np.stack([filter_power(row, currfilter) for row, currfilter in zip(power, filters)]) * widths
+	cumulative = np.concatenate((np.zeros((len(energy), 1)), np.cumsum(energy, axis=1)), axis=1)
+	bounds = np.searchsorted(time, edges, side='left')
+	return (cumulative[:, bounds[1:]] - cumulative[:, bounds[:-1]]) / 3600000.0
+
+def get_energy_matrix(handler):
 	global influxServer
 	global influxLocalServer
-	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get get_historical_month_data (starts)")
+	log_info("[Residential][LOG] Get Energy Matrix (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
-
-	if(destination == "INFLUXDB"):
+	if(params.destination == "ENERGY"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	# words.split("/")[2] -> MONTH
+	measurementID = params.measurement
+	bucket        = params.bucket
 
-	fromDate_tmp = words.split("/")[3]
-	fromDate     = fromDate_tmp.replace("-",".")
+	if(params.dateError is not None):
+		return str("[Residential][LOG][ENERGY][MATRIX] Wrong Date: " + str(params.dateError))
 
-	measurementID = words.split("/")[4]
+	if(params.fromDate > params.toDate):
+		return str("[Residential][LOG][ENERGY][MATRIX] Bad Date Ordering, FROM:[" + params.fromDateStr + "] TO:[" + params.toDateStr + "]")
 
-	field      = words.split("/")[5]
-	currfilter = words.split("/")[6]
-	
-	if(enablePrints == True):
-		print("[Residential][LOG] get month historical data (" + measurementID + ") from: (" + fromDate + ")")
+	if(("InstallationHouse") not in measurementID):
+		return str("[Residential][LOG][ENERGY][MATRIX] Error: only the Fronius measurements (InstallationHouse) hold many fields")
+	database = "S4G-DWH-TEST"
+
+	pairs   = (params.pairs or energyMatrixPairs).split(',')
+	fields  = []
+	columns = []
+	filters = []
+	for pair in pairs:
+		field, currfilter = pair.split(':')
+		if froniusFields[field] not in fields:
+			fields.append(froniusFields[field])
+		columns.append(fields.index(froniusFields[field]))
+		filters.append(currfilter)
+
+	# The window ends now when it reaches today
+	fromDate = params.fromDate.replace(tzinfo=None)
+	endDate  = min(params.toDate.replace(tzinfo=None) + timedelta(seconds=1), datetime.utcnow())
+	edges    = energy_buckets(fromDate, endDate, bucket)
+
+	select = ", ".join("mean(\"" + field + "\")" for field in fields)
+	service_path = (address + database + "&q=select " + select + " from \"" + str(measurementID) + "\" where time > '" + params.fromDateStr
+			+ "' and time < '" + params.toDateStr + "' GROUP BY time(" + str(ENERGY_MATRIX_STEP) + "m)")
+
+	log_info("[Residential][LOG][ENERGY][MATRIX] INFLUX API %s", service_path)
 
-	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month = fromDate.split('.')
 	try:
-		fromDate = datetime(int(year), int(month), 1, 0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
+		response = influxClient.query_result(service_path)
+	except Exception as e:
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG][ENERGY][MATRIX] INFLUX API %s", service_path)
+		return str("[Residential][ENERGY][MATRIX] Influx Service Not reachable/available")
 
-	fromDate = str(fromDate).split('+')[0]
+	if(response.failed() == True):
+		return str("[Residential][ENERGY][MATRIX] Influx Service Error: " + str(response))
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Date converted: " + str(fromDate))
+	series = response.series()
+	if(series is None or len(series) == 0):
+		energy = np.zeros((len(pairs), len(edges) - 1))
+	else:
+		try:
+			power  = [np.asarray(series.values[index], dtype=np.float64) for index in columns]
+			energy = energy_matrix(series.time, power, filters, edges, ENERGY_MATRIX_STEP * 60000)
+		except (TypeError, ValueError) as e:
+			log_error("[Residential][LOG][ENERGY][MATRIX] Integrate Returned Error: %s", e)
+			return ("[Residential][LOG][ENERGY][MATRIX] Integrate Returned Error: %s" %e)
 
-	# Identify which month is and the amount of days to set toDate:
-	weekday,day = monthrange(int(year), int(month))
+	if(enableTimingEval == True):
+		end = datetime.utcnow()
+		log_info("[Residential][LOG][ENERGY][MATRIX] API last: %s", end - start)
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Month overall days:" + str(day))
+	return {"unit": "Wh", "bucket": bucket, "columns": ["time"] + pairs,
+		"values": list(map(list, zip(rfc3339_strings(edges[:-1]), *energy.tolist())))}
 
-	# Verify if correct date
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
+# ------------------------------------------------------------------------------------ #
+### Filtered Month Data 
+#  INFLUXDB/MONTH/{Date}/{measurement}/{Field}/{FILTER}
+#  INFLUXDB/MONTH/2019-03/InstallationHouseBolzano/load/ALL
+def get_historical_month_data(handler):
+	global influxServer
+	global influxLocalServer
+	global basequery
+	params = handler.params
+
+	log_info("[Residential][LOG] Get get_historical_month_data (starts)")
+
+	# --------------------------------------------------------------------- #
+	if(enableTimingEval == True):
+		start = datetime.utcnow()
+
+	destination = params.destination
+
+	if(destination == "INFLUXDB"):
+		address = influxServer
+	else:
+		address = influxLocalServer
 
-	toDate = str(toDate).split('+')[0]
+	# Month boundaries (and its amount of days) are set by the route table (RequestParams)
+	fromDate      = params.fromDateStr
+	toDate        = params.toDateStr
 
-	if(enablePrints == True):
-		print("[Residential][LOG] toDate set:" + str(toDate))
+	measurementID = params.measurement
+
+	field      = params.field
+	currfilter = params.filter
+	
+	log_info("[Residential][LOG] get month historical data (%s) from: (%s)", measurementID, params.fromDateRaw)
+	log_info("[Residential][LOG] Date converted: %s", fromDate)
+
+	log_info("[Residential][LOG] toDate set:%s", toDate)
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -1211,23 +3414,9 @@ def get_historical_month_data(handler):
 	elif(("InstallationHouse") in measurementID):
 		fronius  = True
 		database = "S4G-DWH-TEST"
-		try:
-			field    = words.split("/")[5]
-		except Exception as e:
-			print("Exception: %s" %e)
-			return ("[Residential][LOG] Error: You must select the Fronius Field! Look at documentation!")
-
-		if(str(field)   == "photovoltaic"):
-			field = "P-PV"
-		elif(str(field) == "grid"):
-			field = "P-Grid"
-		elif(str(field) == "load"):
-			field = "P-Load"
-		elif(str(field) == "battery"):
-			field = "P-Akku"
-		elif(str(field) == "SoC"):
-			field = "SOC"
-		elif(str(field) == "direct_consumption"):
+		if(field in froniusFields):
+			field = froniusFields[field]
+		elif(field == "direct_consumption"):
 			pass
 		else:
 			return ("[Residential][LOG] Error: Uknwown Field selected: " + str(field))
@@ -1264,18 +3453,16 @@ def get_historical_month_data(handler):
 			# Focusing on this case, you will always extract the Power exposed by the USM (that's why exploit energyquery content)
 			service_path = address + database + energyquery + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"Processed_P\" < 0 GROUP BY time(1d)"
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path, epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
-	return response.json()
+	return response.to_json()
 
 
 # ---------------------------------------------------- #
@@ -1286,51 +3473,34 @@ def get_historical_year_data(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
 	yearResponse = {"results": [{"statement_id": 0, "series": [{"name": "", "columns": ["time", "mean"], "values":[]}]}]}
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get get_historical_year_data (starts)")
+	log_info("[Residential][LOG] Get get_historical_year_data (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate   = words.split("/")[3]
-	year       = fromDate
+	# Year boundaries are set by the route table (RequestParams)
+	year          = params.year
+	fromDate      = params.fromDateStr
+	toDate        = params.toDateStr
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	field      = words.split("/")[5]
-	currfilter = words.split("/")[6]
+	field      = params.field
+	currfilter = params.filter
 	
-	if(enablePrints == True):
-		print("[Residential][LOG] get month historical data (" + measurementID + ") from: (" + fromDate + ")")
-
-	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	try:
-		fromDate = datetime(int(year), 1, 1 ,0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
-
-	try:
-		toDate = datetime(int(year), 12, 31, 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date")
-
-	toDate = str(toDate).split('+')[0]
+	log_info("[Residential][LOG] get month historical data (%s) from: (%s)", measurementID, params.fromDateRaw)
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -1343,23 +3513,9 @@ def get_historical_year_data(handler):
 	elif(("InstallationHouse") in measurementID):
 		fronius  = True
 		database = "S4G-DWH-TEST"
-		try:
-			field    = words.split("/")[5]
-		except Exception as e:
-			print("Exception: %s" %e)
-			return ("[Residential][LOG] Error: You must select the Fronius Field! Look at documentation!")
-
-		if(str(field)   == "photovoltaic"):
-			field = "P-PV"
-		elif(str(field) == "grid"):
-			field = "P-Grid"
-		elif(str(field) == "load"):
-			field = "P-Load"
-		elif(str(field) == "battery"):
-			field = "P-Akku"
-		elif(str(field) == "SoC"):
-			field = "SOC"
-		elif(str(field) == "direct_consumption"):
+		if(field in froniusFields):
+			field = froniusFields[field]
+		elif(field == "direct_consumption"):
 			pass
 		else:
 			return ("[Residential][LOG] Error: Uknwown Field selected: " + str(field))
@@ -1396,15 +3552,13 @@ def get_historical_year_data(handler):
 			service_path = address + database + energyquery + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"Processed_P\" < 0 GROUP BY time(1d)"
 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	# sreturn response.json()
@@ -1432,54 +3586,53 @@ def get_historical_year_data(handler):
 	#	print("X: " + str(x))
 	#	del yearResponse['results'][0]['series'][0]['values'][int(x)]
 	#
-	print("YEAR-----: ")
+	log_debug("YEAR-----: ")
 	#print(yearResponse)
 
 	try:
-		dayoffset = -1
+		series = response.series()
+		if(series is None):
+			raise Exception('Empty response')
+		# Exploit only the days with real values (not null)
+		power = series.column()
+		valid = ~series.null() & (power != 0)
+		dayoffset = 0
 		for monthCounter in range(1,13):
-			monthlyAvg = 0
 			# Identify which month is and the amount of days to set toDate:
 			weekday,days = monthrange(int(year), int(monthCounter))
-			print("Month number: " +str(monthCounter) + " counters: " + str(dayoffset))		
-			# Exploit only the days with real values (not null)
-			# realDays = int(days)+1
-			realDays = int(days)
-
-			for dayCounter in range(1,days+1):
-				print("> Counter: "+ str(dayoffset+dayCounter))		
-				t,power = response.json()['results'][0]['series'][0]['values'][int(dayCounter+dayoffset)]
-				if(power):
-					monthlyAvg += power
-				else:
-					realDays -= 1
+			log_debug("Month number: %s counters: %s", monthCounter, dayoffset)
+			if(dayoffset + days > len(power)):
+				raise IndexError("list index out of range")
+
+			monthValues = power[dayoffset:dayoffset+days][valid[dayoffset:dayoffset+days]].tolist()
+			realDays    = len(monthValues)
+			monthlyAvg  = sum(monthValues)
 
-			print("Power(month): " + str(monthlyAvg))
+			log_debug("Power(month): %s", monthlyAvg)
 
 			if(realDays > 0):
 				monthlyAvg /= realDays
 			else:
 				monthlyAvg = None
 
-			print("Estimate Month average over ("+str(realDays)+") days of data: " +str(monthlyAvg))
+			log_debug("Estimate Month average over (%s) days of data: %s", realDays, monthlyAvg)
 
 			resultDate = datetime(int(year), monthCounter , 1, 0, 0, 0, tzinfo=tz.utc)
 			resultDate = str(resultDate).split('+')[0]
 			resultDate = str(resultDate).split(' ')[0]
-			print("resultDate: " + str(resultDate))
+			log_debug("resultDate: %s", resultDate)
 
 			yearResponse['results'][0]['series'][0]['values'].append(tuple((resultDate,monthlyAvg)))
 
 			dayoffset += int(days)
 
-			print("Next(month)---------------:")
+			log_debug("Next(month)---------------:")
 	except Exception as e:
-		if(enablePrints == True):
-			print("[Residential][LOG] FILTERED Field Parsing Returned Error: %s" %e)
+		log_error("[Residential][LOG] FILTERED Field Parsing Returned Error: %s", e)
 		return ("[Residential][LOG] FILTERED Field Parsing Returned Error: %s" %e)
 
 
-	print("YEAR2------------------------------: ")
+	log_debug("YEAR2------------------------------: ")
 	#print(yearResponse)
 	# Fill in the label on the message to be returned back:
 	
@@ -1487,65 +3640,6 @@ def get_historical_year_data(handler):
 
 	return yearResponse
 
-	if(enableFullStructuresPrints == True):
-		print("[Residential][LOG]  FILTERED Field evaluation FULLCONTENT: " + str(response.json()))
-	try:
-		empty = False
-		try:
-			# Verify if content exists:
-			a = response.json()['results'][0]['series']
-		except Exception as e:
-			empty = True
-			result = None
-
-		if(empty == False):
-			if(enableFullStructuresPrints == True):
-				print("[Residential][LOG] FILTERED Field Result:" + str(response.json()['results'][0]['series'][0]['values']))
-			result = response.json()['results'][0]['series'][0]['values']
-	except Exception as e:
-		if(enablePrints == True):
-			print("[Residential][LOG] FILTERED Field Parsing Returned Error: %s" %e)
-		return ("[Residential][LOG] FILTERED Field Parsing Returned Error: %s" %e)
-
-	xAxes  = []
-
-	# if response is not empty
-	if not result or len(result) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] FILTERED Field returns Empty message")
-		return ("[Residential][LOG] FILTERED Field returns Empty message")
-
-	for key,value in result:
-		debugTmp = key
-		if(value == None):
-			tmp = 0
-
-		elif(currfilter == "POSITIVE"):
-		# Only Positive values
-			if(value > 0):
-				tmp = value
-			else: 
-				tmp = 0
-		elif(currfilter == "NEGATIVE"):
-		# Only Negative values
-			if(value < 0):
-				tmp = value
-			else: 
-				tmp = 0
-		else:
-		# All
-			tmp = value
-
-		xAxes.append(tmp)
-
-	if(enableTimingEval == True):
-		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
-
-	return json.dumps(xAxes)
-
-
-	return response.json()
 
 # ------------------------------------------------------------------------------------ #
 ### Filtered Data (plus operations such as: GROUPBY) InfluxDB/{fromDate}/{toDate}/{measurement}/{Field}/{FILTER}/{OPERATION}/{VALUE}
@@ -1555,65 +3649,47 @@ def get_filtered_data(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get historical data (starts)")
+	log_info("[Residential][LOG] Get historical data (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate     = fromDate_tmp.replace("-",".")
+	fromDate     = params.fromDateRaw
+	toDate       = params.toDateRaw
 
-	toDate_tmp = words.split("/")[3]
-	toDate     = toDate_tmp.replace("-",".")
+	measurementID = params.measurement
 
-	measurementID = words.split("/")[4]
-
-	field      = words.split("/")[5]
-	currfilter = words.split("/")[6]
+	field      = params.field
+	currfilter = params.filter
 	
-	operation = words.split("/")[7]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[8]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -1626,22 +3702,8 @@ def get_filtered_data(handler):
 	elif(("InstallationHouse") in measurementID):
 		fronius  = True
 		database = "S4G-DWH-TEST"
-		try:
-			field    = words.split("/")[5]
-		except Exception as e:
-			print("Exception: %s" %e)
-			return ("[Residential][LOG] Error: You must select the Fronius Field! Look at documentation!")
-
-		if(str(field)   == "photovoltaic"):
-			field = "P-PV"
-		elif(str(field) == "grid"):
-			field = "P-Grid"
-		elif(str(field) == "load"):
-			field = "P-Load"
-		elif(str(field) == "battery"):
-			field = "P-Akku"
-		elif(str(field) == "SoC"):
-			field = "SOC"
+		if(field in froniusFields):
+			field = froniusFields[field]
 		else:
 			return ("[Residential][LOG] Error: Uknwown Field selected: " + str(field))
 	else:
@@ -1656,72 +3718,31 @@ def get_filtered_data(handler):
 		# Focusing on this case, you will always extract the Power exposed by the USM (that's why exploit energyquery content)
 		service_path = address + database + energyquery + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 
-	if(enableFullStructuresPrints == True):
-		print("[Residential][LOG]  FILTERED Field evaluation FULLCONTENT: " + str(response.json()))
-	try:
-		empty = False
-		try:
-			# Verify if content exists:
-			a = response.json()['results'][0]['series']
-		except Exception as e:
-			empty = True
-			result = None
-
-		if(empty == False):
-			if(enableFullStructuresPrints == True):
-				print("[Residential][LOG] FILTERED Field Result:" + str(response.json()['results'][0]['series'][0]['values']))
-			result = response.json()['results'][0]['series'][0]['values']
-	except Exception as e:
-		if(enablePrints == True):
-			print("[Residential][LOG] FILTERED Field Parsing Returned Error: %s" %e)
-		return ("[Residential][LOG] FILTERED Field Parsing Returned Error: %s" %e)
-
-	xAxes  = []
+	log_debug("[Residential][LOG]  FILTERED Field evaluation FULLCONTENT: %s", response)
+	series = response.series()
+	if(series is not None and request_debug(handler) == True):
+		log_dump("[Residential][LOG] FILTERED Field Result: %s", series.rows())
 
 	# if response is not empty
-	if not result or len(result) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] FILTERED Field returns Empty message")
+	if(series is None or len(series) <= 1):
+		log_info("[Residential][LOG] FILTERED Field returns Empty message")
 		return ("[Residential][LOG] FILTERED Field returns Empty message")
 
-	for key,value in result:
-		debugTmp = key
-		if(value == None):
-			tmp = 0
-
-		elif(currfilter == "POSITIVE"):
-		# Only Positive values
-			if(value > 0):
-				tmp = value
-			else: 
-				tmp = 0
-		elif(currfilter == "NEGATIVE"):
-		# Only Negative values
-			if(value < 0):
-				tmp = value
-			else: 
-				tmp = 0
-		else:
-		# All
-			tmp = value
-
-		xAxes.append(tmp)
+	xAxes = filter_power(series.column(), currfilter).tolist()
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 	return json.dumps(xAxes)
 
@@ -1740,47 +3761,33 @@ def get_energy(handler):
 	global influxLocalServer
 	global energyquery
 
-	words = handler.path
+	params = handler.params
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "ENERGY"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
+	policy        = (params.policy or ENERGY_GAP_POLICY).lower()
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get historical raw data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] Get historical raw data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return("[Residential][LOG] Wrong Date: " + str(toDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
+	fromDate = params.fromDate
+	toDate   = params.toDate
 
 	diff = toDate - fromDate
 
@@ -1788,9 +3795,8 @@ def get_energy(handler):
 	toDateStr   = str(toDate).split('+')[0]
 	endDateStr  = str(toDateStr)
 
-	if(enablePrints == True):
-		print("[Residential][LOG] FROM: " + fromDateStr)
-		print("[Residential][LOG] TO: " + toDateStr)
+	log_info("[Residential][LOG] FROM: %s", fromDateStr)
+	log_info("[Residential][LOG] TO: %s", toDateStr)
 
 
 	# ------------------------------------------ #
@@ -1805,8 +3811,7 @@ def get_energy(handler):
 
 	# ------------------------------------------ #
 	if(currentDate < endDate):
-		if(enablePrints == True):
-			print("[Residential][LOG] We have to limit the query because ending date is in the future!")
+		log_info("[Residential][LOG] We have to limit the query because ending date is in the future!")
 
 		year, month, day = str(currentDate).split('-')
 		tmp = str(currentDateTime).split(' ')[1]
@@ -1822,9 +3827,9 @@ def get_energy(handler):
 		endDateStr = str(endDate).split('+')[0]
 	elif(currentDate == endDate):
 		# We need to update endDate with current Time!
-		print("[Residential][LOG] Trying to evaluate current Day: ")
-		print("[Residential][LOG] FromDate("+str(type(fromDate))+"): " + str(fromDate))
-		print("[Residential][LOG] CurrentDateTime("+str(type(currentDateTime))+"): " + str(currentDateTime))
+		log_debug("[Residential][LOG] Trying to evaluate current Day: ")
+		log_debug("[Residential][LOG] FromDate(%s): %s", type(fromDate), fromDate)
+		log_debug("[Residential][LOG] CurrentDateTime(%s): %s", type(currentDateTime), currentDateTime)
 
 		# Required Timezone awarness adaptation:
 		tmpDateTime = currentDateTime.replace(tzinfo=tz.UTC)
@@ -1842,22 +3847,12 @@ def get_energy(handler):
 	elif(("InstallationHouse") in measurementID):
 		fronius  = True
 		database = "S4G-DWH-TEST"
-		try:
-			field    = words.split("/")[5]
-		except Exception as e:
-			print("Exception: %s" %e)
+		field = params.field
+		if(field is None):
 			return ("[Residential][LOG] Error: You must select the Fronius Field! Look at documentation!")
 
-		if(str(field)   == "photovoltaic"):
-			field = "P-PV"
-		elif(str(field) == "grid"):
-			field = "P-Grid"
-		elif(str(field) == "load"):
-			field = "P-Load"
-		elif(str(field) == "battery"):
-			field = "P-Akku"
-		elif(str(field) == "SoC"):
-			field = "SOC"
+		if(field in froniusFields):
+			field = froniusFields[field]
 		else:
 			return ("[Residential][LOG] Error: Uknwown Field selected: " + str(field))
 	else:
@@ -1890,11 +3885,21 @@ def get_energy(handler):
 		groupBy = THRESHOLD_INF_HIGH[1]
 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] THRESHOLDS SETTINGS: ")
-		print("[Residential][LOG] Time-Window Requested: "+ str(diff))
-		print("[Residential][LOG] Thresholds ["+ str(threshold_lowest) +"]["+str(threshold_min) +"]["+str(threshold_low) +"]["+str(threshold_mid) +"]["+str(threshold_high) +"]["+str(threshold_highest)+"]")
-		print("[Residential][LOG] GroupBy: " + str(groupBy) + " minutes")
+	log_info("[Residential][LOG] THRESHOLDS SETTINGS: ")
+	log_info("[Residential][LOG] Time-Window Requested: %s", diff)
+	log_info("[Residential][LOG] Thresholds [%s][%s][%s][%s][%s][%s]", threshold_lowest, threshold_min, threshold_low, threshold_mid, threshold_high, threshold_highest)
+	log_info("[Residential][LOG] GroupBy: %s minutes", groupBy)
+
+	# The quality of the result needs the buckets of the series
+	if(enableEnergyIndex == True and params.quality is None):
+		energy = energyIndex.energy(address, database, measurementID, field if fronius == True else energyfield, "ALL", fromDate, fromDate + diff)
+		if energy is not None:
+			return energy
+
+	if(enableEnergyPushdown == True and params.quality is None):
+		energy = pushdown_energy(address, database, measurementID, field if fronius == True else energyfield, "ALL", fromDateStr, endDateStr)
+		if energy is not None:
+			return energy
 
 	# --------------------------------------------------------------------- #
 	if(fronius == True):
@@ -1903,127 +3908,70 @@ def get_energy(handler):
 	else:
 		service_path = address + database + energyquery + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDateStr) + "\' and time < " + "\'" + str(endDateStr) + "\' GROUP BY time(" + str(groupBy) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] ENERGY API(uri): " + service_path)
+	log_info("[Residential][LOG] ENERGY API(uri): %s", service_path)
 
 	try:
-		response = requests.get(str(service_path), auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(str(service_path))
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] ENERGY API (Error) " + service_path)
+		log_error("Exception: %s", e)
+		log_error("[Residential][LOG] ENERGY API (Error) %s", service_path)
 		return "[Residential] ENERGY Service Not reachable/available"
 
 
-	# response.json() WILL HOLD just Power Values (with the inherithed step defined by the GROUPBY operation)
+	# response WILL HOLD just Power Values (with the inherithed step defined by the GROUPBY operation)
 	# HERE we have to perfomr integral of given power within the time-window given and the selected step!
-	if(enableFullStructuresPrints == True):
-		print("[Residential][LOG] ENERGY evaluation FULLCONTENT: " + str(response.json()))
-	try:
-		empty = False
-		try:
-			# Verify if content exists:
-			a = response.json()['results'][0]['series']
-		except Exception as e:
-			empty = True
-			result = None
-
-		if(empty == False):
-			if(enableFullStructuresPrints == True):
-				print("[Residential][LOG] ENERGY Result:" + str(response.json()['results'][0]['series'][0]['values']))
-			result = response.json()['results'][0]['series'][0]['values']
-	except Exception as e:
-		if(enablePrints == True):
-			print("[Residential][LOG] ENERGY Parsing Returned Error: %s" %e)
-		return ("[Residential][LOG] ENERGY Parsing Returned Error: %s" %e)
+	log_debug("[Residential][LOG] ENERGY evaluation FULLCONTENT: %s", response)
+	series = response.series()
+	if(series is not None and request_debug(handler) == True):
+		log_dump("[Residential][LOG] ENERGY Result: %s", series.rows())
 
 	# if response is not empty
-	if not result or len(result) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] ENERGY Returned Empty message")
+	if(series is None or len(series) <= 1):
+		log_info("[Residential][LOG] ENERGY Returned Empty message")
 		return ("[Residential][LOG] ENERGY Returned Empty message")
 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] --- ENERGY EVALUATION ---")
-		print("[Residential][LOG] NUMBER OF SAMPLES: " + str(len(result)))
-		print("[Residential][LOG] TIMEDELTA: " + str(diff))
-		print("[Residential][LOG] SECONDS: " + str(diff.total_seconds()))
-		print("[Residential][LOG] INCREMENT(seconds): " + str(diff.total_seconds() / len(result)))
-
-	functionToIntegrate = []
-
-	# We need to define the X array
-	# Starting from the TimeWindow and the Amount of samples
-	# Identify increment value to define explicitly every X position related to the sample Y
-	xAxes  = []
-	xStart = 0
-	xEnd   = diff.total_seconds()
-	xInc   = diff.total_seconds() / len(result)
+	log_info("[Residential][LOG] --- ENERGY EVALUATION ---")
+	log_info("[Residential][LOG] NUMBER OF SAMPLES: %s", len(series))
+	log_info("[Residential][LOG] TIMEDELTA: %s", diff)
+	log_info("[Residential][LOG] SECONDS: %s", diff.total_seconds())
+	log_info("[Residential][LOG] INTEGRATION RULE: %s", ENERGY_INTEGRATION)
+	log_info("[Residential][LOG] GAP POLICY: %s", policy)
 
 	# -------------------------------------- #
-	# To Manage "None" values, 
-	# we will override with zeros!
-	# For debugging purposes it will be shown:
-	# The Start/End of Null values sequences
+	# "None" values are integrated following
+	# the gap policy: the Start/End of Null
+	# values sequences are found only for the
+	# QUALITY routes
 	# -------------------------------------- #
-	if(enablePrints == True):
-		debugflag  = False
-		debugStart = 0
-		debugEnd   = 0
-		debugTmp   = 0
-	
-
-	for key,value in result:
-		debugTmp = key
-		xAxes.append(xStart)
-		if(value == None):
-			functionToIntegrate.append(0)
-			if(enablePrints == True and debugflag == False):
-				debugflag  = True
-				debugStart = key
-		else:
-			functionToIntegrate.append(value)
-			if(enablePrints == True and debugflag == True):
-				debugflag = False
-				debugEnd  = key
-				print("[Residential][LOG] Found sequence of missing data: ")
-				print("[Residential][LOG] From Time: " + str(debugStart))
-				print("[Residential][LOG] To Time: " + str(debugEnd))
-		xStart += xInc
-
-	# If we did not recover from the None Sequence (last value still None):
-	if(enablePrints == True and debugflag == True):
-		debugflag = False
-		debugEnd  = debugTmp
-		print("[Residential][LOG] Found sequence of missing data: ")
-		print("[Residential][LOG] From Time: " + str(debugStart))
-		print("[Residential][LOG] To Time: " + str(debugEnd))
+	endTime = (fromDate + diff).timestamp() * 1000.0
+	if(params.quality is not None):
+		coverage, gaps = energy_gaps(series.time, series.null(), endTime)
+		gaps = gap_strings(gaps)
+		log_debug("[Residential][LOG] Coverage: %s, sequences of missing data: %s", coverage, len(gaps))
 
 	# Y axes = Power values
-	# X axes = TimeFrame values related to sampling (together with grouped means):
+	# X axes = Timestamps of the buckets (together with grouped means):
 	try:
-		energy = integrate.simps(functionToIntegrate,xAxes)
+		energy = integrate_energy(series.time, series.column(), "ALL", end=endTime, policy=policy, nulls=series.null())
 
 	except Exception as e:
-		if(enablePrints == True):
-			print("[Residential][LOG] ENERGY Integrate Returned Error: %s" %e)
+		log_error("[Residential][LOG] ENERGY Integrate Returned Error: %s", e)
 		return ("[Residential][LOG] ENERGY Integrate Returned Error: %s" %e)
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] ENERGY API last: " + str(end - start))	
+		log_info("[Residential][LOG] ENERGY API last: %s", end - start)
 
 
-	if(enablePrints == True):
-		print("X axes(time): " + str(xAxes))
-		print("Y axes(power): " + str(functionToIntegrate))
+	if(request_debug(handler) == True):
+		log_dump("X axes(time): %s", series.time)
+		log_dump("Y axes(power): %s", filter_power(series.column(), "ALL"))
 
-	# ------------------------------ #	
-	# Energy is now: Watt*seconds
-	# We want Energy in: Watt*hours
-	# ------------------------------ #
-	return energy/3600
+	# Energy in: Watt*hours
+	if(params.quality is not None):
+		return energy_quality(energy, policy, coverage, gaps)
+	return energy
 # ---------------------------------------------------------------------------------------------------------------- #
 ### Generic Raw Data: 
 #    1      /    2     /   3    /       4
@@ -2040,7 +3988,7 @@ def get_historical_rawdata(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
 	# Default values:
 	groupBy = 30
@@ -2048,46 +3996,29 @@ def get_historical_rawdata(handler):
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical raw data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical raw data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
-
-	diff = toDate - fromDate
+	diff = params.toDate - params.fromDate
 
-	fromDate = str(fromDate).split('+')[0]
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -2126,22 +4057,25 @@ def get_historical_rawdata(handler):
 	# --------------------------------------------------------------------- #
 	service_path = address + database + basequery + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' GROUP BY time(" + str(groupBy) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query(service_path, stream=True)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
-	return response.json()
+	if(response.status_code != 200):
+		response.close()
+		return str("[Residential] Influx Service Error: " + str(response.status_code))
+
+	# mean(*) over wide windows can be huge: forward it while it is received
+	return JSONStream(response.iter_content(STREAM_CHUNK_SIZE), response.close)
 
 
 # --------------------------------------------------------------------- #
@@ -2156,62 +4090,44 @@ def get_consumption_house(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get consumption_house (starts)")
+	log_info("[Residential][LOG] Get consumption_house (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -2225,33 +4141,30 @@ def get_consumption_house(handler):
 
 	service_path = address + database + froniusquery1 + "P-Load" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path, epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 	# if response is not empty
-	if not response or len(response.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message")
+	if(response.empty() == True):
+		log_info("[Residential][LOG] Empty message")
 		return ("[Residential][LOG] Empty message")
 
-	listOfinterest = response.json()['results'][0]['series'][0]['values']	
+	series = response.series()
+	power  = series.column()
 	# multiply each value to -1 (mantain just the json list)
-	# Filter out the None values!
-	# Note: if you want to keep them: 
-	# result = [(x[0],float(x[1]*(-1))) if x[1] else (x[0],x[1]) for x in listOfinterest]
-	result = [(x[0],x[1]*(-1)) for x in listOfinterest if x[1]]
+	# Filter out the None (and zero) values!
+	keep   = np.flatnonzero(~series.null() & (power != 0))
+	result = list(zip(series.time_strings(keep), (-power[keep]).tolist()))
 	
 	return result
 
@@ -2264,62 +4177,44 @@ def get_over_production(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get over_production (starts)")
+	log_info("[Residential][LOG] Get over_production (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
-
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -2333,30 +4228,29 @@ def get_over_production(handler):
 
 	service_path = address + database + froniusquery1 + "P-Grid" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Grid\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path, epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	# if response is not empty
-	if not response or len(response.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message")
+	if(response.empty() == True):
+		log_info("[Residential][LOG] Empty message")
 		return ("[Residential][LOG] Empty message")
 
 	# multiply each value to -1
-	listOfinterest = response.json()['results'][0]['series'][0]['values']		
-	result = [(x[0],x[1]*(-1)) for x in listOfinterest if x[1]]
+	series = response.series()
+	power  = series.column()
+	keep   = np.flatnonzero(~series.null() & (power != 0))
+	result = list(zip(series.time_strings(keep), (-power[keep]).tolist()))
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 
 	return result
@@ -2372,62 +4266,44 @@ def evaluate_production(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] evaluate_production (starts)")
+	log_info("[Residential][LOG] evaluate_production (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -2444,8 +4320,8 @@ def evaluate_production(handler):
 		database2 = "S4G-DWH-USM"
 		field     = "Processed_P" 
 	else:
-		print("[Residential][LOG] Error: only Bolzano pilot have SMX measuring PV consumption!")		
-		print("[Residential][LOG] Error: Try to exploit PV values from Fronius instead!")		
+		log_error("[Residential][LOG] Error: only Bolzano pilot have SMX measuring PV consumption!")
+		log_error("[Residential][LOG] Error: Try to exploit PV values from Fronius instead!")
 		measurementID2 = measurementID
 		database2 = "S4G-DWH-TEST"
 		field = "P-PV"
@@ -2454,69 +4330,53 @@ def evaluate_production(handler):
 	#   Where: over_production     = if (P_Grid<0) then (-P_Grid) else 0
 	service_over_production_path = address + database + froniusquery1 + "P-Grid" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Grid\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_over_production_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_over_production_path)
 
+	#   Where: prod_PV             = Processed_P da (SMX) or P_PV da (Fronius)
+	service_prod_PV_path = address + database2 + froniusquery1 + field + froniusquery2 + "\"" + str(measurementID2) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
+
+	log_info("[Residential][LOG] INFLUX API %s", service_prod_PV_path)
+
+	# Both series are requested at the same time
 	try:
-		response1 = requests.get(service_over_production_path, auth=HTTPBasicAuth(username,password))
+		response1, response2 = influxClient.query_results([service_over_production_path, service_prod_PV_path], epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_over_production_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_over_production_path)
+		log_info("[Residential][LOG] INFLUX API %s", service_prod_PV_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 
 	# if response is not empty
-	if not response1 or len(response1.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message1")
+	if(response1.empty() == True):
+		log_info("[Residential][LOG] Empty message1")
 		return ("[Residential][LOG] Empty message1")
 
-	# over_production = if (P_Grid<0) then (-P_Grid) else 0
-	# Consequently, multiply response1 to -1
-	listOfinterest = response1.json()['results'][0]['series'][0]['values']
-	resultOverProd = [(x[0],float(x[1]*(-1))) if x[1] else (x[0],x[1]) for x in listOfinterest]
-	# ----------------------------------------------------------------------------------------- #
-	
-	# ----------------------------------------------------------------------------------------- #
-	service_prod_PV_path = address + database2 + froniusquery1 + field + froniusquery2 + "\"" + str(measurementID2) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
-
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_prod_PV_path)
-
-	try:
-		response2 = requests.get(service_prod_PV_path, auth=HTTPBasicAuth(username,password))
-	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_prod_PV_path)
-		return str("[Residential] Influx Service Not reachable/available")
+	# over_production = if (P_Grid<0) then (-P_Grid) else 0
+	# Consequently, multiply response1 to -1
+	overProdSeries = response1.series()
+	resultOverProd = -overProdSeries.column()
+	# ----------------------------------------------------------------------------------------- #
 
 	# if response is not empty
-	if not response2 or len(response2.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message2")
+	if(response2.empty() == True):
+		log_info("[Residential][LOG] Empty message2")
 		return ("[Residential][LOG] Empty message2")
 
-	secondlistOfinterest = response2.json()['results'][0]['series'][0]['values']
+	PVSeries = response2.series()
 
 	# Even Production is multipled to -1 if the source is SMX (negative values for production)
 	# Otherwise (if PV source is Fronius) then exloit the raw value (positive values for production)
 	if(field == "Processed_P"):
-		if(enablePrints == True):
-			print("Identified PV SMX source ")
-		# resultPV = [(x[0],float(x[1]*(-1))) for x in secondlistOfinterest if x[1]]
-		resultPV = [(x[0],float(x[1]*(-1))) if x[1] else (x[0],x[1]) for x in secondlistOfinterest]
+		log_info("Identified PV SMX source ")
+		resultPV = -PVSeries.column()
 	else:
-		if(enablePrints == True):
-			print("Identified PV Fronius source ")
-		# resultPV = [(x[0],float(x[1])) for x in secondlistOfinterest if x[1]]
-		resultPV = [(x[0],float(x[1])) if x[1] else (x[0],x[1]) for x in secondlistOfinterest]
+		log_info("Identified PV Fronius source ")
+		resultPV = PVSeries.column()
 
-	if(len(resultPV) >= len(resultOverProd)):
-		currentLen = len(resultOverProd)
-	else:
-		currentLen = len(resultPV)
+	currentLen = min(len(resultPV), len(resultOverProd))
+	resultPV       = resultPV[:currentLen]
+	resultOverProd = resultOverProd[:currentLen]
 
 	# Build up the tuple composed by: (timestamp,value)
 	# where value is the current production (estimated as): 
@@ -2524,11 +4384,12 @@ def evaluate_production(handler):
 	# Only if the value exists (Not Null/None values)
 	# Note that: it is mandatory to keep the relation with the time for both of them
 	# Otherwise, the resulting lists will be different! (Consequently the evaluation will fail)
-	finalresult = [(resultPV[y][0],float(resultPV[y][1] - resultOverProd[y][1])) for y in range(currentLen) if resultPV[y][1] and resultOverProd[y][1]]
+	keep        = np.flatnonzero((resultPV != 0) & ~np.isnan(resultPV) & (resultOverProd != 0) & ~np.isnan(resultOverProd))
+	finalresult = list(zip(PVSeries.time_strings(keep), (resultPV[keep] - resultOverProd[keep]).tolist()))
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 
 	return finalresult
@@ -2544,62 +4405,44 @@ def get_power2battery(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get power2battery (starts)")
+	log_info("[Residential][LOG] Get power2battery (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -2614,30 +4457,29 @@ def get_power2battery(handler):
 	#   consumption_battery    = if (P_Akku<0) then (-P_Akku) else 0
 	service_path = address + database + froniusquery1 + "P-Akku" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Akku\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query_result(service_path, epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	# if response is not empty
-	if not response or len(response.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message")
+	if(response.empty() == True):
+		log_info("[Residential][LOG] Empty message")
 		return ("[Residential][LOG] Empty message")
 	
-	listOfinterest = response.json()['results'][0]['series'][0]['values']		
-	result = [(x[0],x[1]*(-1)) for x in listOfinterest if x[1]]
+	series = response.series()
+	power  = series.column()
+	keep   = np.flatnonzero(~series.null() & (power != 0))
+	result = list(zip(series.time_strings(keep), (-power[keep]).tolist()))
 
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 	return result
 
@@ -2654,62 +4496,44 @@ def evaluate_total_production(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] evaluate_total_production (starts)")
+	log_info("[Residential][LOG] evaluate_total_production (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	measurementID = params.measurement
 
-	measurementID = words.split("/")[4]
-
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -2721,8 +4545,8 @@ def evaluate_total_production(handler):
 		database2 = "S4G-DWH-USM"
 		field     = "Processed_P" 
 	else:
-		print("[Residential][LOG] Error: only Bolzano pilot have SMX measuring PV consumption!")		
-		print("[Residential][LOG] Error: Try to exploit PV values from Fronius instead!")		
+		log_error("[Residential][LOG] Error: only Bolzano pilot have SMX measuring PV consumption!")
+		log_error("[Residential][LOG] Error: Try to exploit PV values from Fronius instead!")
 		measurementID2 = measurementID
 		database2 = "S4G-DWH-TEST"
 		field = "P-PV"
@@ -2730,70 +4554,59 @@ def evaluate_total_production(handler):
 	#   Where: production_battery  = if (P_Akku>0) then (+P_Akku) else 0
 	service_path = address + database2 + froniusquery1 + "P-Akku" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Akku\" > 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
+
+	#   Where: prod_PV             = Processed_P da (SMX) or P_PV da (Fronius)
+	service_prod_PV_path = address + database2 + froniusquery1 + field + froniusquery2 + "\"" + str(measurementID2) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
+
+	log_info("[Residential][LOG] INFLUX API %s", service_prod_PV_path)
 
+	# Both series are requested at the same time
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response, response2 = influxClient.query_results([service_path, service_prod_PV_path], epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
+		log_info("[Residential][LOG] INFLUX API %s", service_prod_PV_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 
 	# if response is not empty
-	if not response or len(response.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message1")
+	if(response.empty() == True):
+		log_info("[Residential][LOG] Empty message1")
 		return ("[Residential][LOG] Empty message1")
 
 	# ***
-	production_batterylist = response.json()['results'][0]['series'][0]['values']
-	prod_batterylist = [(x[0],float(x[1]*(-1))) if x[1] else (x[0],x[1]) for x in production_batterylist]
-
-	#   Where: prod_PV             = Processed_P da (SMX) or P_PV da (Fronius)
-	service_path = address + database2 + froniusquery1 + field + froniusquery2 + "\"" + str(measurementID2) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' " + str(opQuery) + " time(" + str(interval) + "m)" 
-
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
-
-	try:
-		response2 = requests.get(service_path, auth=HTTPBasicAuth(username,password))
-	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
-		return str("[Residential] Influx Service Not reachable/available")
-
+	prod_batterylist = -response.series().column()
 
 	# if response is not empty
-	if not response2 or len(response2.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message2")
+	if(response2.empty() == True):
+		log_info("[Residential][LOG] Empty message2")
 		return ("[Residential][LOG] Empty message2")
 
-	secondlistOfinterest = response2.json()['results'][0]['series'][0]['values']
+	PVSeries = response2.series()
 	# Even Production is multipled to -1 if the source is SMX (negative values for production)
 	# Otherwise (if PV source is Fronius) then exloit the raw value (positive values for production)
 	if(field == "Processed_P"):
-		print("Identified PV SMX source ")
-		# resultPV = [(x[0],float(x[1]*(-1))) for x in secondlistOfinterest if x[1]]
-		resultPV = [(x[0],float(x[1]*(-1))) if x[1] else (x[0],x[1]) for x in secondlistOfinterest]
+		log_debug("Identified PV SMX source ")
+		resultPV = -PVSeries.column()
 	else:
-		print("Identified PV Fronius source ")
-		# resultPV = [(x[0],float(x[1])) for x in secondlistOfinterest if x[1]]
-		resultPV = [(x[0],float(x[1])) if x[1] else (x[0],x[1]) for x in secondlistOfinterest]
+		log_debug("Identified PV Fronius source ")
+		resultPV = PVSeries.column()
 
 	# Build up the tuple composed by: (timestamp,value)
 	# where value is the total_production (estimated as): 
 	# production = production_battery + prod_PV
 	# Only if the value exists (Not Null/None values)
-	finalresult = [(resultPV[y][0],float(prod_batterylist[y][1] - resultPV[y][1])) for y in range(len(resultPV)) if resultPV[y][1] and prod_batterylist[y][1]]
+	currentLen       = min(len(resultPV), len(prod_batterylist))
+	resultPV         = resultPV[:currentLen]
+	prod_batterylist = prod_batterylist[:currentLen]
+	keep        = np.flatnonzero((resultPV != 0) & ~np.isnan(resultPV) & (prod_batterylist != 0) & ~np.isnan(prod_batterylist))
+	finalresult = list(zip(PVSeries.time_strings(keep), (prod_batterylist[keep] - resultPV[keep]).tolist()))
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 
 	return finalresult
@@ -2810,62 +4623,44 @@ def evaluate_direct_consumption(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] evaluate_direct_consumption (starts)")
+	log_info("[Residential][LOG] evaluate_direct_consumption (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
-
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	measurementID = words.split("/")[4]
+	measurementID = params.measurement
 
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
-
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -2879,20 +4674,18 @@ def evaluate_direct_consumption(handler):
 
 	service_path = address + database + froniusquery1 + "P-Load" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Grid\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_path)
 
 	try:
-		response = requests.get(service_path, auth=HTTPBasicAuth(username,password))
+		response = influxClient.query(service_path)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 	return "Not Yet fully implemented (DEPRECATED)"
 
@@ -2907,62 +4700,44 @@ def evaluate_power2grid(handler):
 	global influxServer
 	global influxLocalServer
 	global basequery
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] evaluate_power2grid (starts)")
+	log_info("[Residential][LOG] evaluate_power2grid (starts)")
 
 	# --------------------------------------------------------------------- #
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destination = words.split("/")[1]
+	destination = params.destination
 
 	if(destination == "INFLUXDB"):
 		address = influxServer
 	else:
 		address = influxLocalServer
 
-	fromDate_tmp = words.split("/")[2]
-	fromDate = fromDate_tmp.replace("-",".")
+	fromDate = params.fromDateRaw
+	toDate = params.toDateRaw
 
-	toDate_tmp = words.split("/")[3]
-	toDate = toDate_tmp.replace("-",".")
+	measurementID = params.measurement
 
-	measurementID = words.split("/")[4]
-
-	operation = words.split("/")[6]
+	operation = params.operation
 
 	if(operation in knownOperations):
 		opQuery = knownOperations[operation]
 	else:
 		return str("[Residential][LOG] Unknown Operation")
 
-	interval  = words.split("/")[7]
+	interval  = params.interval
 
-	if(enablePrints == True):
-		print("[Residential][LOG] get historical data (" + measurementID + ") from: (" + fromDate + ") to: (" + toDate + ")")
+	log_info("[Residential][LOG] get historical data (%s) from: (%s) to: (%s)", measurementID, fromDate, toDate)
 
 	# --------------------------------------------------------------------- #
-	# Build real datetime objects to avoid compatibility issue
-	# Verify if correct date
-	year, month, day = fromDate.split('.')
-	try:
-		fromDate = datetime(int(year), int(month), int(day),0, 0, 0, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(fromDate))
-
-	fromDate = str(fromDate).split('+')[0]
+	# Dates have been already verified by the route table (RequestParams)
+	if(params.dateError is not None):
+		return str("[Residential][LOG] Wrong Date: " + str(params.dateError))
 
-	# Verify if correct date
-	year, month, day = toDate.split('.')
-	try:
-		# toDate = datetime(int(year), int(month), int(day), 0, 0, 0, tzinfo=tz.utc)
-		toDate = datetime(int(year), int(month), int(day), 23, 59, 59, tzinfo=tz.utc)
-	except ValueError:
-		return str("[Residential][LOG] Wrong Date: " + str(toDate))
-
-	toDate = str(toDate).split('+')[0]
+	fromDate = params.fromDateStr
+	toDate   = params.toDateStr
 
 	# Verify if starting date is before ending date
 	if(fromDate > toDate):
@@ -2977,66 +4752,56 @@ def evaluate_power2grid(handler):
 	# Where over_production        = if (P_Grid<0) then (-P_Grid) else 0
 	service_over_production_path = address + database + froniusquery1 + "P-Grid" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Grid\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_over_production_path)
+	log_info("[Residential][LOG] INFLUX API %s", service_over_production_path)
+
+	# Where consumption_battery    = if (P_Akku<0) then (-P_Akku) else 0
+	service_consumption_battery_path = address + database + froniusquery1 + "P-Akku" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Akku\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
 
+	log_info("[Residential][LOG] INFLUX API %s", service_consumption_battery_path)
+
+	# Both series are requested at the same time
 	try:
-		response1 = requests.get(service_over_production_path, auth=HTTPBasicAuth(username,password))
+		response1, response2 = influxClient.query_results([service_over_production_path, service_consumption_battery_path], epoch=None)
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
+		log_error("Exception: %s", e)
+		log_info("[Residential][LOG] INFLUX API %s", service_over_production_path)
+		log_info("[Residential][LOG] INFLUX API %s", service_consumption_battery_path)
 		return str("[Residential] Influx Service Not reachable/available")
 
 	# multiply response1 to -1
 	# if response is not empty
-	if not response1 or len(response1.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message1")
+	if(response1.empty() == True):
+		log_info("[Residential][LOG] Empty message1")
 		return ("[Residential][LOG] Empty message1")
 
 	# over_production = if (P_Grid<0) then (-P_Grid) else 0
 	# Consequently, multiply response1 to -1
-	listOfinterest = response1.json()['results'][0]['series'][0]['values']
-	# resultOverProd = [(x[0],x[1]*(-1)) for x in listOfinterest if x[1]]
-	resultOverProd = [(x[0],float(x[1]*(-1))) if x[1] else (x[0],x[1]) for x in listOfinterest]
-
-	# Where consumption_battery    = if (P_Akku<0) then (-P_Akku) else 0
-	service_consumption_battery_path = address + database + froniusquery1 + "P-Akku" + froniusquery2 + "\"" + str(measurementID) + "\" where time > " + "\'" + str(fromDate) + "\' and time < " + "\'" + str(toDate) + "\' and \"P-Akku\" < 0 " + str(opQuery) + " time(" + str(interval) + "m)" 
-
-	if(enablePrints == True):
-		print("[Residential][LOG] INFLUX API " + service_path)
-
-	try:
-		response2 = requests.get(service_consumption_battery_path, auth=HTTPBasicAuth(username,password))
-	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] INFLUX API " + service_path)
-		return str("[Residential] Influx Service Not reachable/available")
+	overProdSeries = response1.series()
+	resultOverProd = -overProdSeries.column()
 
 	# multiply response2 to -1
 	# if response is not empty
-	if not response2 or len(response2.json()['results'][0]) <= 1:
-		if(enablePrints == True):
-			print("[Residential][LOG] Empty message1")
+	if(response2.empty() == True):
+		log_info("[Residential][LOG] Empty message1")
 		return ("[Residential][LOG] Empty message1")
 
 	# consumption_battery    = if (P_Akku<0) then (-P_Akku) else 0
 	# Consequently, multiply response1 to -1
-	listOfinterest = response2.json()['results'][0]['series'][0]['values']
-	# resultConsBatt = [(x[0],x[1]*(-1)) for x in listOfinterest if x[1]]
-	resultConsBatt = [(x[0],float(x[1]*(-1))) if x[1] else (x[0],x[1]) for x in listOfinterest]
+	resultConsBatt = -response2.series().column()
 
 	# Build up the tuple composed by: (timestamp,value)
 	# where value is the total_production (estimated as): 
 	# power2grid = over_production + consumption_battery
 	# Only if the value exists (Not Null/None values)
-	finalresult = [(resultOverProd[y][0],float(resultOverProd[y][1] + resultConsBatt[y][1])) for y in range(len(resultOverProd)) if resultOverProd[y][1] and resultConsBatt[y][1]]
+	currentLen     = min(len(resultOverProd), len(resultConsBatt))
+	resultOverProd = resultOverProd[:currentLen]
+	resultConsBatt = resultConsBatt[:currentLen]
+	keep        = np.flatnonzero((resultOverProd != 0) & ~np.isnan(resultOverProd) & (resultConsBatt != 0) & ~np.isnan(resultConsBatt))
+	finalresult = list(zip(overProdSeries.time_strings(keep), (resultOverProd[keep] + resultConsBatt[keep]).tolist()))
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] INFLUX API last: " + str(end - start))	
+		log_info("[Residential][LOG] INFLUX API last: %s", end - start)
 
 	return finalresult
 
@@ -3076,9 +4841,8 @@ professStartMsg = {"control_frequency": 30,\
 def get_opmode(handler):
 	global opmode
 
-	if(enablePrints == True):
-		print("[Residential][LOG][GET]: " + str(opmode))
-		print("[Residential][LOG] Current operational Mode: " + str(knownOpmode[int(opmode)]))
+	log_info("[Residential][LOG][GET]: %s", opmode)
+	log_info("[Residential][LOG] Current operational Mode: %s", knownOpmode[int(opmode)])
 
 	# # # # # # # # # # # # # # # # # # # # # # # ## # # # # # # # # # # # # # # # # # # # # # # #
 	# Start interactions with PROFESS to align the current local OpMode value
@@ -3089,10 +4853,9 @@ def get_opmode(handler):
 	# # # # # # # # # # # # # # # # # # # # # # # ## # # # # # # # # # # # # # # # # # # # # # # #
 
 	try:
-		response = requests.get(url = URL_PROFESS_STATUS)
+		response = upstream_request('GET', url = URL_PROFESS_STATUS)
 	except Exception as e:
-		if(enablePrints == True):
-			print("[Residential][LOG] Get PROFESS Status " + URL_PROFESS_STATUS + " Error: %s" %e)
+		log_error("[Residential][LOG] Get PROFESS Status %s Error: %s", URL_PROFESS_STATUS, e)
 		return ("[Residential][LOG] Get PROFESS Status " + URL_PROFESS_STATUS + " Error: %s" %e)
 
 	if (sys.version_info > (3, 0) and sys.version_info < (3, 6)):
@@ -3100,35 +4863,30 @@ def get_opmode(handler):
 	else:
 		json_string = json.loads(response.content)
 
-	if(enablePrints == True):
-		print("[Residential][LOG] Get PROFESS Status")
+	log_info("[Residential][LOG] Get PROFESS Status")
 
 	# # # # # # # # # # # # # # # # # # # # # # # ## # # # # # # # # # # # # # # # # # # # # # # #
 	# Start Parsing:
 	try:
 		tmpResult = json_string['status']
 
-		if(enablePrints == True):
-			print("[Residential][LOG] Status parsing: " + str(tmpResult))
+		log_info("[Residential][LOG] Status parsing: %s", tmpResult)
 
 		found = False
 		for key in tmpResult:
-			if(enablePrints == True):			
-				print("[Residential][LOG] Status parsing [KEY]: " + str(key))
+			log_info("[Residential][LOG] Status parsing [KEY]: %s", key)
 
 			temporary = tmpResult[str(key)]
 			startTime = temporary['start_time']
 			status    = temporary['status']
 			if(str(status) == str(RUNNING_STATUS_PROFESS)):
 				result    = temporary['config']
-				if(enablePrints == True):			
-					print("[Residential][LOG] FOUND [KEY]: " + str(result['model_name']))
-					print("[Residential][LOG] Is Active: " + str(status))
+				log_info("[Residential][LOG] FOUND [KEY]: %s", result['model_name'])
+				log_info("[Residential][LOG] Is Active: %s", status)
 				found = True			
 
 		if (found == False):
-			if(enablePrints == True):			
-				print("[Residential][LOG] Get PROFESS Status Parsing returned no active options")
+			log_info("[Residential][LOG] Get PROFESS Status Parsing returned no active options")
 
 			# Update Local Value
 			opmode = DEFAULT_OPMODE
@@ -3136,16 +4894,14 @@ def get_opmode(handler):
 			return int(opmode)
 
 	except Exception as e:
-		print("[Residential][LOG] Get PROFESS Status Failed: %s (PROFESS Not Active)" %e)
+		log_error("[Residential][LOG] Get PROFESS Status Failed: %s (PROFESS Not Active)", e)
 		return ("[Residential][LOG] Get PROFESS Status Failed: %s (PROFESS Not Active)" %e)
 
 	# if response is not empty and one PROFESS configuration is active
 	if not result or len(result) == 0:
-		if(enablePrints == True):
-			print("[Residential][LOG][PROFESS] Returned Empty message")
+		log_info("[Residential][LOG][PROFESS] Returned Empty message")
 	else:
-		if(enablePrints == True):
-			print("[Residential][LOG][PROFESS] Returned message, start parsing")
+		log_info("[Residential][LOG][PROFESS] Returned message, start parsing")
 		try:
 			professStartMsg['control_frequency'] = result['control_frequency']
 			professStartMsg['horizon_in_steps']  = result['horizon_in_steps']
@@ -3156,8 +4912,7 @@ def get_opmode(handler):
 			professStartMsg['single_ev']         = result['single_ev']
 			professStartMsg['solver']            = result['solver']
 		except Exception as e:
-			if(enablePrints == True):
-				print("[Residential][LOG] PROFESS Returned partial message! Error: %s" %e)
+			log_error("[Residential][LOG] PROFESS Returned partial message! Error: %s", e)
 			return ("[Residential][LOG] PROFESS Returned partial message! Error: %s" %e)
 
 		# Translate the received message in the known Operation modes:
@@ -3165,7 +4920,7 @@ def get_opmode(handler):
 			if(professStartMsg['model_name'] in reverseknownOpmode):
 				opmode = reverseknownOpmode[professStartMsg['model_name']]
 		except Exception as e:
-			print("[Residential][LOG] PROFESS Returned Uknwown OpMode! Error: %s" %e)
+			log_error("[Residential][LOG] PROFESS Returned Uknwown OpMode! Error: %s", e)
 			return ("[Residential][LOG] PROFESS Returned Uknwown OpMode! Error: %s" %e)
 	# # # # # # # # # # # # # # # # # # # # # # # ## # # # # # # # # # # # # # # # # # # # # # # #
 	return int(opmode)
@@ -3181,16 +4936,14 @@ def set_opmode(handler):
 	global opmode
 	global knownOpmode
 
-	if(enablePrints == True):
-		print("[Residential][LOG][SET] Will override: " + str(opmode))
+	log_info("[Residential][LOG][SET] Will override: %s", opmode)
 
 	try:
 		key = handler.get_payload()
 		if (key != None):
 			if(str(key).isdigit() == True):
 				if (key in knownOpmode):
-					if(enablePrints == True):
-						print("[Residential][LOG][SET]: " + str(key) + " == " + str(knownOpmode[key]))
+					log_info("[Residential][LOG][SET]: %s == %s", key, knownOpmode[key])
 
 					# Update local value
 					opmode = int(key)
@@ -3201,7 +4954,7 @@ def set_opmode(handler):
 						# # # # # # # # # # # # # # # # # # # # # # # ## # # # # # # # # # # # # # # # # # # # # # # #
 						# Proper Value (Start interactions with GESSCon):
 						# # # # # # # # # # # # # # # # # # # # # # # ## # # # # # # # # # # # # # # # # # # # # # # #
-						print("[Residential] Requested setting not enabled yet: " + str(knownOpmode[int(opmode)]))
+						log_warning("[Residential] Requested setting not enabled yet: %s", knownOpmode[int(opmode)])
 						return ("[Residential] Requested setting not enabled yet: " + str(knownOpmode[int(opmode)]))
 
 
@@ -3212,10 +4965,9 @@ def set_opmode(handler):
 					# 2. Fill & Send Start command with retrieved data
 					# # # # # # # # # # # # # # # # # # # # # # # ## # # # # # # # # # # # # # # # # # # # # # # #
 					try:
-						response = requests.get(url = URL_PROFESS_STATUS)
+						response = upstream_request('GET', url = URL_PROFESS_STATUS)
 					except Exception as e:
-						if(enablePrints == True):
-							print("[Residential][LOG] Get/Set PROFESS Status " + URL_PROFESS_STATUS + " Error: %s" %e)
+						log_error("[Residential][LOG] Get/Set PROFESS Status %s Error: %s", URL_PROFESS_STATUS, e)
 						return ("[Residential][LOG] Get/Set PROFESS Status " + URL_PROFESS_STATUS + " Error: %s" %e)
 
 					if (sys.version_info > (3, 0) and sys.version_info < (3, 6)):
@@ -3223,21 +4975,18 @@ def set_opmode(handler):
 					else:
 						json_string = json.loads(response.content)
 
-					if(enablePrints == True):
-						print("[Residential][LOG] Get/Set PROFESS Status")
+					log_info("[Residential][LOG] Get/Set PROFESS Status")
 
 					try:
 						tmpResult = json_string['status']
 
-						if(enablePrints == True):
-							print("[Residential][LOG] Status parsing: " + str(tmpResult))
+						log_info("[Residential][LOG] Status parsing: %s", tmpResult)
 
 						found         = False
 						foundSettings = False
 
 						for field in tmpResult:
-							if(enablePrints == True):			
-								print("[Residential][LOG] Status parsing [KEY]: " + str(field))
+							log_info("[Residential][LOG] Status parsing [KEY]: %s", field)
 
 							temporary = tmpResult[str(field)]
 							result    = temporary['config']
@@ -3246,25 +4995,22 @@ def set_opmode(handler):
 
 							if(str(status) == str(RUNNING_STATUS_PROFESS)):
 							# Verify if one is already active
-								if(enablePrints == True):			
-									print("[Residential][LOG] FOUND [KEY]: " + str(result['model_name']))
-									print("[Residential][LOG] Is Active: " + str(status))
+								log_info("[Residential][LOG] FOUND [KEY]: %s", result['model_name'])
+								log_info("[Residential][LOG] Is Active: %s", status)
 								found        = True
 								idOfInterest = field
 
 							if(str(result['model_name']) == str(knownOpmode[int(opmode)])):
 							# Collect info about the mode of interest
-								if(enablePrints == True):			
-									print("[Residential][LOG] FOUND [KEY]: " + str(result['model_name']))
-									print("[Residential][LOG] Collecting its config: " + str(status))
+								log_info("[Residential][LOG] FOUND [KEY]: %s", result['model_name'])
+								log_info("[Residential][LOG] Collecting its config: %s", status)
 								foundSettings    = True
 								resultOfInterest = temporary['config']
 								idtoStart = field			
 
 						if (found == False):
 							# PROFESS Not Active 
-							if(enablePrints == True):			
-								print("[Residential][LOG] Get PROFESS Status Parsing returned no active options")
+							log_info("[Residential][LOG] Get PROFESS Status Parsing returned no active options")
 							# It means that we can start a new option (without stopping the previous one)
 							opmode = DEFAULT_OPMODE
 						else:						
@@ -3275,30 +5021,27 @@ def set_opmode(handler):
 							# Then Send the start command (idtoStart + params)
 							try:
 								# Trigger a new PROFESS start
-								response = requests.put(url = str(URL_PROFESS_STOP) + str(idOfInterest), headers = HEADERS)
+								response = upstream_request('PUT', url = str(URL_PROFESS_STOP) + str(idOfInterest), headers = HEADERS)
 							except Exception as e:
-								print("[Residential][LOG] PROFESS Did not accept STOP! [" + str(idOfInterest) + "] Error: %s" %e)
+								log_error("[Residential][LOG] PROFESS Did not accept STOP! [%s] Error: %s", idOfInterest, e)
 								return ("[Residential][LOG] PROFESS Did not accept STOP! Error: %s" %e)
 
 					except Exception as e:
-						print("[Residential][LOG] Retrieval of current PROFESS Status Failed: %s (PROFESS Not Active)" %e)
+						log_error("[Residential][LOG] Retrieval of current PROFESS Status Failed: %s (PROFESS Not Active)", e)
 						return ("[Residential][LOG] Retrieval of current PROFESS Status Failed: %s (PROFESS Not Active)" %e)
 
 					if(foundSettings == False and str(knownOpmode[int(opmode)]) != "None"):
-						print("[Residential][LOG] Set PROFESS Status Failed: opmode not found: " + str(knownOpmode[int(opmode)]))
+						log_error("[Residential][LOG] Set PROFESS Status Failed: opmode not found: %s", knownOpmode[int(opmode)])
 						return ("[Residential][LOG] Set PROFESS Status Failed: opmode not found: " + str(knownOpmode[int(opmode)]))
 					elif(foundSettings == False and str(knownOpmode[int(opmode)]) == "None"):
-						if(enablePrints == True):
-							print("[Residential][LOG] Set PROFESS Status to: " + str(knownOpmode[int(opmode)]))
+						log_info("[Residential][LOG] Set PROFESS Status to: %s", knownOpmode[int(opmode)])
 						return int(opmode)
 
 					# if response is not empty
 					if not result or len(result) == 0:
-						if(enablePrints == True):
-							print("[Residential][LOG][PROFESS] Returned Empty message")
+						log_info("[Residential][LOG][PROFESS] Returned Empty message")
 					else:
-						if(enablePrints == True):
-							print("[Residential][LOG][PROFESS] Returned message, start parsing")
+						log_info("[Residential][LOG][PROFESS] Returned message, start parsing")
 
 						# We could have received a message containing an old Operation mode that
 						# we want to change 
@@ -3313,52 +5056,45 @@ def set_opmode(handler):
 							professStartMsg['single_ev']         = resultOfInterest['single_ev']
 							professStartMsg['solver']            = resultOfInterest['solver']
 						except Exception as e:
-							if(enablePrints == True):
-								print("[Residential][LOG] PROFESS Returned partial message! Error: %s" %e)
+							log_error("[Residential][LOG] PROFESS Returned partial message! Error: %s", e)
 							return ("[Residential][LOG] PROFESS Returned partial message! Error: %s" %e)
 
-						if(enablePrints == True):
-							print("[Residential][LOG] PREVIOUS PROFESS(OPMODE): " + str(professStartMsg['model_name']))
+						log_info("[Residential][LOG] PREVIOUS PROFESS(OPMODE): %s", professStartMsg['model_name'])
 
 						# Translate the received message in the known Operation modes:
 						# professStartMsg['model_name'] (OLD OPERATION MODE)
 						# Update model value
 						professStartMsg['model_name'] = str(knownOpmode[key])
 
-						if(enablePrints == True):
-							print("[Residential][LOG] PROFESS(OPMODE) TO SET: " + str(professStartMsg['model_name']))
+						log_info("[Residential][LOG] PROFESS(OPMODE) TO SET: %s", professStartMsg['model_name'])
 
 						try:
 							# Trigger a new PROFESS start
-							response = requests.put(url = str(URL_PROFESS_START) + str(idtoStart), data = json.dumps(professStartMsg), headers = HEADERS)
+							response = upstream_request('PUT', url = str(URL_PROFESS_START) + str(idtoStart), data = json.dumps(professStartMsg), headers = HEADERS)
 						except Exception as e:
-							print("[Residential][LOG] PROFESS Did not accept START! Error: %s" %e)
+							log_error("[Residential][LOG] PROFESS Did not accept START! Error: %s", e)
 							return ("[Residential][LOG] PROFESS Did not accept START! Error: %s" %e)
 
 					# # # # # # # # # # # # # # # # # # # # # # # ## # # # # # # # # # # # # # # # # # # # # # # #
 				else:
-					if(enablePrints == True):
-						print("[Residential][LOG][SET] Operation Mode: " + str(key) + " FAILED! [Not Allowed Value]")
+					log_error("[Residential][LOG][SET] Operation Mode: %s FAILED! [Not Allowed Value]", key)
 					return "[Residential][LOG][SET] Operation Mode: " + str(key) + " FAILED! [Not Allowed Value]"
 
 
-				if(enablePrints == True):
-					print("[Residential][LOG][SET] Operation Mode: " + str(knownOpmode[key]))
+				log_info("[Residential][LOG][SET] Operation Mode: %s", knownOpmode[key])
 
 				# Proper Value Returns
 				return int(key)
 			else:
-				if(enablePrints == True):
-					print("[Residential][LOG][SET] Operation Mode Given is not a permitted value! [" + str(key) + "]")
+				log_info("[Residential][LOG][SET] Operation Mode Given is not a permitted value! [%s]", key)
 				return ("[Residential][LOG][SET] Operation Mode Given is not a permitted value! [" + str(key) + "]")
 		else:
-			if(enablePrints == True):
-				print("[Residential][LOG][SET] Operation Mode Not Given! Empty body or Not Allowed Values")
+			log_info("[Residential][LOG][SET] Operation Mode Not Given! Empty body or Not Allowed Values")
 			return "[Residential][LOG][SET] Operation Mode Not Given! Empty body or Not Allowed Values"
 
 	except Exception as e:
-		print("[Residential][LOG] Value generating exception: " + str(key))
-		print("[Residential][LOG][SET]: %s" %e)
+		log_error("[Residential][LOG] Value generating exception: %s", key)
+		log_debug("[Residential][LOG][SET]: %s", e)
 		return str("[Residential][LOG]Exception! Wrong message! Set %s" %e)
 	
 # ------------------------------------------------------------------------------------ #
@@ -3371,9 +5107,10 @@ def set_opmode(handler):
 def get_cycles(handler):
 	global cycles
 
-	if(enablePrints == True):
-		print("[Residential][LOG][GET] Overall Cycles")
-		print("[Residential][LOG] Current cycles: " + str(cycles))
+	read_battery_state()
+
+	log_info("[Residential][LOG][GET] Overall Cycles")
+	log_info("[Residential][LOG] Current cycles: %s", cycles)
 
 	return int(cycles)
 
@@ -3383,10 +5120,10 @@ def get_cycles(handler):
 if(enableCycleEvaluation == True):
 	def get_status(handler):
 		global state
-		if(enablePrints == True):
-			print("[Residential][LOG][GET] Battery")
-			print("[Residential][LOG] Current Status: " + str(ess_status))
-			print("[Residential][LOG] Estimated Status: " + str(state))
+		read_battery_state()
+		log_info("[Residential][LOG][GET] Battery")
+		log_info("[Residential][LOG] Current Status: %s", ess_status)
+		log_info("[Residential][LOG] Estimated Status: %s", state)
 
 		statusResponse = {"FroniusStatus":str(ess_status),"EstimatedStatus":str(state)}
 
@@ -3412,35 +5149,34 @@ EV_session  = "0"
 # Set the EV Target of interets! (To be exploited later on)
 def set_EVofInterest(handler):
 	global EV_selected
-	words = handler.path
+	params = handler.params
 
-	if(enablePrints == True):
-		print("[Residential][LOG] set_EVofInterest (starts)")
+	log_info("[Residential][LOG] set_EVofInterest (starts)")
 
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
 
-	destinationEV = words.split("/")[3]
+	destinationEV = params.evId
 
 	if(destinationEV in EV_idList):
 		EV_selected = destinationEV
+		publish_ev_selected()
 	else:
-		print("Selected destination is not managed by the current Backend: " + str(destinationEV))
+		log_warning("Selected destination is not managed by the current Backend: %s", destinationEV)
 		return str("Selected destination is not managed by the current Backend!")
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] set_EVofInterest API last: " + str(end - start))
+		log_info("[Residential][LOG] set_EVofInterest API last: %s", end - start)
 
 	return str("EV Properly Set: " + str(destinationEV))
 # ------------------------------------------------------------------------------------ #
 # Get the EV selected Status from Fronius! 
 def get_EVstatus(handler):
 	global EV_session
-	print("Did you update the EVconnector to the last version ?!?")
+	log_warning("Did you update the EVconnector to the last version ?!?")
 
-	if(enablePrints == True):
-		print("[Residential][LOG][GET] EV status")
+	log_info("[Residential][LOG][GET] EV status")
 
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
@@ -3456,16 +5192,15 @@ def get_EVstatus(handler):
 	# about the selected EV
 	# (EV_selected)
 	try:
-		response = requests.get(str(service_path),verify=False)
+		response = upstream_request('GET', str(service_path),verify=False)
 
 		if(response.status_code != 200):
 			responseData['code'] = "EV server Error: " + str(response.status_code) 
 			return responseData
 
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] EV status API (Error) " + service_path)
+		log_error("Exception: %s", e)
+		log_error("[Residential][LOG] EV status API (Error) %s", service_path)
 		responseData['code'] = "EV server unreachable"
 		return responseData
 
@@ -3478,7 +5213,7 @@ def get_EVstatus(handler):
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] get_EVstatus API last: " + str(end - start))
+		log_info("[Residential][LOG] get_EVstatus API last: %s", end - start)
 
 	return responseData
 
@@ -3486,8 +5221,7 @@ def get_EVstatus(handler):
 # ------------------------------------------------------------------------------------ #
 # Get the EV selected SoC and remaining time from Fronius! 
 def get_EVdata(handler):
-	if(enablePrints == True):
-		print("[Residential][LOG][GET] EV Data")
+	log_info("[Residential][LOG][GET] EV Data")
 
 	EVsession = 0
 	EVtime    = 0
@@ -3517,8 +5251,9 @@ def get_EVdata(handler):
 	# about the selected EV
 	# (EV_selected)
 	# ------------------------------------------------------------------------ #
+	read_ev_selected()
 	try:
-		response = requests.get(str(service_path),verify=False)
+		response = upstream_request('GET', str(service_path),verify=False)
 
 		if(response.status_code != 200):
 			return "[Residential] EV server Not reachable"
@@ -3556,7 +5291,7 @@ def get_EVdata(handler):
 		# https://10.8.0.50:8082/S4G/socs/<sessionID>
 		service_path = evconnector_url + "/S4G/socs/" + str(EVsession)
 
-		response = requests.get(str(service_path),verify=False)
+		response = upstream_request('GET', str(service_path),verify=False)
 
 		if(response.status_code != 200):
 			return "[Residential] EV server Not reachable"
@@ -3571,16 +5306,15 @@ def get_EVdata(handler):
 		responseData['SoC'] = round(result['soc'],3)
 
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] EV data API (Error) " + service_path)
+		log_error("Exception: %s", e)
+		log_error("[Residential][LOG] EV data API (Error) %s", service_path)
 		return "[Residential] EV data Not reachable/available"
 
 	# Parse here response and extract the proper SoC value:
 	# exploiting the current session ID (if present)
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] get_EVdata API last: " + str(end - start))
+		log_info("[Residential][LOG] get_EVdata API last: %s", end - start)
 
 
 	return responseData
@@ -3588,8 +5322,7 @@ def get_EVdata(handler):
 # DEPRECATED
 # Get the EV selected SoC from Fronius! 
 def get_EVsoc(handler):
-	if(enablePrints == True):
-		print("[Residential][LOG][GET] EV SoC")
+	log_info("[Residential][LOG][GET] EV SoC")
 
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
@@ -3611,15 +5344,14 @@ def get_EVsoc(handler):
 	# about the selected EV
 	# (EV_selected)
 	try:
-		response = requests.get(str(service_path),verify=False)
+		response = upstream_request('GET', str(service_path),verify=False)
 
 		if(response.status_code != 200):
 			return "[Residential] EV server Not reachable"
 
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] EV SoC API (Error) " + service_path)
+		log_error("Exception: %s", e)
+		log_error("[Residential][LOG] EV SoC API (Error) %s", service_path)
 		return "[Residential] EV SoC Not reachable/available"
 
 	# Parse here response and extract the proper SoC value:
@@ -3627,7 +5359,7 @@ def get_EVsoc(handler):
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] get_EVsoc API last: " + str(end - start))
+		log_info("[Residential][LOG] get_EVsoc API last: %s", end - start)
 
 
 	return str("STILL TO BE FINALIZED")
@@ -3635,8 +5367,7 @@ def get_EVsoc(handler):
 # DEPRECATED
 # Get the EV remaining recharging time from Fronius! 
 def get_EVremaining(handler):
-	if(enablePrints == True):
-		print("[Residential][LOG][GET] EV remaining time")
+	log_info("[Residential][LOG][GET] EV remaining time")
 
 	if(enableTimingEval == True):
 		start = datetime.utcnow()
@@ -3650,20 +5381,19 @@ def get_EVremaining(handler):
 	# about the selected EV
 	# (EV_selected)
 	try:
-		response = requests.get(str(service_path),verify=False)
+		response = upstream_request('GET', str(service_path),verify=False)
 
 		if(response.status_code != 200):
 			return "[Residential] EV server Not reachable"
 
 	except Exception as e:
-		print("Exception: %s" %e)
-		if(enablePrints == True):
-			print("[Residential][LOG] EV remaining time API (Error) " + service_path)
+		log_error("Exception: %s", e)
+		log_error("[Residential][LOG] EV remaining time API (Error) %s", service_path)
 		return "[Residential] EV remaining time Not reachable/available"
 
 	if(enableTimingEval == True):
 		end = datetime.utcnow()
-		print("[Residential][LOG] get_EVremaining API last: " + str(end - start))
+		log_info("[Residential][LOG] get_EVremaining API last: %s", end - start)
 
 
 	return str("STILL TO BE FINALIZED")
@@ -3675,13 +5405,912 @@ def get_EVremaining(handler):
 # ------------------------------------------------------------------------------------ #
 # 				HTTP REST SERVER
 # ------------------------------------------------------------------------------------ #
+# Pre-fork mode: every process binds the same port (the kernel balances the connections)
+class ReusePortMixIn(object):
+	def server_bind(self):
+		if(enablePreFork == True):
+			self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+		super(ReusePortMixIn, self).server_bind()
+
 # MULTI-THREAD IMPLEMENTATION:
-class ThreadingHTTPServer(socketserver.ThreadingMixIn, BaseHTTPServer):
+class ThreadingHTTPServer(ReusePortMixIn, socketserver.ThreadingMixIn, BaseHTTPServer):
     pass
 
+# ------------------------------------------------------------------------------------ #
+# WORKER POOL IMPLEMENTATION:
+# The main thread only accepts connections and pushes them into a bounded queue.
+# A fixed number of workers (POOL_WORKERS) serves them, so a slow InfluxDB cannot
+# make the number of threads (and memory) grow without limits.
+# When the queue is full the connection is answered immediately with a 503.
+# A worker never waits for the next request of a persistent connection: the idle
+# connection is handed to a single thread (idle_loop) which queues it again as soon as
+# the next request arrives, or closes it after KEEPALIVE_TIMEOUT.
+# ------------------------------------------------------------------------------------ #
+class PooledHTTPServer(ReusePortMixIn, BaseHTTPServer):
+	request_queue_size = POOL_QUEUE_SIZE
+	daemon_threads     = True
+
+	def __init__(self, server_address, RequestHandlerClass, workers=POOL_WORKERS, queue_size=POOL_QUEUE_SIZE, retry_after=POOL_RETRY_AFTER):
+		BaseHTTPServer.__init__(self, server_address, RequestHandlerClass)
+		self.retry_after = retry_after
+		self.pending     = queue.Queue(maxsize=queue_size)
+		# ---------------------------------------------------------- #
+		# Gauges used to size the pool (exposed by SERVER/pool)
+		self.statsLock   = threading.Lock()
+		self.busy        = 0
+		self.served      = 0
+		self.rejected    = 0
+		self.maxDepth    = 0
+		self.waitLast    = 0.0
+		self.waitMax     = 0.0
+		self.waitTotal   = 0.0
+		self.idle        = 0
+		self.idleClosed  = 0
+		# ---------------------------------------------------------- #
+		# Idle persistent connections (parked by the workers)
+		self.idleLock    = threading.Lock()
+		self.parking     = []
+		self.idleStopped = False
+		self.wakeReader, self.wakeWriter = socket.socketpair()
+		self.wakeReader.setblocking(False)
+		self.idleThread  = threading.Thread(target=self.idle_loop, name="HTTPIdle")
+		self.idleThread.daemon = self.daemon_threads
+		self.idleThread.start()
+		# ---------------------------------------------------------- #
+		self.workers = []
+		for i in range(workers):
+			worker = threading.Thread(target=self.worker_loop, name="HTTPWorker-" + str(i))
+			worker.daemon = self.daemon_threads
+			worker.start()
+			self.workers.append(worker)
+
+	def process_request(self, request, client_address):
+		self.enqueue(request, client_address, None)
+
+	# New connection (handler None) or next request of a parked connection
+	def enqueue(self, request, client_address, handler):
+		try:
+			self.pending.put_nowait((request, client_address, time.time(), handler))
+		except queue.Full:
+			if handler is not None:
+				handler.release()
+			self.reject_request(request)
+			return
+
+		depth = self.pending.qsize()
+		with self.statsLock:
+			if(depth > self.maxDepth):
+				self.maxDepth = depth
+
+	def reject_request(self, request):
+		with self.statsLock:
+			self.rejected += 1
+
+		log_debug("[Residential][HTTP][LOG] Worker pool saturated: 503 Sent")
+		body = 'Server busy, retry later\n'.encode('UTF-8')
+		try:
+			# Consume what has already been received (without blocking the accept loop)
+			# otherwise closing the socket would reset the connection before the client reads the 503
+			request.setblocking(False)
+			try:
+				request.recv(65536)
+			except OSError:
+				pass
+			request.setblocking(True)
+			request.settimeout(1.0)
+			request.sendall(("HTTP/1.0 503 Service Unavailable\r\n"
+					"Retry-After: " + str(self.retry_after) + "\r\n"
+					"Content-Type: text/plain\r\n"
+					"Content-Length: " + str(len(body)) + "\r\n"
+					"Connection: close\r\n\r\n").encode('UTF-8') + body)
+		except OSError as e:
+			log_debug("[Residential][HTTP][LOG] 503 not delivered: %s", e)
+		self.shutdown_request(request)
+
+	def worker_loop(self):
+		while True:
+			item = self.pending.get()
+			if item is None:
+				break
+			request, client_address, enqueued, handler = item
+			wait = time.time() - enqueued
+			with self.statsLock:
+				self.busy      += 1
+				self.waitLast   = wait
+				self.waitTotal += wait
+				if(wait > self.waitMax):
+					self.waitMax = wait
+			parked = False
+			try:
+				if handler is None:
+					handler = self.RequestHandlerClass(request, client_address, self)
+				else:
+					handler.resume()
+				parked = handler.parked
+			except Exception:
+				self.handle_error(request, client_address)
+			finally:
+				if(parked == True):
+					self.park(handler)
+				else:
+					self.shutdown_request(request)
+				with self.statsLock:
+					self.busy   -= 1
+					self.served += 1
+
+	# ------------------------------------------------------------------ #
+	# Idle persistent connections
+	# ------------------------------------------------------------------ #
+	# A worker can wait POOL_IDLE_GRACE for the next request (saving the hand-over
+	# to idle_loop) only while other workers are free and nothing is queued
+	def grace_allowed(self):
+		return self.pending.empty() and self.busy < len(self.workers) - 1
+
+	def park(self, handler):
+		with self.idleLock:
+			self.parking.append(handler)
+		self.wake()
+
+	def wake(self):
+		try:
+			self.wakeWriter.send(b'\0')
+		except OSError:
+			pass
+
+	def idle_loop(self):
+		selector = selectors.DefaultSelector()
+		selector.register(self.wakeReader, selectors.EVENT_READ)
+		deadlines = {}   # handler: time the idle connection is closed
+		while(self.idleStopped == False):
+			now     = time.time()
+			timeout = min(deadlines.values()) - now if len(deadlines) > 0 else None
+			for key, events in selector.select(None if timeout is None else max(timeout, 0.)):
+				if key.fileobj is self.wakeReader:
+					try:
+						while self.wakeReader.recv(4096):
+							pass
+					except OSError:
+						pass
+					with self.idleLock:
+						parking, self.parking = self.parking, []
+					for handler in parking:
+						try:
+							selector.register(handler.connection, selectors.EVENT_READ, handler)
+						except (OSError, ValueError):
+							self.close_idle(handler)
+							continue
+						deadlines[handler] = time.time() + KEEPALIVE_TIMEOUT
+				else:
+					# Next request (or connection closed by the client): back to the workers
+					handler = key.data
+					selector.unregister(handler.connection)
+					del deadlines[handler]
+					self.enqueue(handler.request, handler.client_address, handler)
+			now = time.time()
+			for handler, deadline in list(deadlines.items()):
+				if(deadline <= now):
+					selector.unregister(handler.connection)
+					del deadlines[handler]
+					self.close_idle(handler)
+			self.idle = len(deadlines)
+		for handler in list(deadlines):
+			self.close_idle(handler)
+		selector.close()
+
+	def close_idle(self, handler):
+		handler.release()
+		self.shutdown_request(handler.request)
+		with self.statsLock:
+			self.idleClosed += 1
+
+	def get_gauges(self):
+		with self.statsLock:
+			started = self.served + self.busy
+			gauges = {
+				"workers":      len(self.workers),
+				"busy":         self.busy,
+				"queueSize":    self.pending.maxsize,
+				"queueDepth":   self.pending.qsize(),
+				"queueMaxDepth":self.maxDepth,
+				"served":       self.served,
+				"rejected":     self.rejected,
+				"idle":         self.idle,
+				"idleClosed":   self.idleClosed,
+				"waitLastMs":   round(self.waitLast * 1000.0, 3),
+				"waitMaxMs":    round(self.waitMax * 1000.0, 3),
+				"waitAvgMs":    round(self.waitTotal * 1000.0 / started, 3) if started > 0 else 0.0,
+			}
+		return gauges
+
+	def server_close(self):
+		BaseHTTPServer.server_close(self)
+		for worker in self.workers:
+			self.pending.put(None)
+		for worker in self.workers:
+			worker.join(5.0)
+		self.idleStopped = True
+		self.wake()
+		self.idleThread.join(5.0)
+		self.wakeReader.close()
+		self.wakeWriter.close()
+
+# ------------------------------------------------------------------------------------ #
+# Worker Pool Gauges (queue depth, wait time, rejected requests):
+def get_server_pool(handler):
+	log_info("[Residential][LOG][GET] Server Pool Gauges")
+
+	if(hasattr(handler.server, "get_gauges") == False):
+		return str("Endpoint Disabled! Verify Backend flags!")
+
+	return handler.server.get_gauges()
+
+# ------------------------------------------------------------------------------------ #
+# Every route pattern starts with its first URI segment (or a group of alternatives):
+#   ^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/...   ^/EV/...   ^/OPMODE$
+# It is used as key to dispatch each request only towards the routes sharing it.
+routeHead = re.compile(r'^\^/(?:\(\?P<\w+>)?([A-Za-z_|]+)\)?(?:/|\$)')
+
+def compile_routes(table):
+	routes = {}
+	for pattern, route in table:
+		compiled = re.compile(pattern)
+		for head in routeHead.match(pattern).group(1).split('|'):
+			routes.setdefault(head, []).append((compiled, route))
+	return routes
+
+# ------------------------------------------------------------------------------------ #
+# Transport-independent responses:
+# Both the socketserver stack (RESTRequestHandler) and the asyncio stack (AsyncHTTPServer)
+# build the same RESTResponse and then write it on their own connection.
+# ------------------------------------------------------------------------------------ #
+class RESTResponse(object):
+	__slots__ = ('status', 'headers', 'body')
+
+	def __init__(self, status, headers=None, body=None):
+		self.status  = status
+		self.headers = headers if headers is not None else []
+		self.body    = body
+
+# ------------------------------------------------------------------------------------ #
+# HTTP caching:
+# Settled windows get an ETag derived from the request itself (the data behind it cannot
+# change anymore), so conditional requests and HEAD are answered without querying InfluxDB.
+# Any other GET gets an ETag computed on its body (saving only the transfer).
+# ------------------------------------------------------------------------------------ #
+def settled_window(params):
+	if(params is None or params.toDate is None or params.dateError is not None):
+		return False
+	return params.toDate < datetime.now(tz.utc) - SETTLED_DELAY
+
+def settled_headers(params):
+	etag = hashlib.sha1((CACHE_VERSION + params.path).encode('UTF-8')).hexdigest()
+	lastModified = (params.toDate + SETTLED_DELAY).timestamp()
+	return [('ETag', '"' + etag + '"'),
+		('Last-Modified', email.utils.formatdate(lastModified, usegmt=True)),
+		('Cache-Control', 'public, max-age=' + str(SETTLED_MAX_AGE) + ', immutable')]
+
+# InfluxDB error document returned by an API (e.g. {"error": "timeout"}, or an error within
+# results): it must not be cached as a settled window
+def error_document(content):
+	if not isinstance(content, dict):
+		return False
+	if 'error' in content:
+		return True
+	results = content.get('results')
+	return isinstance(results, list) and any(isinstance(result, dict) and 'error' in result for result in results)
+
+def live_cache_control():
+	if(LIVE_MAX_AGE > 0):
+		return ('Cache-Control', 'max-age=' + str(LIVE_MAX_AGE))
+	return ('Cache-Control', 'no-cache')
+
+# If-None-Match (weak comparison, ignoring the content-coding suffix) or If-Modified-Since
+def not_modified(requestHeaders, cacheHeaders):
+	if requestHeaders is None:
+		return False
+	cache = dict(cacheHeaders)
+	ifNoneMatch = requestHeaders.get('If-None-Match')
+	if ifNoneMatch is not None:
+		if 'ETag' not in cache:
+			return False
+		if ifNoneMatch.strip() == '*':
+			return True
+		etag = cache['ETag'].strip('"')
+		for candidate in ifNoneMatch.split(','):
+			candidate = candidate.strip()
+			if candidate.startswith('W/'):
+				candidate = candidate[2:]
+			candidate = candidate.strip('"')
+			for suffix in ('-gzip', '-deflate'):
+				if candidate.endswith(suffix):
+					candidate = candidate[:-len(suffix)]
+			if candidate == etag:
+				return True
+		return False
+	ifModifiedSince = requestHeaders.get('If-Modified-Since')
+	if ifModifiedSince is not None and 'Last-Modified' in cache:
+		try:
+			return email.utils.parsedate_to_datetime(ifModifiedSince) >= email.utils.parsedate_to_datetime(cache['Last-Modified'])
+		except (TypeError, ValueError):
+			return False
+	return False
+
+def not_modified_response(route, cacheHeaders):
+	log_debug("[Residential][HTTP][LOG] Not Modified (304)")
+	headers = list(cacheHeaders)
+	headers.append(('Access-Control-Allow-Origin', route.get('Access-Control-Allow-Origin', '*')))
+	return RESTResponse(304, headers)
+
+# Requests that can be answered without calling the API (None means: call route[method])
+def route_response(route, method, params=None, requestHeaders=None):
+	if route is None:
+		log_debug("[Residential][HTTP][LOG] route None")
+		return RESTResponse(404, body='Route not found\n'.encode('UTF-8'))
+
+	log_debug("[Residential][HTTP][LOG] route: %s", route)
+
+	if method == 'HEAD':
+		headers = []
+		if 'media_type' in route:
+			headers.append(('Content-type', route['media_type']))
+		# 2019-04-15
+		# if 'Access-Control-Allow-Origin' in route:
+		# RESTORED @ 2019-07-17
+		headers.append(('Access-Control-Allow-Origin', route.get('Access-Control-Allow-Origin', '*')))
+		# Same caching metadata of GET (the API is not executed)
+		if(settled_window(params) == True):
+			cacheHeaders = settled_headers(params)
+			if(not_modified(requestHeaders, cacheHeaders) == True):
+				return not_modified_response(route, cacheHeaders)
+			headers.extend(cacheHeaders)
+		else:
+			headers.append(live_cache_control())
+		return RESTResponse(200, headers)
+
+	if 'file' in route:
+		log_debug("[Residential][HTTP][LOG] File Request!")
+
+		if method != 'GET':
+			log_debug("[Residential][HTTP][LOG] NoN-GET Request Recognized!")
+			return RESTResponse(405, body='Only GET is supported\n'.encode('UTF-8'))
+		try:
+			with open(os.path.join(here, route['file']), 'rb') as f:
+				body = f.read()
+		except Exception as e:
+			log_error("[Residential][HTTP][LOG] Raised Exception! (Missing file?) %s ", e)
+			return RESTResponse(404, body='File not found\n'.encode('UTF-8'))
+		# 2019-04-15
+		# RESTORED @ 2019-07-17
+		headers = [('Access-Control-Allow-Origin', '*')]
+		if 'media_type' in route:
+			headers.append(('Content-type', route['media_type']))
+		return RESTResponse(200, headers, body)
+
+	log_debug("[Residential][HTTP][LOG] Method Request: %s", method)
+
+	if method not in route:
+		log_debug("[Residential][HTTP][LOG] Method Request NOT in routes!")
+		return RESTResponse(405, body=str(method).encode('UTF-8') + " method is not supported\n".encode('UTF-8'))
+
+	if(method == 'GET' and settled_window(params) == True):
+		cacheHeaders = settled_headers(params)
+		if(not_modified(requestHeaders, cacheHeaders) == True):
+			return not_modified_response(route, cacheHeaders)
+
+	return None
+
+# Response built from the content returned by route[method]
+def content_response(route, method, content, params=None, requestHeaders=None):
+	degraded = None
+	if isinstance(content, DegradedContent):
+		degraded = content.reasons
+		content  = content.content
+	if content is None:
+		return RESTResponse(404, body='Not found\n'.encode('UTF-8'))
+
+	log_debug("[Residential][HTTP][LOG] Method content not Null!")
+
+	headers = []
+	if 'media_type' in route:
+		headers.append(('Content-type', route['media_type']))
+	# 2019-04-15
+	# if 'Access-Control-Allow-Origin' in route:
+	# RESTORED @ 2019-07-17
+	headers.append(('Access-Control-Allow-Origin', '*'))
+	# Built with the local InfluxDB or with stale cached results (global InfluxDB unreachable)
+	if degraded is not None:
+		headers.append(('X-Degraded', ",".join(degraded)))
+		if "stale-cache" in degraded:
+			headers.append(('Warning', '110 - "Response is Stale"'))
+
+	if method == 'DELETE':
+		return RESTResponse(200, headers)
+	if isinstance(content, (JSONStream, bytes)):
+		body = content
+	else:
+		body = json.dumps(content).encode('UTF-8')
+
+	if method == 'GET':
+		# APIs answer with a string (or an InfluxDB error document) only to report errors:
+		# they must not be cached (degraded contents neither)
+		if(isinstance(content, str) or error_document(content) == True or degraded is not None):
+			cacheHeaders = [('Cache-Control', 'no-store')]
+		elif(settled_window(params) == True):
+			cacheHeaders = settled_headers(params)
+		else:
+			cacheHeaders = [live_cache_control()]
+			if isinstance(body, bytes):
+				cacheHeaders.append(('ETag', '"' + hashlib.sha1(body).hexdigest() + '"'))
+		if(not_modified(requestHeaders, cacheHeaders) == True):
+			if isinstance(body, JSONStream):
+				body.close()
+			return not_modified_response(route, cacheHeaders)
+		headers.extend(cacheHeaders)
+
+	return RESTResponse(200, headers, body)
+
+# Payload received with POST/PUT (digits are decoded as json, anything else is a string)
+def parse_payload(raw):
+	payload = raw.decode('UTF-8')
+	if(str(payload).isdigit() == False):
+		log_info("[Residential][HTTP][LOG] Payload not a digit: %s", payload)
+
+		return payload
+	else:
+		payload = json.loads(payload)
+		log_info("[Residential][HTTP][LOG] Extracted Payload: Content={ %s }", payload)
+
+		return payload
+
+# ------------------------------------------------------------------------------------ #
+# Streamed responses:
+# APIs can return a JSONStream instead of a json-serializable value. Its chunks (already
+# JSON-encoded str or bytes) are written as soon as they are produced, with chunked
+# transfer encoding, so the whole document never needs to be held in memory.
+#   JSONStream(chunks)        -> chunks of a JSON document (e.g. forwarded from InfluxDB)
+#   JSONStream.rows(rows)     -> JSON array built row by row
+#   JSONStream.value(content) -> json-serializable value encoded incrementally
+# ------------------------------------------------------------------------------------ #
+class JSONStream(object):
+	def __init__(self, chunks, close=None):
+		self.chunks  = chunks
+		self.onClose = close
+
+	def __iter__(self):
+		try:
+			for chunk in self.chunks:
+				if isinstance(chunk, str):
+					chunk = chunk.encode('UTF-8')
+				if chunk:
+					yield chunk
+		finally:
+			self.close()
+
+	def close(self):
+		if(hasattr(self.chunks, 'close')):
+			self.chunks.close()
+		if(self.onClose is not None):
+			self.onClose()
+			self.onClose = None
+
+	@classmethod
+	def rows(cls, rows):
+		def encode():
+			separator = '['
+			for row in rows:
+				yield separator + json.dumps(row)
+				separator = ', '
+			yield '[]' if separator == '[' else ']'
+		return cls(encode())
+
+	@classmethod
+	def value(cls, content):
+		return cls(json.JSONEncoder().iterencode(content))
+
+# Groups the chunks of a JSONStream in STREAM_CHUNK_SIZE blocks, compressed and framed
+def stream_body(stream, encoding, chunked):
+	if(encoding == 'gzip'):
+		compressor = zlib.compressobj(COMPRESSION_LEVEL, zlib.DEFLATED, 31)
+	elif(encoding == 'deflate'):
+		compressor = zlib.compressobj(COMPRESSION_LEVEL)
+	else:
+		compressor = None
+
+	def frame(data):
+		if(chunked == True):
+			return ('%x\r\n' % len(data)).encode('ascii') + data + b'\r\n'
+		return data
+
+	try:
+		pending = []
+		size    = 0
+		for chunk in stream:
+			pending.append(chunk)
+			size += len(chunk)
+			if(size >= STREAM_CHUNK_SIZE):
+				data = b''.join(pending)
+				pending = []
+				size    = 0
+				if compressor is not None:
+					data = compressor.compress(data)
+				if data:
+					yield frame(data)
+		data = b''.join(pending)
+		if compressor is not None:
+			data = compressor.compress(data) + compressor.flush()
+		if data:
+			yield frame(data)
+		if(chunked == True):
+			yield b'0\r\n\r\n'
+	finally:
+		stream.close()
+
+# ------------------------------------------------------------------------------------ #
+# Content negotiation: gzip or deflate according to the Accept-Encoding q-values
+# (gzip preferred on ties), None when the client accepts only identity.
+def select_encoding(acceptEncoding):
+	if(acceptEncoding is None):
+		return None
+	weights = {}
+	for token in acceptEncoding.split(','):
+		coding, _, qvalue = token.strip().partition(';')
+		coding = coding.strip().lower()
+		weight = 1.0
+		if(qvalue.strip().startswith('q=')):
+			try:
+				weight = float(qvalue.strip()[2:])
+			except ValueError:
+				weight = 0.0
+		weights[coding] = weight
+	if '*' in weights:
+		weights.setdefault('gzip', weights['*'])
+		weights.setdefault('deflate', weights['*'])
+	best = None
+	for coding in ('gzip', 'deflate'):
+		if(weights.get(coding, 0.0) > 0.0 and (best is None or weights[coding] > weights[best])):
+			best = coding
+	return best
+
+# Last step before writing any response: compression and framing
+# (Content-Length, or chunked for streamed bodies; HTTP/1.0 clients get them until close)
+def encode_response(response, method, acceptEncoding, chunked=True):
+	if isinstance(response.body, JSONStream):
+		encoding = None
+		if(enableCompression == True):
+			response.headers.append(('Vary', 'Accept-Encoding'))
+			encoding = select_encoding(acceptEncoding)
+			if(encoding is not None):
+				response.headers.append(('Content-Encoding', encoding))
+				tag_encoding(response, encoding)
+		if(chunked == True):
+			response.headers.append(('Transfer-Encoding', 'chunked'))
+		else:
+			response.headers.append(('Connection', 'close'))
+		response.body = stream_body(response.body, encoding, chunked)
+	elif response.body is not None:
+		compressible = False
+		for header, value in response.headers:
+			if(header == 'Content-type' and (value.startswith('application/json') or value.startswith('text/'))):
+				compressible = True
+		if(enableCompression == True and compressible == True):
+			response.headers.append(('Vary', 'Accept-Encoding'))
+			if(len(response.body) >= COMPRESSION_MIN_SIZE):
+				encoding = select_encoding(acceptEncoding)
+				if(encoding == 'gzip'):
+					response.body = gzip.compress(response.body, COMPRESSION_LEVEL)
+				elif(encoding == 'deflate'):
+					response.body = zlib.compress(response.body, COMPRESSION_LEVEL)
+				if(encoding is not None):
+					response.headers.append(('Content-Encoding', encoding))
+					tag_encoding(response, encoding)
+		response.headers.append(('Content-Length', str(len(response.body))))
+	elif(method != 'HEAD' and response.status != 304):
+		response.headers.append(('Content-Length', '0'))
+	return response
+
+# A strong ETag must change with the content-coding (matched ignoring the suffix)
+def tag_encoding(response, encoding):
+	for i, (header, value) in enumerate(response.headers):
+		if(header == 'ETag'):
+			response.headers[i] = ('ETag', value[:-1] + '-' + encoding + '"')
+
+# ------------------------------------------------------------------------------------ #
+# Single-flight coalescing of identical API calls:
+# The first request for a key (method + normalized path) executes the API, the following
+# ones wait for its result until the flight deadline, then they give up and execute it
+# on their own. Streamed results (JSONStream) can be consumed only once: the followers
+# of such flights execute the API as well.
+# ------------------------------------------------------------------------------------ #
+class Flight(object):
+	__slots__ = ('deadline', 'event', 'future', 'result', 'error')
+
+	def __init__(self, timeout):
+		self.deadline = time.time() + timeout
+		self.event    = threading.Event()
+		self.future   = None
+		self.result   = None
+		self.error    = None
+
+class SingleFlight(object):
+	def __init__(self):
+		self.lock         = threading.Lock()
+		self.flights      = {}
+		self.asyncFlights = {}     # Used only by the event loop of AsyncHTTPServer
+		self.executions   = 0
+		self.coalesced    = 0      # Upstream calls saved
+		self.timeouts     = 0
+		self.streamed     = 0
+
+	def call(self, key, timeout, api, *args):
+		with self.lock:
+			flight = self.flights.get(key)
+			leader = flight is None
+			if(leader == True):
+				flight = Flight(timeout)
+				self.flights[key] = flight
+
+		if(leader == True):
+			try:
+				flight.result = api(*args)
+			except Exception as e:
+				flight.error = e
+			finally:
+				with self.lock:
+					del self.flights[key]
+					self.executions += 1
+				flight.event.set()
+			if flight.error is not None:
+				raise flight.error
+			return flight.result
+
+		if(flight.event.wait(max(0.0, flight.deadline - time.time())) == False):
+			with self.lock:
+				self.timeouts += 1
+			return api(*args)
+		return self.shared(flight, api, *args)
+
+	async def call_async(self, key, timeout, api, *args):
+		flight = self.asyncFlights.get(key)
+		if flight is None:
+			flight = Flight(timeout)
+			flight.future = asyncio.get_running_loop().create_future()
+			self.asyncFlights[key] = flight
+			try:
+				flight.result = await api(*args)
+			except Exception as e:
+				flight.error = e
+			finally:
+				del self.asyncFlights[key]
+				self.executions += 1
+				flight.future.set_result(None)
+			if flight.error is not None:
+				raise flight.error
+			return flight.result
+
+		try:
+			await asyncio.wait_for(asyncio.shield(flight.future), max(0.0, flight.deadline - time.time()))
+		except asyncio.TimeoutError:
+			with self.lock:
+				self.timeouts += 1
+			return await api(*args)
+		if isinstance(flight.result, JSONStream):
+			self.streamed += 1
+			return await api(*args)
+		self.coalesced += 1
+		if flight.error is not None:
+			raise flight.error
+		return flight.result
+
+	def shared(self, flight, api, *args):
+		if isinstance(flight.result, JSONStream):
+			with self.lock:
+				self.streamed += 1
+			return api(*args)
+		with self.lock:
+			self.coalesced += 1
+		if flight.error is not None:
+			raise flight.error
+		return flight.result
+
+	def get_counters(self):
+		with self.lock:
+			return {
+				"inFlight":   len(self.flights) + len(self.asyncFlights),
+				"executions": self.executions,
+				"coalesced":  self.coalesced,
+				"timeouts":   self.timeouts,
+				"streamed":   self.streamed,
+			}
+
+singleFlight = SingleFlight()
+
+# Key of the flight (None: the request must not be coalesced, e.g. POST/PUT/DELETE)
+def flight_key(route, method, params):
+	if(enableCoalescing == False or method != 'GET' or params is None):
+		return None
+	# Dates can be written both as 2019.03.25 and 2019-03-25
+	return method + " " + params.path.replace('.', '-')
+
+# Executes route[method] (coalesced when possible) from a synchronous context
+def call_api(route, method, handler):
+	def run(handler):
+		content = route[method](handler)
+		# Handlers already migrated to asyncio (async def) can be served also here
+		if(asyncio.iscoroutine(content)):
+			content = asyncio.run(content)
+		return content
+
+	def execute(handler):
+		degraded = set()
+		content = run_with_context((time.time() + route.get('deadline', INFLUX_DEADLINE), degraded), run, handler)
+		if(len(degraded) > 0):
+			return DegradedContent(content, sorted(degraded))
+		return content
+
+	key = flight_key(route, method, handler.params)
+	if key is None:
+		return execute(handler)
+	return singleFlight.call(key, route.get('coalesce_timeout', COALESCE_TIMEOUT), execute, handler)
+
+# ------------------------------------------------------------------------------------ #
+# Single-flight counters (executions, coalesced = upstream calls saved, timeouts):
+def get_server_coalescing(handler):
+	log_info("[Residential][LOG][GET] Server Coalescing Counters")
+
+	return singleFlight.get_counters()
+
+# ------------------------------------------------------------------------------------ #
+# InfluxDB query cache counters (hits, misses, expired, evictions, bytes):
+def get_server_cache(handler):
+	log_info("[Residential][LOG][GET] Server Cache Counters")
+
+	return influx_cache_counters()
+
+# ------------------------------------------------------------------------------------ #
+# InfluxDB endpoints (circuit state, failures, p95 latency) and client counters
+# (deadlines exceeded, hedged requests, fallback results):
+def get_server_influx(handler):
+	log_info("[Residential][LOG][GET] Server InfluxDB Endpoints")
+
+	return {"endpoints": influxClient.get_endpoints(), "counters": influxClient.get_counters()}
+
+# ------------------------------------------------------------------------------------ #
+# Local mirror of the global DWH (watermark of every series, routing and sync counters):
+def get_server_mirror(handler):
+	log_info("[Residential][LOG][GET] Server InfluxDB Mirror")
+
+	return {"series": influxMirror.get_series(), "counters": influxMirror.get_counters()}
+
+# ------------------------------------------------------------------------------------ #
+# Request/upstream counters, latency histograms and gauges (Prometheus text format):
+def get_metrics(handler):
+	if(enableMetrics == False):
+		return str("Endpoint Disabled! Verify Backend flags!")
+
+	gauges = handler.server.get_gauges() if hasattr(handler.server, "get_gauges") else None
+	return metrics.render(gauges, singleFlight.get_counters(), asyncLog.get_counters(), influx_cache_counters(),
+			      influxClient.get_counters(), influxMirror.get_counters())
+
+# ------------------------------------------------------------------------------------ #
+# BATCH: executes a list of GET paths against the same route table, concurrently.
+# Payload:  ["/INFLUXDB/2019-03-25/2019-03-25/InstallationHouseBolzano/consumption_house/GROUPBY/30", "/Battery/cycles"]
+# Response: {"/Battery/cycles": {"status": 200, "timeMs": 0.21, "content": 12}, ...}
+# ------------------------------------------------------------------------------------ #
+batchExecutor     = None
+batchExecutorLock = threading.Lock()
+
+def batch_item(handler, path):
+	start = time.time()
+	route, params = RESTRequestHandler.match_route(path)
+	response = route_response(route, 'GET', params)
+	if response is not None:
+		item = {"status": response.status, "content": response.body.decode('UTF-8').strip() if response.body else None}
+	else:
+		request = RequestShim(handler.server, handler.client_address, 'GET', path, http.client.parse_headers(io.BytesIO(b'\r\n')), b'')
+		request.params = params
+		try:
+			content = call_api(route, 'GET', request)
+			degraded = None
+			if isinstance(content, DegradedContent):
+				degraded = content.reasons
+				content  = content.content
+			# Streamed contents are embedded as values of the batch object
+			if isinstance(content, JSONStream):
+				content = json.loads(b''.join(content).decode('UTF-8'))
+			item = {"status": 200 if content is not None else 404, "content": content}
+			if degraded is not None:
+				item["degraded"] = degraded
+		except Exception as e:
+			log_error("[Residential][LOG][BATCH] Raised Exception on %s: %s", path, e)
+			item = {"status": 500, "content": None}
+	item["timeMs"] = round((time.time() - start) * 1000.0, 3)
+	return item
+
+def run_batch(handler):
+	global batchExecutor
+
+	log_info("[Residential][LOG][POST] BATCH")
+
+	try:
+		paths = handler.get_payload()
+		if isinstance(paths, str):
+			paths = json.loads(paths)
+		if isinstance(paths, dict):
+			paths = paths.get("paths")
+	except Exception as e:
+		return str("[Residential][LOG][BATCH] Payload is not a json list of paths: %s" %e)
+
+	if(isinstance(paths, list) == False or all(isinstance(path, str) for path in paths) == False):
+		return str("[Residential][LOG][BATCH] Payload is not a json list of paths")
+	if(len(paths) > BATCH_MAX_ITEMS):
+		return str("[Residential][LOG][BATCH] Too many paths (max " + str(BATCH_MAX_ITEMS) + ")")
+
+	# Created on first use (after the pre-fork, if enabled)
+	with batchExecutorLock:
+		if batchExecutor is None:
+			batchExecutor = concurrent.futures.ThreadPoolExecutor(max_workers=BATCH_WORKERS)
+
+	futures = dict((path, batchExecutor.submit(batch_item, handler, path)) for path in paths)
+	return dict((path, future.result()) for path, future in futures.items())
+
 class RESTRequestHandler(http.server.BaseHTTPRequestHandler):
-	def __init__(self, *args, **kwargs):
-		self.routes = {
+	# Persistent connections (HTTP/1.1): every response carries its Content-Length
+	# (Nagle disabled, otherwise headers and body written separately wait for the delayed ACK)
+	protocol_version = 'HTTP/1.1'
+	timeout          = KEEPALIVE_TIMEOUT
+	disable_nagle_algorithm = True
+	parked           = False
+
+	# ------------------------------------------------------------------------ #
+	# Persistent connections of the worker pool (PooledHTTPServer.park): when the
+	# next request has not arrived yet, the handler is parked (its buffered rfile
+	# is kept) instead of blocking the worker, and resumed by a worker later on
+	# ------------------------------------------------------------------------ #
+	def handle(self):
+		self.close_connection = True
+		self.handle_one_request()
+		self.handle_pending()
+
+	def resume(self):
+		self.parked = False
+		self.handle_one_request()
+		self.handle_pending()
+		if(self.parked == False):
+			self.release()
+
+	def handle_pending(self):
+		poolable = hasattr(self.server, "park")
+		while(self.close_connection == False):
+			if(poolable == True and self.input_pending() == False):
+				if(self.server.grace_allowed() == False or len(select.select([self.connection], [], [], POOL_IDLE_GRACE)[0]) == 0):
+					self.parked = True
+					return
+			self.handle_one_request()
+
+	# Next request already received (or buffered), without blocking
+	def input_pending(self):
+		try:
+			self.connection.setblocking(False)
+			return len(self.rfile.peek(1)) > 0
+		except OSError:
+			return False
+		finally:
+			self.connection.settimeout(self.timeout)
+
+	def finish(self):
+		if(self.parked == False):
+			self.release()
+
+	def release(self):
+		try:
+			http.server.BaseHTTPRequestHandler.finish(self)
+		except OSError:
+			pass
+	# ------------------------------------------------------------------------ #
+	# Route table: compiled only once (at class level) and grouped by the first
+	# segment of the URI, the named groups are then exposed as handler.params
+	# ------------------------------------------------------------------------ #
+	routes = compile_routes([
 # --------------------------------------------------------- #
 ### Generic hisorical Energy Data (One Fields)
 #   ENERGY/{fromDate}/{toDate}/{measurement}
@@ -3691,106 +6320,116 @@ class RESTRequestHandler(http.server.BaseHTTPRequestHandler):
 #   or
 #   ENERGY/{fromDate}/{toDate}/{FroniusMeasurement}/{FieldOfInterest}
 #   ENERGY/2018-12-24/2018-12-25/InstallationHouse20/photovoltaic
+#   plus coverage and gaps (optional gap policy):
+#   ENERGY/2018-12-24/2018-12-25/InstallationHouse20/photovoltaic/QUALITY/LINEAR
 # --------------------------------------------------------- #
-		r'^/(ENERGY|LOCALENERGY)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+(/(photovoltaic|grid|load|battery|SoC))?$': {'GET': get_energy, 'media_type': 'application/json'},
+		(r'^/(?P<destination>ENERGY|LOCALENERGY)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)(?:/(?P<field>photovoltaic|grid|load|battery|SoC))?(?:/(?P<quality>QUALITY)(?:/(?P<policy>ZERO|HOLD|LINEAR|EXCLUDE))?)?$', {'GET': get_energy, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Generic Hystoricla Raw Data (All Fields):  
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/
 #   DEFAULT=GROUPBY/30
 #   INFLUXDB/2018-12-24/2018-12-25/S4G-GW-EDYNA-0015
 # --------------------------------------------------------- #
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+$': {'GET': get_historical_rawdata, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)$', {'GET': get_historical_rawdata, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Generic hisorical Raw Data (One Fields) (plus operations such as: GROUPBY) 
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/{field}/{OPERATION}/{VALUE}
 #   INFLUXDB/2018-12-24/2018-12-25/InstallationHouseBolzano/load/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/(P|Processed_P|photovoltaic|grid|load|battery|SoC)/GROUPBY/[0-9]+$': {'GET': get_historical_specific_data, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/(?P<field>P|Processed_P|photovoltaic|grid|load|battery|SoC)/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': get_historical_specific_data, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Dedicated API to evaluate direct consumption [consumption_for_energy]: if(P_Grid < 0) then (-P_Load)  
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/{field}/{OPERATION}/{VALUE}
 #   INFLUXDB/2018-12-24/2018-12-25/InstallationHouseBolzano/direct_consumption/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/direct_consumption/GROUPBY/[0-9]+$': {'GET': get_consumption_direct, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/direct_consumption/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': get_consumption_direct, 'media_type': 'application/json'}),
 ### Dedicated API to evaluate direct consumption [consumption_for_energy]: if(P_Grid < 0) then (-P_Load)  
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/{field}/{OPERATION}/{VALUE}
 #   INFLUXDB/2018-12-24/2018-12-25/InstallationHouseBolzano/direct_consumption/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/direct_consumption_v2/GROUPBY/[0-9]+$': {'GET': get_consumption_direct_v2, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/direct_consumption_v2/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': get_consumption_direct_v2, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Generic hisorical Raw Data (All Fields) (plus operations such as: GROUPBY) 
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/{OPERATION}/{VALUE}
 #   INFLUXDB/2018-12-24/2018-12-25/S4G-GW-EDYNA-0015/GROUPBY/30
 # --------------------------------------------------------- #
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/GROUPBY/[0-9]+$': {'GET': get_historical_data, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': get_historical_data, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Retrieve Number of battery cycles (from remote Fronius stream):  Battery/cycles
 # --------------------------------------------------------- #
-		r'^/Battery/cycles$': {'GET': get_cycles, 'media_type': 'application/json'},
+		(r'^/Battery/cycles$', {'GET': get_cycles, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Retrieve battery Status (from remote Fronius stream):  Battery/status
 # --------------------------------------------------------- #
-		r'^/Battery/status$': {'GET': get_status, 'media_type': 'application/json'},
+		(r'^/Battery/status$', {'GET': get_status, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Generic Filtered Energy Data
 #  ENERGY/{fromDate}/{toDate}/{measurement}/{Field}/{FILTER}/{OPERATION}/{VALUE}
 #  ENERGY/2018-12-24/2018-12-25/S4G-GW-EDYNA-0015/P/POSITIVE/GROUPBY/30
 #  ENERGY/2019-03-25/2019-03-27/InstallationHouse20/battery/POSITIVE/GROUPBY/30
+#  plus coverage and gaps (optional gap policy):
+#  ENERGY/2019-03-25/2019-03-27/InstallationHouse20/battery/POSITIVE/GROUPBY/30/QUALITY/HOLD
+# --------------------------------------------------------- #
+		(r'^/(?P<destination>ENERGY|LOCALENERGY)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/(?P<field>P|Processed_P|photovoltaic|grid|load|battery|SoC)/(?P<filter>POSITIVE|NEGATIVE|ALL)/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)(?:/(?P<quality>QUALITY)(?:/(?P<policy>ZERO|HOLD|LINEAR|EXCLUDE))?)?$', {'GET': get_filtered_area, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
-		r'^/(ENERGY|LOCALENERGY)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/(P|Processed_P|photovoltaic|grid|load|battery|SoC)/(POSITIVE|NEGATIVE|ALL)/GROUPBY/[0-9]+$': {'GET': get_filtered_area, 'media_type': 'application/json'},
+### Energy Matrix (many fields/filters per HOUR, DAY or MONTH bucket):
+#  ENERGY/MATRIX/{fromDate}/{toDate}/{FroniusMeasurement}/{BUCKET}/{Field:FILTER,...}
+#  ENERGY/MATRIX/2019-03-01/2019-03-31/InstallationHouseBolzano/DAY/photovoltaic:ALL,grid:NEGATIVE
+# --------------------------------------------------------- #
+		(r'^/(?P<destination>ENERGY|LOCALENERGY)/MATRIX/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/(?P<bucket>HOUR|DAY|MONTH)(?:/(?P<pairs>(?:photovoltaic|grid|load|battery):(?:POSITIVE|NEGATIVE|ALL)(?:,(?:photovoltaic|grid|load|battery):(?:POSITIVE|NEGATIVE|ALL))*))?$', {'GET': get_energy_matrix, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Generic Data (FILTERED)(plus operations such as: GROUPBY) 
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/{FieldOfInterest}/{FILTER}/{OPERATION}/{VALUE}
 #   INFLUXDB/2018-12-24/2018-12-25/S4G-GW-EDYNA-0015/P/POSITIVE/GROUPBY/30
 #   INFLUXDB/2019-03-25/2019-03-27/InstallationHouseBolzano/battery/POSITIVE/GROUPBY/30
 # --------------------------------------------------------- #
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/(P|Processed_P|photovoltaic|grid|load|battery|SoC)/(POSITIVE|NEGATIVE|ALL)/GROUPBY/[0-9]+$': {'GET': get_filtered_data, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/(?P<field>P|Processed_P|photovoltaic|grid|load|battery|SoC)/(?P<filter>POSITIVE|NEGATIVE|ALL)/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': get_filtered_data, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 # API for an improved plot visualization
 # --------------------------------------------------------- #
 # get_historical_month_data
 #  INFLUXDB/MONTH/{Date}/{measurement}/{Field}/{FILTER}
 #  INFLUXDB/MONTH/2019-03/InstallationHouseBolzano/load/ALL
-		r'^/(INFLUXDB|LOCALINFLUXDB)/MONTH/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])/[A-Za-z0-9\-]+/(P|Processed_P|photovoltaic|grid|load|battery|SoC|direct_consumption)/(POSITIVE|NEGATIVE|ALL)$': {'GET': get_historical_month_data, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/MONTH/(?P<month>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2]))/(?P<measurement>[A-Za-z0-9\-]+)/(?P<field>P|Processed_P|photovoltaic|grid|load|battery|SoC|direct_consumption)/(?P<filter>POSITIVE|NEGATIVE|ALL)$', {'GET': get_historical_month_data, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 # get_historical_year_data
 #  INFLUXDB/YEAR/{Date}/{measurement}/{Field}/{FILTER}
 #  INFLUXDB/YEAR/2019/InstallationHouseBolzano/load/ALL
-		r'^/(INFLUXDB|LOCALINFLUXDB)/YEAR/20[0-9][0-9]/[A-Za-z0-9\-]+/(P|Processed_P|photovoltaic|grid|load|battery|SoC|direct_consumption)/(POSITIVE|NEGATIVE|ALL)$': {'GET': get_historical_year_data, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/YEAR/(?P<year>20[0-9][0-9])/(?P<measurement>[A-Za-z0-9\-]+)/(?P<field>P|Processed_P|photovoltaic|grid|load|battery|SoC|direct_consumption)/(?P<filter>POSITIVE|NEGATIVE|ALL)$', {'GET': get_historical_year_data, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 # Other APIs:
 # --------------------------------------------------------- #
 ### power_from_grid [aka: consumption_house]
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/consumption_house/{OPERATION}/{VALUE}
 #   INFLUXDB/2019-03-25/2019-03-27/InstallationHouseBolzano/consumption_house/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/consumption_house/(GROUPBY/[0-9]+)$': {'GET': get_consumption_house, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/consumption_house/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': get_consumption_house, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### over_production:
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/over_production/{OPERATION}/{VALUE}
 #   INFLUXDB/2019-03-25/2019-03-27/InstallationHouseBolzano/over_production/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/over_production/(GROUPBY/[0-9]+)$': {'GET': get_over_production, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/over_production/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': get_over_production, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### power2battery [aka: consumption_battery]:
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/power2battery/{OPERATION}/{VALUE}
 #   INFLUXDB/2019-03-25/2019-03-27/InstallationHouseBolzano/power2battery/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/power2battery/(GROUPBY/[0-9]+)$': {'GET': get_power2battery, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/power2battery/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': get_power2battery, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### evaluate_production:
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/evaluate_production/{OPERATION}/{VALUE}
 #   INFLUXDB/2019-03-25/2019-03-27/InstallationHouseBolzano/evaluate_production/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/evaluate_production/(GROUPBY/[0-9]+)$': {'GET': evaluate_production, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/evaluate_production/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': evaluate_production, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### evaluate_total_production:
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/evaluate_total_production/{OPERATION}/{VALUE}
 #   INFLUXDB/2019-03-25/2019-03-27/InstallationHouseBolzano/evaluate_total_production/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/evaluate_total_production/(GROUPBY/[0-9]+)$': {'GET': evaluate_total_production, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/evaluate_total_production/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': evaluate_total_production, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### evaluate_direct_consumption:
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/evaluate_direct_consumption/{OPERATION}/{VALUE}
 #   INFLUXDB/2019-03-25/2019-03-27/InstallationHouseBolzano/evaluate_direct_consumption/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/evaluate_direct_consumption/(GROUPBY/[0-9]+)$': {'GET': evaluate_direct_consumption, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/evaluate_direct_consumption/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': evaluate_direct_consumption, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### evaluate_power2grid:
 #   INFLUXDB/{fromDate}/{toDate}/{measurement}/evaluate_power2grid/{OPERATION}/{VALUE}
 #   INFLUXDB/2019-03-25/2019-03-27/InstallationHouseBolzano/evaluate_power2grid/GROUPBY/30
-		r'^/(INFLUXDB|LOCALINFLUXDB)/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/20[0-9][0-9](\.|-)(0[1-9]|1[0-2])(\.|-)(0[1-9]|1[0-9]|2[0-9]|3[0-1])/[A-Za-z0-9\-]+/evaluate_power2grid/(GROUPBY/[0-9]+)$': {'GET': evaluate_power2grid, 'media_type': 'application/json'},
+		(r'^/(?P<destination>INFLUXDB|LOCALINFLUXDB)/(?P<fromDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<toDate>20[0-9][0-9](?:\.|-)(?:0[1-9]|1[0-2])(?:\.|-)(?:0[1-9]|1[0-9]|2[0-9]|3[0-1]))/(?P<measurement>[A-Za-z0-9\-]+)/evaluate_power2grid/(?P<operation>GROUPBY)/(?P<interval>[0-9]+)$', {'GET': evaluate_power2grid, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 # --------------------------------------------------------- #
 # EV Related Endpoints:
@@ -3799,34 +6438,70 @@ class RESTRequestHandler(http.server.BaseHTTPRequestHandler):
 # Temporary! For demonstrative purposes only!
 # EV/SET/<ID>
 # --------------------------------------------------------- #
-		r'^/EV/SET/[A-Z0-9\_]+$': {'GET': set_EVofInterest, 'media_type': 'application/json'},
+		(r'^/EV/SET/(?P<evId>[A-Z0-9\_]+)$', {'GET': set_EVofInterest, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Retrieve last status of EV (from remote eCar system):  
 # EV/status
 # Requires EV update first!
 # --------------------------------------------------------- #
-#		r'^/EV/status$': {'GET': get_EVstatus, 'media_type': 'application/json'},
+#		(r'^/EV/status$', {'GET': get_EVstatus, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Retrieve current EV SoC (from remote eCar system):  
 # EV/SOC
 # --------------------------------------------------------- #
-		r'^/EV/data$': {'GET': get_EVdata, 'media_type': 'application/json'},
+		(r'^/EV/data$', {'GET': get_EVdata, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Retrieve current EV SoC (from remote eCar system):  
 # EV/SOC
 # --------------------------------------------------------- #
-#		r'^/EV/SOC$': {'GET': get_EVsoc, 'media_type': 'application/json'},
+#		(r'^/EV/SOC$', {'GET': get_EVsoc, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Retrieve time lasts to Full EV SoC (from remote eCar system):  
 # EV/remaining
 # --------------------------------------------------------- #
-		#r'^/EV/remaining$': {'GET': get_EVremaining, 'media_type': 'application/json'},
+		#(r'^/EV/remaining$', {'GET': get_EVremaining, 'media_type': 'application/json'}),
 # --------------------------------------------------------- #
 ### Get or Set Operational Mode:
 # --------------------------------------------------------- #
-		r'^/OPMODE$': {'GET': get_opmode, 'POST': set_opmode, 'media_type': 'application/json', 'Access-Control-Allow-Origin': '*'}}
+		(r'^/OPMODE$', {'GET': get_opmode, 'POST': set_opmode, 'media_type': 'application/json', 'Access-Control-Allow-Origin': '*'}),
+# --------------------------------------------------------- #
+### HTTP Server worker pool gauges:
+# SERVER/pool
+# --------------------------------------------------------- #
+		(r'^/SERVER/pool$', {'GET': get_server_pool, 'media_type': 'application/json'}),
+# --------------------------------------------------------- #
+### Single-flight coalescing counters:
+# SERVER/coalescing
+# --------------------------------------------------------- #
+		(r'^/SERVER/coalescing$', {'GET': get_server_coalescing, 'media_type': 'application/json'}),
+# --------------------------------------------------------- #
+### InfluxDB query cache counters:
+# SERVER/cache
+# --------------------------------------------------------- #
+		(r'^/SERVER/cache$', {'GET': get_server_cache, 'media_type': 'application/json'}),
+# --------------------------------------------------------- #
+### InfluxDB endpoints (circuit breakers) and client counters:
+# SERVER/influx
 # --------------------------------------------------------- #
-		return http.server.BaseHTTPRequestHandler.__init__(self, *args, **kwargs)
+		(r'^/SERVER/influx$', {'GET': get_server_influx, 'media_type': 'application/json'}),
+# --------------------------------------------------------- #
+### Local mirror of the global DWH:
+# SERVER/mirror
+# --------------------------------------------------------- #
+		(r'^/SERVER/mirror$', {'GET': get_server_mirror, 'media_type': 'application/json'}),
+# --------------------------------------------------------- #
+### Many GET paths executed concurrently in one round trip:
+# BATCH  (POST, payload: json list of paths)
+# --------------------------------------------------------- #
+		(r'^/BATCH$', {'POST': run_batch, 'media_type': 'application/json'}),
+# --------------------------------------------------------- #
+### Prometheus metrics (requests, latencies, upstream calls):
+# METRICS
+# --------------------------------------------------------- #
+		(r'^/METRICS$', {'GET': get_metrics, 'media_type': 'text/plain; version=0.0.4'}),
+# --------------------------------------------------------- #
+	])
+
 
 	def do_HEAD(self):
 		self.handle_method('HEAD')
@@ -3846,154 +6521,406 @@ class RESTRequestHandler(http.server.BaseHTTPRequestHandler):
 	def get_payload(self):
 		payload_len = int(self.headers['Content-Length'])
 
-		if(enablePrints == True):
-			print("[Residential][HTTP][LOG] Payload: Len = " + str(payload_len))
+		log_info("[Residential][HTTP][LOG] Payload: Len = %s", payload_len)
 
 		if(payload_len >= 1):	
-			payload = self.rfile.read(payload_len).decode('UTF-8')
-			if(str(payload).isdigit() == False):
-				if(enablePrints == True):
-					print("[Residential][HTTP][LOG] Payload not a digit: " + str(payload))
-
-				return payload
-			else:
-				payload = json.loads(payload)
-				if(enablePrints == True):
-					print("[Residential][HTTP][LOG] Extracted Payload: Content={ " + str(payload)+" }")
-
-				return payload
+			return parse_payload(self.rfile.read(payload_len))
 		else:
-			if(enablePrints == True):
-				print("[Residential][HTTP][LOG] Empty Payload: Len = [" + str(payload_len) + "]")
+			log_info("[Residential][HTTP][LOG] Empty Payload: Len = [%s]", payload_len)
 
 			return None
 
         # HTTP Response Method:
 	def handle_method(self, method):		
-		if(enableHTTPPrints == True):
-			print("[Residential][HTTP][LOG] handle_method START")
+		log_debug("[Residential][HTTP][LOG] handle_method START")
 
 		route = self.get_route()
-		if route is None:
-			if(enableHTTPPrints == True):
-				print("[Residential][HTTP][LOG] route None")
-			self.send_response(404)
-			self.end_headers()
-			# The following case should be very fast
-			# That's why should not be required a dedicated try catch
-			# to manage clients that disconnects before receiving responses
-			self.wfile.write('Route not found\n'.encode('UTF-8'))
+		name   = route_name(route, method)
+		status = "error"
+		start  = time.time()
+		metrics.request_started(name)
+		try:
+			response = route_response(route, method, self.params, self.headers)
+			if response is None:
+				try:
+					content = call_api(route, method, self)
+				except Exception as e:
+					log_error("[Residential][HTTP][LOG] Raised Exception! (Client disconnected badly): %s", e)
+					self.close_connection = True
+					return
+				response = content_response(route, method, content, self.params, self.headers)
+
+			response = encode_response(response, method, self.headers.get('Accept-Encoding'), self.request_version == 'HTTP/1.1')
+			status   = response.status
+
+			try:
+				self.send_response(response.status)
+				for header, value in response.headers:
+					self.send_header(header, value)
+				self.end_headers()
+				if isinstance(response.body, bytes):
+					self.wfile.write(response.body)
+				elif response.body is not None:
+					for chunk in response.body:
+						self.wfile.write(chunk)
+			except Exception as e:
+				log_error("[Residential][HTTP][LOG] Raised Exception! (Client disconnected badly): %s", e)
+				self.close_connection = True
+			finally:
+				if(hasattr(response.body, 'close')):
+					response.body.close()
+		finally:
+			metrics.request_finished(name, method, status, time.time() - start)
+                    
+# ------------------------------------------------------------------------------------ #    
+# Find out which APIs to dispatch (and extract its parameters)
+	@classmethod
+	def match_route(cls, path):
+		segments = path.split('/', 2)
+		if(len(segments) < 2):
+			return None, None
+		for pattern, route in cls.routes.get(segments[1], ()):
+			match = pattern.match(path)
+			if match is not None:
+				return route, RequestParams(path, match.groupdict())
+		return None, None
+
+	def get_route(self):
+		route, self.params = self.match_route(self.path)
+		return route
+
+# ------------------------------------------------------------------------------------ #
+# 				ASYNCIO HTTP SERVER
+# ------------------------------------------------------------------------------------ #
+# Alternative front end (enableAsyncServer): each connection is a coroutine instead of
+# an OS thread, and it is dispatched with the same route table of RESTRequestHandler.
+# APIs declared as "async def" are awaited on the event loop (they can await outbound
+# calls through async_request), while the synchronous ones run unchanged inside a
+# bounded executor, receiving an RequestShim in place of the handler.
+# ------------------------------------------------------------------------------------ #
+asyncSession = None      # (loop, aiohttp.ClientSession) shared by the asyncio server
+
+class AsyncResponse(object):
+	__slots__ = ('status_code', 'content')
+
+	def __init__(self, status_code, content):
+		self.status_code = status_code
+		self.content     = content
+
+	@property
+	def text(self):
+		return self.content.decode('UTF-8', 'replace')
+
+	def json(self):
+		return json.loads(self.content)
+
+# Outbound HTTP request (same arguments of requests.request) to be awaited by "async def" APIs.
+# Without aiohttp it falls back to requests, executed in the default executor.
+async def async_request(method, url, auth=None, verify=True, timeout=None, **kwargs):
+	loop = asyncio.get_running_loop()
+	if(aiohttp is None):
+		call = functools.partial(upstream_request, method, url, auth=auth, verify=verify, timeout=timeout, **kwargs)
+		response = await loop.run_in_executor(None, call)
+		return AsyncResponse(response.status_code, response.content)
+
+	if(auth is not None):
+		auth = aiohttp.BasicAuth(auth.username, auth.password)
+	ssl = None if verify else False
+	start = time.time()
+	status = "error"
+	try:
+		if(asyncSession is not None and asyncSession[0] is loop):
+			async with asyncSession[1].request(method, url, auth=auth, ssl=ssl, timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as response:
+				status = response.status
+				return AsyncResponse(response.status, await response.read())
+
+		# Outside the asyncio server (e.g. async API served by the socketserver stack)
+		async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=timeout)) as session:
+			async with session.request(method, url, auth=auth, ssl=ssl, **kwargs) as response:
+				status = response.status
+				return AsyncResponse(response.status, await response.read())
+	finally:
+		metrics.upstream_finished(upstream_target(url), status, time.time() - start)
+
+# Exposes to the APIs the same attributes of RESTRequestHandler they rely on
+# (used by AsyncHTTPServer and by the items of BATCH)
+class RequestShim(object):
+	def __init__(self, server, client_address, command, path, headers, body):
+		self.server         = server
+		self.client_address = client_address
+		self.command        = command
+		self.path           = path
+		self.headers        = headers
+		self.body           = body
+		self.params         = None
+
+	def get_payload(self):
+		payload_len = len(self.body)
+
+		log_info("[Residential][HTTP][LOG] Payload: Len = %s", payload_len)
+
+		if(payload_len >= 1):
+			return parse_payload(self.body)
 		else:
-			if(enableHTTPPrints == True):
-				print("[Residential][HTTP][LOG] route: " + str(route))
-			if method == 'HEAD':
-				self.send_response(200)
-				if 'media_type' in route:
-					self.send_header('Content-type', route['media_type'])
-				# 2019-04-15
-				# if 'Access-Control-Allow-Origin' in route:
-				# RESTORED @ 2019-07-17
-				self.send_header('Access-Control-Allow-Origin', route['Access-Control-Allow-Origin'])
+			log_info("[Residential][HTTP][LOG] Empty Payload: Len = [%s]", payload_len)
 
-				self.end_headers()
-			else:
-				if 'file' in route:
-					if(enableHTTPPrints == True):
-						print("[Residential][HTTP][LOG] File Request!")
+			return None
 
-					if method == 'GET':
-						if(enableHTTPPrints == True):
-							print("[Residential][HTTP][LOG] GET Request Recognized!")
-						try:
-							f = open(os.path.join(here, route['file']), 'rb')
-							if(enableHTTPPrints == True):
-								print("[Residential][HTTP][LOG] File opened!")
-							try:
-								self.send_response(200)
-								if(enableHTTPPrints == True):
-									print("[Residential][HTTP][LOG] Response sent!")
-								# 2019-04-15								
-								# RESTORED @ 2019-07-17
-								self.send_header('Access-Control-Allow-Origin', '*')
-
-								if 'media_type' in route:
-									self.send_header('Content-type', route['media_type'])
-								self.end_headers()
-								if(enableHTTPPrints == True):
-									print("[Residential][HTTP][LOG] Headers closed!")
-								shutil.copyfileobj(f, self.wfile)
-								if(enableHTTPPrints == True):
-									print("[Residential][HTTP][LOG] File object copy ended!")
-							finally:
-								# The following case should be very fast
-								# That's why should not be required a dedicated try catch
-								# to manage clients that disconnects before receiving responses
-								f.close()
-						except Exception as e:
-							if(enableHTTPPrints == True):
-								print("[Residential][HTTP][LOG] Raised Exception! (Missing file?) %s " %e)
-							self.send_response(404)
-							self.end_headers()
-							self.wfile.write('File not found\n'.encode('UTF-8'))
-					else:
-						if(enableHTTPPrints == True):
-							print("[Residential][HTTP][LOG] NoN-GET Request Recognized!")
-						self.send_response(405)
-						self.end_headers()
-						# The following case should be very fast
-						# That's why should not be required a dedicated try catch
-						# to manage clients that disconnects before receiving responses
-						self.wfile.write('Only GET is supported\n'.encode('UTF-8'))
+class AsyncHTTPServer(object):
+	request_queue_size = POOL_QUEUE_SIZE
+	max_header_size    = 65536
+	methods            = ('HEAD', 'GET', 'POST', 'PUT', 'DELETE')
+
+	def __init__(self, server_address, RequestHandlerClass, workers=POOL_WORKERS):
+		self.RequestHandlerClass = RequestHandlerClass
+		self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=workers)
+		self.workers  = workers
+		self.loop     = None
+		self.server   = None
+		# ---------------------------------------------------------- #
+		# Bind and listen immediately (as socketserver does), the loop will accept on it
+		self.socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+		if(enablePreFork == True):
+			self.socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+		self.socket.bind(server_address)
+		self.socket.listen(self.request_queue_size)
+		self.server_address = self.socket.getsockname()
+		# ---------------------------------------------------------- #
+		# Gauges (exposed by SERVER/pool)
+		self.connections = 0
+		self.inFlight    = 0
+		self.served      = 0
+
+	def serve_forever(self):
+		asyncio.run(self.serve())
+
+	async def serve(self):
+		global asyncSession
+		self.loop   = asyncio.get_running_loop()
+		self.server = await asyncio.start_server(self.handle_connection, sock=self.socket, backlog=self.request_queue_size, limit=self.max_header_size)
+		if(aiohttp is not None):
+			asyncSession = (self.loop, aiohttp.ClientSession())
+		try:
+			await self.server.serve_forever()
+		except asyncio.CancelledError:
+			pass
+		finally:
+			if(asyncSession is not None and asyncSession[0] is self.loop):
+				await asyncSession[1].close()
+				asyncSession = None
+
+	def shutdown(self):
+		if(self.loop is not None):
+			self.loop.call_soon_threadsafe(self.server.close)
+
+	def server_close(self):
+		self.socket.close()
+		self.executor.shutdown(wait=False)
+
+	def get_gauges(self):
+		return {
+			"workers":     self.workers,
+			"connections": self.connections,
+			"inFlight":    self.inFlight,
+			"served":      self.served,
+		}
+
+	async def handle_connection(self, reader, writer):
+		self.connections += 1
+		writer.get_extra_info('socket').setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+		try:
+			keepAlive = True
+			while(keepAlive == True):
+				# Persistent connection: wait for the next request at most KEEPALIVE_TIMEOUT
+				try:
+					head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+				except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+					return
+				requestline, _, rawheaders = head.partition(b'\r\n')
+				words = requestline.decode('iso-8859-1').split()
+				if(len(words) != 3):
+					await self.send_response(writer, encode_response(RESTResponse(400, body='Bad request\n'.encode('UTF-8')), 'GET', None), None, False)
+					return
+				command, path, version = words
+				if(command not in self.methods):
+					await self.send_response(writer, encode_response(RESTResponse(501, body=str(command).encode('UTF-8') + " method is not supported\n".encode('UTF-8')), command, None), None, False)
+					return
+
+				headers = http.client.parse_headers(io.BytesIO(rawheaders))
+				connection = headers.get('Connection', '').lower()
+				if(version == 'HTTP/1.1'):
+					keepAlive = (connection != 'close')
 				else:
-					if(enableHTTPPrints == True):
-						# print("[LOG] Method Request! " + str(route))
-						print("[Residential][HTTP][LOG] Method Request: " + str(method))
-					try:
-						if method in route:
-							if(enableHTTPPrints == True):
-								print("[Residential][HTTP][LOG] Method Request in routes!")
-							content = route[method](self)
-							if content is not None:
-								if(enableHTTPPrints == True):
-									print("[Residential][HTTP][LOG] Method content not Null!")
-
-								self.send_response(200)
-								if 'media_type' in route:
-									self.send_header('Content-type', route['media_type'])
-
-								# 2019-04-15
-								# if 'Access-Control-Allow-Origin' in route:
-								# RESTORED @ 2019-07-17
-								self.send_header('Access-Control-Allow-Origin', '*')
-
-								self.end_headers()
-								if method != 'DELETE':
-		                        				self.wfile.write(json.dumps(content).encode('UTF-8'))
-							else:
-					                    self.send_response(404)
-					                    self.end_headers()
-		                			    self.wfile.write('Not found\n'.encode('UTF-8'))
-						else:
-							if(enableHTTPPrints == True):
-								print("[Residential][HTTP][LOG] Method Request NOT in routes!")
+					keepAlive = (connection == 'keep-alive')
 
-							self.send_response(405)
-							self.end_headers()
-							self.wfile.write(str(method).encode('UTF-8') + " method is not supported\n".encode('UTF-8'))
-					except Exception as e:
-						print("[Residential][HTTP][LOG] Raised Exception! (Client disconnected badly): %s" %e)
-                    
-# ------------------------------------------------------------------------------------ #    
-# Find out which APIs to dispatch
-	def get_route(self):
-		for path, route in list(self.routes.items()):
-			if re.match(path, self.path):
-				return route
-		return None
+				payload_len = int(headers.get('Content-Length', 0))
+				body = await reader.readexactly(payload_len) if payload_len > 0 else b''
+
+				request = RequestShim(self, writer.get_extra_info('peername'), command, path, headers, body)
+				route, request.params = self.RequestHandlerClass.match_route(path)
+				name   = route_name(route, command)
+				status = "error"
+				start  = time.time()
+				metrics.request_started(name)
+				try:
+					response = await self.dispatch(request, route)
+					if response is None:
+						return
+					response = encode_response(response, command, headers.get('Accept-Encoding'), version == 'HTTP/1.1')
+					status   = response.status
+					if(('Connection', 'close') in response.headers):
+						keepAlive = False
+					await self.send_response(writer, response, version, keepAlive)
+				finally:
+					metrics.request_finished(name, command, status, time.time() - start)
+		except Exception as e:
+			log_error("[Residential][HTTP][LOG] Raised Exception! (Client disconnected badly): %s", e)
+		finally:
+			self.connections -= 1
+			writer.close()
+
+	async def dispatch(self, request, route):
+		log_debug("[Residential][HTTP][LOG] dispatch START")
+
+		response = route_response(route, request.command, request.params, request.headers)
+		if response is not None:
+			return response
+
+		api = route[request.command]
+		key = flight_key(route, request.command, request.params)
+		self.inFlight += 1
+		try:
+			if(asyncio.iscoroutinefunction(api)):
+				if key is None:
+					content = await api(request)
+				else:
+					content = await singleFlight.call_async(key, route.get('coalesce_timeout', COALESCE_TIMEOUT), api, request)
+			else:
+				content = await self.loop.run_in_executor(self.executor, call_api, route, request.command, request)
+		except Exception as e:
+			log_error("[Residential][HTTP][LOG] Raised Exception! (Client disconnected badly): %s", e)
+			return None
+		finally:
+			self.inFlight -= 1
+			self.served   += 1
+		return content_response(route, request.command, content, request.params, request.headers)
+
+	async def send_response(self, writer, response, version, keepAlive):
+		handler = self.RequestHandlerClass
+		lines = ["%s %d %s" % (handler.protocol_version, response.status, http.HTTPStatus(response.status).phrase),
+			 "Server: " + handler.server_version + " " + handler.sys_version,
+			 "Date: " + email.utils.formatdate(time.time(), usegmt=True)]
+		for header, value in response.headers:
+			lines.append(header + ": " + str(value))
+		if(keepAlive == False):
+			if(('Connection', 'close') not in response.headers):
+				lines.append("Connection: close")
+		elif(version == 'HTTP/1.0'):
+			lines.append("Connection: keep-alive")
+		writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1', 'strict'))
+		if isinstance(response.body, bytes):
+			writer.write(response.body)
+		elif response.body is not None:
+			# Streamed body: its chunks can block (e.g. forwarded from InfluxDB), produce them in the executor
+			try:
+				while True:
+					chunk = await self.loop.run_in_executor(self.executor, next, response.body, None)
+					if chunk is None:
+						break
+					writer.write(chunk)
+					await writer.drain()
+			finally:
+				response.body.close()
+		await writer.drain()
+
+# ------------------------------------------------------------------------------------ #
+# 				PRE-FORK MULTI-PROCESS MODE
+# ------------------------------------------------------------------------------------ #
+# With enablePreFork the parent forks PREFORK_PROCESSES-1 children before starting any
+# thread, then every process serves the same port so that CPU-bound APIs (integrations,
+# per-day loops, evaluate_*) are no more serialized by a single GIL.
+# The parent is the only owner of the MQTT subscriber and of EvaluateCyclesThread:
+# it publishes cycles and battery state in shared memory, the children read them from
+# there. The selected EV is shared in both directions (any process can set it).
+# ------------------------------------------------------------------------------------ #
+isStateOwner = True      # False inside the forked children
+sharedState  = None
+preforkPids  = []
+
+class SharedState(object):
+	def __init__(self):
+		self.cycles     = multiprocessing.Value('q', 0)
+		self.state      = multiprocessing.Array('c', 32)
+		self.ess_status = multiprocessing.Array('c', 32)
+		self.evSelected = multiprocessing.Array('c', 128)
+
+# Owner side: invoked whenever cycles or battery state change
+def publish_battery_state():
+	if(sharedState is None or isStateOwner == False):
+		return
+	sharedState.cycles.value     = int(cycles)
+	sharedState.state.value      = str(state).encode('UTF-8')[:31]
+	sharedState.ess_status.value = str(ess_status).encode('UTF-8')[:31]
+
+# Children side: refresh the local copies before using them
+def read_battery_state():
+	global cycles
+	global state
+	global ess_status
+	if(sharedState is None or isStateOwner == True):
+		return
+	cycles     = sharedState.cycles.value
+	state      = sharedState.state.value.decode('UTF-8')
+	ess_status = sharedState.ess_status.value.decode('UTF-8')
+
+def publish_ev_selected():
+	if(sharedState is not None):
+		sharedState.evSelected.value = str(EV_selected).encode('UTF-8')[:127]
+
+def read_ev_selected():
+	global EV_selected
+	if(sharedState is not None):
+		EV_selected = sharedState.evSelected.value.decode('UTF-8')
+
+def stop_process(signum, frame):
+	raise KeyboardInterrupt
+
+def prefork_workers(processes):
+	global isStateOwner
+	global sharedState
+	global preforkPids
+
+	sharedState = SharedState()
+	publish_ev_selected()
+	# SIGTERM (e.g. service stop) closes the server as CTRL+C does
+	signal.signal(signal.SIGTERM, stop_process)
+
+	for i in range(processes - 1):
+		pid = os.fork()
+		if(pid == 0):
+			isStateOwner = False
+			preforkPids  = []
+			return
+		preforkPids.append(pid)
+
+	print("[Residential-Backend] Pre-forked workers: " + str(preforkPids))
+
+def stop_prefork_workers():
+	for pid in preforkPids:
+		try:
+			os.kill(pid, signal.SIGTERM)
+		except OSError:
+			pass
+	for pid in preforkPids:
+		try:
+			os.waitpid(pid, 0)
+		except OSError:
+			pass
 
 # Start REST server 
 # ------------------------------------------------------------------------------------ #
-def rest_server(server_class=ThreadingHTTPServer, handler_class=RESTRequestHandler):
+def rest_server(server_class=None, handler_class=RESTRequestHandler):
 	'Starts the REST server'
 	# Here we COULD respond only to the private-IPv4.
 	# Note that, this device is reachable only from the LAN and from the VPN.
@@ -4003,6 +6930,14 @@ def rest_server(server_class=ThreadingHTTPServer, handler_class=RESTRequestHandl
 	ip   = '0.0.0.0'
 	port = 18081
 
+	if(server_class is None):
+		if(enableAsyncServer == True):
+			server_class = AsyncHTTPServer
+		elif(enableWorkerPool == True):
+			server_class = PooledHTTPServer
+		else:
+			server_class = ThreadingHTTPServer
+
 	# Multi-threaded
 	http_server = server_class((ip, port),handler_class)
 
@@ -4012,23 +6947,32 @@ def rest_server(server_class=ThreadingHTTPServer, handler_class=RESTRequestHandl
 	print(('[Residential-Backend] Starting MT HTTP server at %s:%d' % (ip, port)))
 
 	# ------------------------------------------ #
-	if(enableCycleEvaluation == True):
+	if(enableCycleEvaluation == True and isStateOwner == True):
 		cyclesThreadActive = True	
 		cyclesthread = EvaluateCyclesThread()
 		cyclesthread.start() 
 	# ------------------------------------------ #
+	if(enableInfluxMirror == True and isStateOwner == True):
+		influxMirror.start()
+	# ------------------------------------------ #
 	try:
         	http_server.serve_forever()
 	except KeyboardInterrupt:
 		pass
 	print('[Residential-Backend] Stopping HTTP server')
 	http_server.server_close()
+	influxMirror.stop()
+	influxClient.close()
 	# ------------------------------------------ #
 	if(cyclesThreadActive == True):
 		print("[Residential-Backend][END] Ending Parallel Thread")
 		cyclesthread.kill_received = True
 		cyclesthread.join(5.0)
 	# ------------------------------------------ #
+	if(len(preforkPids) > 0):
+		print("[Residential-Backend][END] Stopping Pre-forked workers")
+		stop_prefork_workers()
+	# ------------------------------------------ #
 
 
 ######################################################################################################################################
@@ -4057,23 +7001,23 @@ class EvaluateCyclesThread(threading.Thread):
 			pers.sections()	
 			cycles = int(pers['DEFAULT']['CYCLES'])
 		except Exception as e:
-			print("[PERSISTENT FILE NOT FOUND] First Run!? %s" %e)
+			log_warning("[PERSISTENT FILE NOT FOUND] First Run!? %s", e)
 			persistent = configparser.ConfigParser()
 			persistent['DEFAULT'] = {'CYCLES': str(cycles)}
 			with open(str(here)+"/"+persistent_file, 'w') as myfile:
 				persistent.write(myfile)
-			print("[PERSISTENT FILE] Just Created!")
+			log_info("[PERSISTENT FILE] Just Created!")
 
-		if(enablePrints == True):
-			print("[EvaluateCyclesThread] INIT on: " + str(datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')))
-			print("[EvaluateCyclesThread] Restored Value: " + str(cycles))
+		publish_battery_state()
+
+		log_info("[EvaluateCyclesThread] INIT on: %s", datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S'))
+		log_info("[EvaluateCyclesThread] Restored Value: %s", cycles)
 		# ---------------------------------------------------------- #
 		
 		self.kill_received = False
 		# ---------------------------------------------------------- #
 
 	def run(self):
-		global enablePrints
 		global cycles
 		global state
 		global N_THRESHOLD
@@ -4089,8 +7033,7 @@ class EvaluateCyclesThread(threading.Thread):
 		incFlag      = 0
 		newCycleFlag = 0
 		# ---------------------------------------------------------- #
-		if(enablePrints == True):
-			print("[EvaluateCyclesThread] RUN: (" +str(cycles)+ ")")
+		log_info("[EvaluateCyclesThread] RUN: (%s)", cycles)
 		# ---------------------------------------------------------- #
 		# Wait for extracted Battery Power values from MQTT stream
 		# Evaluate if the received value is inline with the previous one
@@ -4098,7 +7041,7 @@ class EvaluateCyclesThread(threading.Thread):
 		# ---------------------------------------------------------- #
 		while(True):
 			if(self.kill_received == True):
-				print("[EvaluateCyclesThread] Kill Received")
+				log_info("[EvaluateCyclesThread] Kill Received")
 				time.sleep(1)
 				return
 
@@ -4112,8 +7055,7 @@ class EvaluateCyclesThread(threading.Thread):
 				# ---------------------------------------------------------------------------------- #
 				internal_queue.task_done()
 				# ---------------------------------------------------------------------------------- #
-				if(enablePrints == True):
-					print("[EvaluateCyclesThread] Message Received: (" + str(avg) + ")")
+				log_info("[EvaluateCyclesThread] Message Received: (%s)", avg)
 
 				# ---------------------------------------------------------------------------------- #
 				# SIMPLEST APPROACH (rely on ESS-status)[Could also be: IDLE/EMPTY/FULL]:
@@ -4172,14 +7114,14 @@ class EvaluateCyclesThread(threading.Thread):
 					# One cycle more!
 					cycles += 1
 					# Write on File
-					if(enablePrints == True):
-						print("[EvaluateCyclesThread] Cycle Completed:["+str(cycles)+"]")
+					log_info("[EvaluateCyclesThread] Cycle Completed:[%s]", cycles)
 
 					persistent = configparser.ConfigParser()
 					persistent['DEFAULT'] = {'CYCLES': str(cycles)}
 					with open(str(here)+"/"+persistent_file, 'w') as myfile:
 						persistent.write(myfile)
 
+				publish_battery_state()
 
 ######################################################################################################################################
 # ----------------------------------------------------------------------------------------------------------------------------- #
@@ -4205,7 +7147,6 @@ counter_threshold = 3
 #
 # ---------------------------------------------------------------------------------------------------------- #
 def on_local_message(mqtt_local_sub, obj, msg):
-	global enablePrints
 	global internal_queue
 	global BattField
 	global ess_soc
@@ -4233,16 +7174,14 @@ def on_local_message(mqtt_local_sub, obj, msg):
 			# Consequently, it is simpler to avoid the following control!
 			# if(str(sensorID) == str(hostName)):
 			# ---------------------------------------------------------------------------------- #
-			if(enablePrints == True):
-				print("[MQTT-LOCAL] Accepted Message from: " +str(sensorID))
+			log_info("[MQTT-LOCAL] Accepted Message from: %s", sensorID)
 			# ---------------------------------------------------------------------------------- #
 			# Increment counter, we will do downsampling here to build meaningful averages.
 			# It is useless to forward every packet 
 			# (most of the time it will be recognized as IDLE state)
 			# ---------------------------------------------------------------------------------- #
 			if(internal_counter >= counter_threshold):
-				if(enablePrints == True):
-					print("[MQTT-LOCAL] Write inside queue")
+				log_info("[MQTT-LOCAL] Write inside queue")
 
 				average = ess_soc/internal_counter
 				# Reset counter
@@ -4259,8 +7198,7 @@ def on_local_message(mqtt_local_sub, obj, msg):
 					lastAvg = currAvg
 					currAvg = average
 
-				if(enablePrints == True):
-					print("[MQTT-LOCAL] Average: "+ str(average))
+				log_info("[MQTT-LOCAL] Average: %s", average)
 
 				internal_queue.put(average)
 			else:
@@ -4269,12 +7207,13 @@ def on_local_message(mqtt_local_sub, obj, msg):
 					ess_soc += float(data[str(BattField)])
 					ess_status = data['ESS-status']
 					ess_status = ess_status.replace('"','')
+					publish_battery_state()
 					internal_counter += 1
 				except Exception as e:
-					print("Exception: %s" %e)
+					log_error("Exception: %s", e)
 					raise Exception("SOC PARSING Error!")
 		except Exception as e:
-			print("[MQTT-LOCAL][DATA] What: %s " %e)
+			log_error("[MQTT-LOCAL][DATA] What: %s ", e)
 
 
 def on_local_connect(mqtt_local_sub, userdata, flags, rc):
@@ -4282,41 +7221,36 @@ def on_local_connect(mqtt_local_sub, userdata, flags, rc):
 
 
 def on_local_disconnect(client, userdata, rc):
-	global enablePrints
 	global mqtt_local_port
 	global mqtt_local_broker
 	global mqtt_local_sub
 
 	time.sleep(10)
-	if(enablePrints == True):
-		print("[MQTT-LOCAL][DATA] Re-connecting to: " +str(mqtt_local_broker) + ":" + str(mqtt_local_port))
+	log_info("[MQTT-LOCAL][DATA] Re-connecting to: %s:%s", mqtt_local_broker, mqtt_local_port)
 
 	try:
 		mqtt_local_sub.connect(mqtt_local_broker, int(mqtt_local_port), 60)
 	except Exception as e:
-		print("[MQTT-LOCAL][DATA] Failure %s " %e)
+		log_error("[MQTT-LOCAL][DATA] Failure %s ", e)
 
 
 def startLocalSubscriber():
-	global enablePrints
 	global mqtt_local_broker
 	global mqtt_local_port
 	global mqtt_local_sub
 	try:
-		if(enablePrints == True):       
-			print("[MQTT-LOCAL][DATA] Building the LOCAL SUBSCRIBER (mqtt-client)")
+		log_info("[MQTT-LOCAL][DATA] Building the LOCAL SUBSCRIBER (mqtt-client)")
 
 		mqtt_local_sub.on_message    = on_local_message
 		mqtt_local_sub.on_connect    = on_local_connect
 		mqtt_local_sub.on_disconnect = on_local_disconnect
-		if(enablePrints == True):
-			print("[MQTT-LOCAL][DATA] Connecting to: " +str(mqtt_local_broker) + ":" + str(mqtt_local_port))
+		log_info("[MQTT-LOCAL][DATA] Connecting to: %s:%s", mqtt_local_broker, mqtt_local_port)
 
 		mqtt_local_sub.connect(mqtt_local_broker, int(mqtt_local_port), 60)
 		mqtt_local_sub.loop_start() 	
 
 	except Exception as e:
-		print("[MQTT-LOCAL][DATA] Stopped %s " %e)
+		log_error("[MQTT-LOCAL][DATA] Stopped %s ", e)
 		raise Exception('Failed to connect to the Local Broker')
 
 
@@ -4347,8 +7281,13 @@ def main(argv):
 		EV_selected = config['EV_SELECTED']['VALUE']
 		EV_tmp      = config['EV_LIST']['VALUE']
 		EV_idList   = EV_tmp.split(",")
-		print("[Residential-Backend] Starting MQTT subscriber")
-		startLocalSubscriber()
+		# Fork before starting any thread (MQTT loop, EvaluateCyclesThread)
+		if(enablePreFork == True):
+			prefork_workers(PREFORK_PROCESSES)
+
+		if(isStateOwner == True):
+			print("[Residential-Backend] Starting MQTT subscriber")
+			startLocalSubscriber()
 
 		print("[Residential-Backend] Starting REST Server")
 		rest_server()